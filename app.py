@@ -1,21 +1,33 @@
 import src.config as config
 import src.ingest.splitter as splitter
 import src.ingest.build_index as build_index
+import src.ingest.chunk_store as chunk_store
+import src.ingest.manifest as manifest
+import src.ingest.indexer as indexer
 import src.rag.qa as qa
+import src.rag.numpy_collection as numpy_collection
+import src.rag.tracing as tracing
+
+if config.TRACE_METRICS_PORT:
+    tracing.serve_metrics(config.TRACE_METRICS_PORT)
 
 #=================================================================
-#splitter.write_pages_to_jsonl(splitter.iter_pages_cleaned(), config.PAGES_FILE)
-#splitter.write_chunks_to_jsonl(splitter.iter_pages_cleaned(), config.CHUNKS_FILE)
+#splitter.write_pages_to_jsonl(splitter.iter_pages_cleaned(workers=config.INGEST_WORKERS), config.PAGES_FILE)
+#splitter.write_chunks_to_jsonl(splitter.iter_pages_cleaned(workers=config.INGEST_WORKERS), config.CHUNKS_FILE, config.CHUNK_STORE_PATH)
+#print(manifest.build_incremental(workers=config.INGEST_WORKERS))
+#print(build_index.build_search_indexes(config.CHUNKS_FILE))
+#print(numpy_collection.export_collection(build_index.get_collection(), config.NUMPY_INDEX_PATH))
 #=================================================================
-#oai, collection = build_index.get_clients()
+#oai, collection = build_index.get_embedder_and_collection()
 #
 #total_read = 0
 #total_indexed = 0
 #batch_num = 0
 #
 #chunks_gen = build_index.iter_chunks_from_file(config.CHUNKS_FILE)
+#chunks_gen = chunk_store.iter_chunks_from_store(config.CHUNK_STORE_PATH)
 #
-#for batch in build_index.batch_iter(chunks_gen, config.BATCH_SIZE):
+#for batch in build_index.batch_iter(chunks_gen, config.EMBED_BATCH_MAX_ITEMS, max_tokens=config.EMBED_BATCH_TOKENS):
 #    batch_num += 1
 #    total_read += len(batch)
 #    
@@ -27,8 +39,18 @@ import src.rag.qa as qa
 #print("\nIndexación finalizada")
 #print(f"Total chunks leídos: {total_read}")
 #print(f"Total chunks indexados: {total_indexed}")
+#print(build_index.build_search_indexes(config.CHUNKS_FILE))
 #print(f"Vector store: {config.CHROMA_PATH} | Colección: rag_finanzas")
 #=================================================================
+#oai, collection = build_index.get_embedder_and_collection()
+#
+#engine = indexer.IndexingEngine(
+#    collection, oai,
+#    progress=lambda s: print(f"Batch {s.batches}: indexados={s.indexed} | {s.chunks_per_s:.1f} chunks/s | {s.tokens_per_s:.0f} tokens/s")
+#)
+#stats = engine.run(build_index.iter_chunks_from_file(config.CHUNKS_FILE))
+#print(f"\nIndexación finalizada: leídos={stats.read} | indexados={stats.indexed} | {stats.elapsed:.1f}s")
+#=================================================================
 while True:
     q = input("Pregunta: ").strip()
     if not q:
@@ -37,15 +59,20 @@ while True:
         break
 
     # mode = "strict" | "explanatory"
-    res = qa.answer_question(
+    stream = qa.answer_question(
         question=q,
         where=None,       
         temperature=0.1,
-        mode="strict"
+        mode="strict",
+        stream=True
     )
 
     print("\n--- RESPUESTA ---")
-    print(res.answer)
+    for delta in stream:
+        print(delta, end="", flush=True)
+    print()
+
+    res = stream.result
 
     print("\n--- EVIDENCIA (debug) ---")
     for i, ev in enumerate(res.evidences, start=1):
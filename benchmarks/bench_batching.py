@@ -0,0 +1,66 @@
+# ==============================================================================l
+# Benchmark de batching para embeddings (BATCH_SIZE fijo vs presupuesto tokens). |
+#                                                                               |
+# Qué mide:                                                                     |
+# - Número de requests de embeddings por reconstrucción completa del índice.    |
+# - Distribución de tokens estimados por request (mín / media / máx).           |
+#                                                                               |
+# Uso:                                                                          |
+#   python -m benchmarks.bench_batching [--chunks data/processed/chunks.jsonl]  |
+#   Sin chunks.jsonl (o vacío) usa una mezcla sintética de filas de tabla y     |
+#   chunks narrativos.                                                          |
+# ==============================================================================|
+import argparse
+import json
+import random
+import statistics
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+import src.config as config
+import src.ingest.build_index as build_index
+
+def synthetic_chunks(n: int = 20_000, seed: int = 7) -> Iterator[Dict[str, Any]]:
+    rnd = random.Random(seed)
+    for i in range(n):
+        if rnd.random() < 0.4:
+            text = (f"Fila tabla | Fecha: {rnd.randint(1, 28)}-mar-23 | Cantidad: {rnd.randint(1, 999):,} | "
+                    f"Porcentaje: {rnd.random():.2f}% | Precio: S/ {rnd.uniform(3, 9):.2f} | Monto: S/ {rnd.randint(1000, 99999):,}")
+        else:
+            text = ("Las ventas consolidadas del trimestre crecieron impulsadas por consumo masivo. " * 16)[:1200]
+        yield {"chunk_id": f"syn_{i:06d}", "chunk_text": text}
+
+def summarize(batches: List[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    tokens = [sum(build_index.estimate_tokens(c["chunk_text"]) for c in b) for b in batches]
+    return {
+        "requests": len(batches),
+        "chunks": sum(len(b) for b in batches),
+        "tokens_min": min(tokens) if tokens else 0,
+        "tokens_mean": round(statistics.mean(tokens), 1) if tokens else 0,
+        "tokens_max": max(tokens) if tokens else 0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chunks", type=Path, default=config.CHUNKS_FILE)
+    parser.add_argument("--max-tokens", type=int, default=config.EMBED_BATCH_TOKENS)
+    parser.add_argument("--max-items", type=int, default=config.EMBED_BATCH_MAX_ITEMS)
+    args = parser.parse_args()
+
+    if args.chunks.exists() and args.chunks.stat().st_size:
+        chunks = list(build_index.iter_chunks_from_file(args.chunks))
+        source = str(args.chunks)
+    else:
+        chunks = list(synthetic_chunks())
+        source = "synthetic"
+
+    fixed = list(build_index.batch_iter(iter(chunks), config.BATCH_SIZE))
+    budgeted = list(build_index.batch_iter(iter(chunks), args.max_items, max_tokens=args.max_tokens))
+
+    print(json.dumps({
+        "source": source,
+        "fixed_batch_size": {"batch_size": config.BATCH_SIZE, **summarize(fixed)},
+        "token_budget": {"max_tokens": args.max_tokens, "max_items": args.max_items, **summarize(budgeted)},
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
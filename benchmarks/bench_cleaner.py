@@ -0,0 +1,164 @@
+# ==============================================================================l
+# Regresión y throughput de cleaner.clean_text.                                 |
+#                                                                               |
+# Qué mide:                                                                     |
+# - Que clean_text produzca exactamente los mismos bytes que la versión         |
+#   original de seis re.sub (copiada aquí como referencia) sobre un corpus de   |
+#   regresión; sale con código 1 ante la primera diferencia.                    |
+# - MB/s y pages/s de la referencia, de clean_text y de iter_clean_pages.       |
+#                                                                               |
+# Corpus:                                                                       |
+# - Páginas de PDFs sintéticos (benchmarks.bench_ingest.generate_corpus) u      |
+#   otro directorio con --pdfs-dir.                                             |
+# - Casos borde fijos y cadenas aleatorias armadas con los fragmentos que       |
+#   activan cada regla (guiones al final de línea, tabs, \n repetidos, etc.).   |
+#                                                                               |
+# Uso:                                                                          |
+#   python -m benchmarks.bench_cleaner [--docs 4] [--pages 12] [--random 50000] |
+#       [--out bench_cleaner.json] [--compare corrida_anterior.json]            |
+# ==============================================================================|
+import argparse
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import src.ingest.cleaner as cleaner
+import src.ingest.loader as loader
+from benchmarks.bench_ingest import best_of, generate_corpus
+from benchmarks.common import compare, environment, write_results
+
+def reference_clean_text(text: str) -> str:
+    # Copia literal de clean_text antes de precompilar y fusionar reglas.
+    if not text:
+        return ""
+
+    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
+    text = re.sub(r"(?<=\w)\s*\n\s*(?=\w)", " ", text)
+    text = re.sub(r"([A-Za-zÁÉÍÓÚÜÑáéíóúüñ])\n([A-Za-zÁÉÍÓÚÜÑáéíóúüñ])", r"\1 \2", text)
+    text = re.sub(r"[ \t]+\n", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = re.sub(r"[ \t]{2,}", " ", text)
+
+    return text.strip()
+
+EDGE_CASES = [
+    "",
+    " ",
+    "\n",
+    "\n\n\n\n",
+    "a-\nb",
+    "a-\nb-\nc-\nd",
+    "x-\n-\ny",
+    "Ventas\nnetas",
+    "Ventas \t\n\t netas",
+    "Total:\n\n\n\n1,234",
+    "S/  1,234.56\t\t  USD",
+    "fin.  \n\n\n  inicio",
+    "12-mar-23\n1,000\n0.05%\nS/ 12.30\nS/ 12,300.00",
+    "utilidad \nneta",
+    "línea\r\nsiguiente",
+    "año\x0bpasado\x0c\n\nnuevo",
+    "　\n　texto　\n",
+    "Á\nÉ\nÍ\nÓ\nÚ\nÜ\nÑ",
+    "_\n_-\n_",
+    "٣\n٤",
+]
+
+FRAGMENTS = [
+    "a", "Z", "É", "ñ", "_", "1", "9", ".", ",", ":", "%", "S/", "-",
+    "\n", "\n", "\n", " ", " ", "\t", "\r", "\x0b", "\x0c", " ", "　", "\x85",
+    "-\n", " \n", "\t\n", "\n\n\n", "  ", "\t\t", "utilidad", "1,234.56",
+]
+
+def random_cases(n: int, seed: int) -> List[str]:
+    rnd = random.Random(seed)
+    return ["".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 40))) for _ in range(n)]
+
+def check(texts: List[str], label: str) -> int:
+    for i, text in enumerate(texts):
+        expected = reference_clean_text(text)
+        got = cleaner.clean_text(text)
+        if got != expected:
+            print(f"DIFERENCIA en {label}[{i}]: entrada={text!r}", file=sys.stderr)
+            print(f"  esperado={expected!r}", file=sys.stderr)
+            print(f"  obtenido={got!r}", file=sys.stderr)
+            sys.exit(1)
+    print(f"{label:<28} {len(texts):>8} textos idénticos", flush=True)
+    return len(texts)
+
+def _throughput(name: str, repeat: int, fn: Callable[[], Any], pages: int, size_mb: float) -> Dict[str, Any]:
+    seconds, _ = best_of(repeat, fn)
+    result = {
+        "seconds": round(seconds, 4),
+        "pages": pages,
+        "pages_per_s": round(pages / seconds, 1) if seconds else 0.0,
+        "mb_per_s": round(size_mb / seconds, 2) if seconds else 0.0,
+    }
+    print(f"{name:<28} {result['pages_per_s']:>10.1f} pages/s {result['mb_per_s']:>8.2f} MB/s", flush=True)
+    return result
+
+def run(pdfs_dir: Path, n_random: int, seed: int, repeat: int) -> Dict[str, Any]:
+    records = [page for pdf in loader.get_pdfs_paths(pdfs_dir) for page in loader.extract_pages_text(pdf)]
+    texts = [r["page_text"] for r in records]
+
+    checked = {
+        "edge_cases": check(EDGE_CASES, "edge_cases"),
+        "pdf_pages": check(texts, "pdf_pages"),
+        # El texto limpio vuelve a pasar por clean_text si se re-ingesta una página.
+        "pdf_pages_cleaned": check([reference_clean_text(t) for t in texts], "pdf_pages_cleaned"),
+        "random": check(random_cases(n_random, seed), "random"),
+    }
+
+    size_mb = sum(len(t.encode("utf-8")) for t in texts) / 1e6
+    stages = {
+        "reference_clean_text": _throughput("reference_clean_text", repeat,
+                                            lambda: [reference_clean_text(t) for t in texts], len(texts), size_mb),
+        "cleaner.clean_text": _throughput("cleaner.clean_text", repeat,
+                                          lambda: [cleaner.clean_text(t) for t in texts], len(texts), size_mb),
+        "cleaner.iter_clean_pages": _throughput("cleaner.iter_clean_pages", repeat,
+                                                lambda: sum(1 for _ in cleaner.iter_clean_pages({**r} for r in records)),
+                                                len(texts), size_mb),
+    }
+
+    ref_s = stages["reference_clean_text"]["seconds"]
+    new_s = stages["cleaner.clean_text"]["seconds"]
+    print(f"speedup clean_text: x{ref_s / new_s:.2f}" if new_s else "speedup clean_text: n/a")
+
+    return {"checked": checked, "mb": round(size_mb, 3), "stages": stages}
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs-dir", type=Path, default=None, help="directorio con PDFs reales (por defecto: sintéticos)")
+    parser.add_argument("--docs", type=int, default=4, help="PDFs sintéticos por tipo de documento")
+    parser.add_argument("--pages", type=int, default=12, help="páginas por PDF sintético")
+    parser.add_argument("--random", type=int, default=50_000, help="cadenas aleatorias del corpus de regresión")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=5, help="repeticiones por medición (se reporta la mejor)")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_cleaner_") as tmp:
+        if args.pdfs_dir is not None:
+            pdfs_dir = args.pdfs_dir
+            source = str(args.pdfs_dir)
+        else:
+            pdfs_dir = generate_corpus(Path(tmp), args.docs, args.pages, args.seed)
+            source = f"synthetic(docs={args.docs}, pages={args.pages}, seed={args.seed})"
+
+        results = {
+            "benchmark": "cleaner",
+            "source": source,
+            "repeat": args.repeat,
+            **environment(),
+            **run(pdfs_dir, args.random, args.seed, args.repeat),
+        }
+
+    write_results(results, args.out)
+    if args.compare is not None:
+        compare(results, args.compare, ["pages_per_s", "mb_per_s"])
+
+if __name__ == "__main__":
+    main()
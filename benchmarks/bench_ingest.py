@@ -0,0 +1,261 @@
+# ==============================================================================l
+# Benchmark de la ingesta por etapas (PDF -> páginas -> limpieza -> chunks).    |
+#                                                                               |
+# Qué mide:                                                                     |
+# - pages/s de loader.extract_pages_text, cleaner.clean_text y las funciones    |
+#   de table_extractor; pages/s y chunks/s de splitter.split_page_to_chunks.    |
+# - RSS pico y delta de cada etapa (muestreado durante la etapa, Linux) y el    |
+#   RSS pico acumulado del proceso al final (process_peak_rss_mb).              |
+#                                                                               |
+# Corpus:                                                                       |
+# - PDFs sintéticos estilo Alicorp generados con PyMuPDF: earnings_reports      |
+#   (narrativa larga + tablas trimestrales), financial_statements (tablas       |
+#   numéricas densas) e important_facts (tablas de recompra con fechas y total).|
+# - O un directorio real con --pdfs-dir (misma estructura que data/raw).        |
+#                                                                               |
+# Uso:                                                                          |
+#   python -m benchmarks.bench_ingest [--docs 4] [--pages 12] [--repeat 3]      |
+#       [--out bench_ingest.json] [--compare corrida_anterior.json]             |
+# ==============================================================================|
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+import fitz
+import src.ingest.cleaner as cleaner
+import src.ingest.loader as loader
+import src.ingest.splitter as splitter
+import src.ingest.table_extractor as table_extractor
+from benchmarks.common import RssSampler, compare, environment, process_peak_rss_mb, write_results
+
+NARRATIVE = [
+    "Las ventas consolidadas crecieron impulsadas por consumo masivo Perú y la recuperación de volúmenes en acuicultura.",
+    "El margen bruto se expandió por menores costos de trigo y aceite de soya, parcialmente compensados por el tipo de cambio.",
+    "La compañía mantuvo su disciplina de capital de trabajo y redujo el ciclo de conversión de efectivo en el trimestre.",
+    "Los gastos de ventas y administrativos aumentaron por inversión en marcas y digitalización de la fuerza de ventas.",
+    "El endeudamiento neto sobre EBITDA se ubicó por debajo del objetivo de mediano plazo establecido por el directorio.",
+    "En molienda, la demanda institucional compensó la menor actividad del canal tradicional durante el periodo.",
+]
+
+MONTHS = ["ene", "feb", "mar", "abr", "may", "jun", "jul", "ago", "set", "oct", "nov", "dic"]
+FILE_MONTHS = ["marzo", "junio", "setiembre", "diciembre"]
+
+def _write_lines(page: fitz.Page, lines: List[str], fontsize: float = 8.0) -> None:
+    y = 40.0
+    for line in lines:
+        if y > page.rect.height - 30:
+            break
+        page.insert_text((36, y), line, fontsize=fontsize)
+        y += fontsize * 1.35
+
+def _wrap(text: str, width: int = 105) -> List[str]:
+    lines: List[str] = []
+    current = ""
+    for word in text.split():
+        if len(current) + len(word) + 1 > width:
+            # Corta algunas palabras con guion, como hacen los PDFs reales.
+            if len(word) > 8 and len(current) < width - 5:
+                cut = width - len(current) - 2
+                lines.append(f"{current} {word[:cut]}-".strip())
+                current = word[cut:]
+                continue
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}".strip()
+    if current:
+        lines.append(current)
+    return lines
+
+def narrative_page(rnd: random.Random) -> List[str]:
+    lines = ["Análisis y discusión de la gerencia", ""]
+    for _ in range(rnd.randint(6, 9)):
+        paragraph = " ".join(rnd.choice(NARRATIVE) for _ in range(rnd.randint(3, 6)))
+        paragraph += f" Las ventas alcanzaron S/ {rnd.randint(1000, 4000):,} millones ({rnd.uniform(-5, 15):.1f}% a/a)."
+        lines.extend(_wrap(paragraph))
+        lines.append("")
+    return lines
+
+def quarterly_table_page(rnd: random.Random) -> List[str]:
+    lines = ["Resultados trimestrales (S/ millones)", "Concepto    1T    2T    3T    4T    Total    Var. %"]
+    for concept in ["Ingresos", "Costo de ventas", "Utilidad bruta", "Gastos de ventas", "Gastos administrativos",
+                    "EBITDA", "Utilidad operativa", "Gastos financieros", "Utilidad neta"]:
+        values = [rnd.randint(100, 2500) for _ in range(4)]
+        lines.append(f"{concept}    " + "    ".join(f"{v:,}" for v in values)
+                     + f"    {sum(values):,}    {rnd.uniform(-20, 30):.1f}%")
+    lines.append("")
+    lines.extend(_wrap(" ".join(rnd.choice(NARRATIVE) for _ in range(4))))
+    return lines
+
+def statement_page(rnd: random.Random) -> List[str]:
+    title = rnd.choice(["Estado de situación financiera", "Estado de resultados", "Estado de flujos de efectivo"])
+    lines = [title, "(En miles de soles)", "Nota    2023    2022    Saldo inicial    Saldo final"]
+    for i in range(rnd.randint(40, 55)):
+        account = rnd.choice(["Efectivo y equivalentes", "Cuentas por cobrar", "Inventarios", "Activo fijo",
+                              "Activos intangibles", "Deuda financiera", "Cuentas por pagar", "Pasivo diferido",
+                              "Patrimonio neto", "Resultados acumulados", "Ingresos", "Costos", "Gastos"])
+        lines.append(f"{account} {i + 1}    {rnd.randint(1, 30)}    {rnd.randint(1000, 9_999_999):,}    "
+                     f"{rnd.randint(1000, 9_999_999):,}    {rnd.randint(-99999, 999999):,}    {rnd.randint(0, 999999):,}.{rnd.randint(0, 99):02d}")
+    lines.append("Total activo    " + "    ".join(f"{rnd.randint(10_000_000, 99_999_999):,}" for _ in range(4)))
+    return lines
+
+def repurchase_page(rnd: random.Random, year: int) -> List[str]:
+    lines = [
+        "Hecho de importancia - Adquisición de acciones propias",
+        f"Alicorp S.A.A. informa las operaciones de recompra realizadas al amparo del programa aprobado en {year}.",
+        "",
+        "Fecha    Cantidad    Porcentaje    Precio    Monto",
+    ]
+    total_qty = 0
+    total_amt = 0.0
+    for _ in range(rnd.randint(3, 6)):
+        date = f"{rnd.randint(1, 28)}-{rnd.choice(MONTHS)}-{year % 100:02d}"
+        for j in range(rnd.randint(1, 4)):
+            qty = rnd.randint(1_000, 250_000)
+            price = rnd.uniform(4.5, 9.5)
+            amount = qty * price
+            total_qty += qty
+            total_amt += amount
+            prefix = f"{date}    " if j == 0 else ""
+            lines.append(f"{prefix}{qty:,}    {rnd.uniform(0.001, 0.05):.3f}%    S/ {price:.2f}    S/ {amount:,.2f}")
+    lines.append(f"Total    {total_qty:,}    S/ {total_amt:,.2f}")
+    lines.append("")
+    lines.append("Nota: las operaciones se realizaron a través de la Bolsa de Valores de Lima.")
+    return lines
+
+def generate_corpus(root: Path, docs: int, pages: int, seed: int) -> Path:
+    rnd = random.Random(seed)
+    pdfs_dir = root / "pdfs"
+    builders: Dict[str, Callable[[random.Random, int], List[str]]] = {
+        "earnings_reports": lambda r, y: narrative_page(r) if r.random() < 0.6 else quarterly_table_page(r),
+        "financial_statements": lambda r, y: statement_page(r) if r.random() < 0.8 else narrative_page(r),
+        "important_facts": lambda r, y: repurchase_page(r, y) if r.random() < 0.85 else narrative_page(r),
+    }
+
+    for doc_type, build in builders.items():
+        (pdfs_dir / doc_type).mkdir(parents=True, exist_ok=True)
+        for i in range(docs):
+            year = 2019 + i % 6
+            audited = "auditado" if doc_type == "financial_statements" and i % 2 else "noauditado"
+            name = f"{doc_type}_{year}_{FILE_MONTHS[i % 4]}_{audited}_{i:02d}.pdf"
+            with fitz.open() as doc:
+                for _ in range(pages):
+                    _write_lines(doc.new_page(), build(rnd, year))
+                doc.save(pdfs_dir / doc_type / name)
+
+    return pdfs_dir
+
+def _stage(name: str, seconds: float, memory: Dict[str, Any], pages: int, **extra: Any) -> Dict[str, Any]:
+    result = {
+        "seconds": round(seconds, 4),
+        "pages": pages,
+        "pages_per_s": round(pages / seconds, 1) if seconds else 0.0,
+        **extra,
+        **memory,
+    }
+    print(f"{name:<40} {result['pages_per_s']:>10.1f} pages/s", flush=True)
+    return result
+
+def best_of(repeat: int, fn: Callable[[], Any]) -> tuple[float, Any, Dict[str, Any]]:
+    best = float("inf")
+    out = None
+    with RssSampler() as rss:
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - start)
+    return best, out, rss.result()
+
+def run(pdfs_dir: Path, repeat: int) -> Dict[str, Any]:
+    pdfs = loader.get_pdfs_paths(pdfs_dir)
+    stages: Dict[str, Dict[str, Any]] = {}
+
+    def extract() -> List[dict]:
+        return [page for pdf in pdfs for page in loader.extract_pages_text(pdf)]
+
+    seconds, raw_pages, memory = best_of(repeat, extract)
+    stages["loader.extract_pages_text"] = _stage("loader.extract_pages_text", seconds, memory, len(raw_pages),
+                                                 pdfs=len(pdfs), mb=round(sum(p.stat().st_size for p in pdfs) / 1e6, 2))
+
+    # Metadata fuera de la medición: lo que se mide es la extracción de texto.
+    records: List[dict] = []
+    for pdf in pdfs:
+        meta = loader.extract_metadata(pdf)
+        for page in loader.extract_pages_text(pdf):
+            records.append({**meta, **page})
+
+    raw_chars = sum(len(r["page_text"]) for r in records)
+    seconds, cleaned, memory = best_of(repeat, lambda: [cleaner.clean_text(r["page_text"]) for r in records])
+    stages["cleaner.clean_text"] = _stage("cleaner.clean_text", seconds, memory, len(records),
+                                          chars_per_s=round(raw_chars / seconds) if seconds else 0)
+
+    pages = [{**r, "page_text": text} for r, text in zip(records, cleaned)]
+
+    seconds, chunks, memory = best_of(repeat, lambda: [c for p in pages for c in splitter.split_page_to_chunks(p)])
+    stages["splitter.split_page_to_chunks"] = _stage("splitter.split_page_to_chunks", seconds, memory, len(pages),
+                                                     chunks=len(chunks),
+                                                     chunks_per_s=round(len(chunks) / seconds, 1) if seconds else 0.0)
+
+    seconds, normalized, memory = best_of(repeat, lambda: [table_extractor.normalize_for_table(p["page_text"]) for p in pages])
+    stages["table_extractor.normalize_for_table"] = _stage("table_extractor.normalize_for_table", seconds, memory, len(pages))
+
+    seconds, _, memory = best_of(repeat, lambda: [table_extractor.find_table_region(t, table_extractor.TABLE_HEADERS_COMMON, window=1200)
+                                          for t in normalized])
+    stages["table_extractor.find_table_region"] = _stage("table_extractor.find_table_region", seconds, memory, len(pages))
+
+    seconds, flags, memory = best_of(repeat, lambda: [table_extractor.looks_like_table(t) for t in normalized])
+    stages["table_extractor.looks_like_table"] = _stage("table_extractor.looks_like_table", seconds, memory, len(pages),
+                                                        tables=sum(flags))
+
+    seconds, rows, memory = best_of(repeat, lambda: [r for p in pages for r in table_extractor.extract_table_rows(p)])
+    stages["table_extractor.extract_table_rows"] = _stage("table_extractor.extract_table_rows", seconds, memory, len(pages),
+                                                          chunks=len(rows))
+
+    seconds, totals, memory = best_of(repeat, lambda: [table_extractor.extract_table_fact_total(p) for p in pages])
+    stages["table_extractor.extract_table_fact_total"] = _stage("table_extractor.extract_table_fact_total", seconds, memory, len(pages),
+                                                                chunks=sum(t is not None for t in totals))
+
+    by_type: Dict[str, Dict[str, int]] = {}
+    for p in pages:
+        by_type.setdefault(p["doc_type"], {"pages": 0, "chunks": 0})["pages"] += 1
+    for c in chunks:
+        by_type[c["doc_type"]]["chunks"] += 1
+
+    return {"corpus": by_type, "stages": stages}
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdfs-dir", type=Path, default=None, help="directorio con PDFs reales (por defecto: sintéticos)")
+    parser.add_argument("--docs", type=int, default=4, help="PDFs sintéticos por tipo de documento")
+    parser.add_argument("--pages", type=int, default=12, help="páginas por PDF sintético")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--repeat", type=int, default=3, help="repeticiones por etapa (se reporta la mejor)")
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_ingest_") as tmp:
+        if args.pdfs_dir is not None:
+            pdfs_dir = args.pdfs_dir
+            source = str(args.pdfs_dir)
+        else:
+            pdfs_dir = generate_corpus(Path(tmp), args.docs, args.pages, args.seed)
+            source = f"synthetic(docs={args.docs}, pages={args.pages}, seed={args.seed})"
+
+        results = {
+            "benchmark": "ingest",
+            "source": source,
+            "repeat": args.repeat,
+            **environment(),
+            **run(pdfs_dir, args.repeat),
+            "process_peak_rss_mb": round(process_peak_rss_mb(), 1),
+        }
+
+    write_results(results, args.out)
+    if args.compare is not None:
+        compare(results, args.compare, ["pages_per_s", "chunks_per_s", "peak_rss_mb", "rss_delta_mb"])
+
+if __name__ == "__main__":
+    main()
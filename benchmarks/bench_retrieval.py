@@ -0,0 +1,288 @@
+# ==============================================================================l
+# Benchmark de latencia de retrieve y answer_question por etapa.                |
+#                                                                               |
+# Qué mide (p50 / p95 / p99 por etapa y tamaño de colección):                   |
+# - retriever_utils.detect_signals, retriever.embed_query, cada consulta a      |
+#   Chroma (chroma.query#1 = filtro original, #2.. = relajaciones/fallback),    |
+#   prompt.build_context, la llamada al LLM y el total de retrieve y de         |
+#   answer_question.                                                            |
+#                                                                               |
+# Entorno:                                                                      |
+# - OpenAI reemplazado por benchmarks.fake_openai (HTTP local, latencia         |
+#   artificial configurable); no consume créditos de API.                       |
+# - Colección Chroma sintética de 10k a 1M chunks con metadata realista         |
+#   (doc_type, year, period, audited). Con --chroma-path se reutiliza entre     |
+#   corridas (construir 1M tarda).                                              |
+# - Con --backend numpy la colección se exporta a NumpyCollection y se mide     |
+#   la búsqueda exacta en lugar de Chroma.                                      |
+#                                                                               |
+# Uso:                                                                          |
+#   python -m benchmarks.bench_retrieval --sizes 10000 100000 --questions 200   |
+#       [--embed-ms 40 --chat-ms 800] [--out bench_retrieval.json]              |
+# ==============================================================================|
+import argparse
+import functools
+import random
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import chromadb
+import numpy as np
+from chromadb.config import Settings
+from openai import OpenAI
+import src.config as config
+import src.rag.prompt as prompt
+import src.rag.qa as qa
+import src.rag.retriever as retriever
+import src.rag.retriever_utils as retriever_utils
+from src.ingest.embeddings import OpenAIEmbeddingBackend
+from src.ingest.metadata_index import MetadataIndex, build_metadata_index
+from src.rag.embedding_cache import QueryEmbeddingCache
+from src.rag.numpy_collection import NumpyCollection, export_collection
+from src.rag.session import RetrieverSession
+from benchmarks.common import RssSampler, compare, environment, percentiles, process_peak_rss_mb, write_results
+from benchmarks.fake_openai import FakeOpenAIConfig, start_server
+
+DOC_TYPES = ["earnings_reports", "financial_statements", "important_facts"]
+YEARS = list(range(2019, 2025))
+
+QUESTIONS = [
+    "¿Cuál fue la utilidad neta en {year}?",
+    "Estado de resultados auditado {year}",
+    "¿Cuántas acciones se recompraron en marzo {year}?",
+    "hechos de importancia {year} recompra de acciones",
+    "¿Cómo evolucionaron las ventas consolidadas en {year}?",
+    "¿Qué es el EBITDA ajustado?",
+    "deuda financiera total del año pasado",
+    "margen bruto del segundo trimestre {year}",
+]
+
+# --------------------------------------------------------------------------
+# Colección sintética
+# --------------------------------------------------------------------------
+
+def synthetic_metadata(i: int, rnd: random.Random) -> Dict[str, Any]:
+    doc_type = DOC_TYPES[i % len(DOC_TYPES)]
+    year = rnd.choice(YEARS)
+    month = rnd.choice(["03", "06", "09", "12"])
+    doc_id = f"{doc_type}_{year}_{month}_{i // 400:05d}"
+    page = (i // 8) % 50 + 1
+    return {
+        "doc_id": doc_id,
+        "source_path": f"data/raw/{doc_type}/{doc_id}.pdf",
+        "year": year,
+        "doc_type": doc_type,
+        "audited": doc_type == "financial_statements" and rnd.random() < 0.5,
+        "period": f"{year}-{month}" if rnd.random() < 0.7 else "no_definido",
+        "source": "Alicorp",
+        "page_number": page,
+        "chunk_index": i % 8 + 1,
+        "chunk_id": f"{doc_id}_p{page:03d}_c{i % 8 + 1:03d}_{i}",
+    }
+
+def build_collection(client: chromadb.api.ClientAPI, n: int, dim: int, seed: int) -> tuple[Any, float]:
+    name = f"bench_{n}_{dim}_{seed}"
+    collection = client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
+    if collection.count() >= n:
+        return collection, 0.0
+
+    rnd = random.Random(seed)
+    rng = np.random.default_rng(seed)
+    step = client.get_max_batch_size()
+    start = time.perf_counter()
+
+    for lo in range(collection.count(), n, step):
+        hi = min(lo + step, n)
+        vectors = rng.standard_normal((hi - lo, dim)).astype(np.float32)
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        metadatas = [synthetic_metadata(i, rnd) for i in range(lo, hi)]
+        collection.add(
+            ids=[m["chunk_id"] for m in metadatas],
+            embeddings=vectors,
+            documents=[f"Fila tabla | {m['doc_type']} {m['year']} | Monto: S/ {rnd.randint(1000, 999999):,}" for m in metadatas],
+            metadatas=metadatas,
+        )
+        print(f"  colección {name}: {hi:,}/{n:,}", end="\r", flush=True)
+
+    print()
+    return collection, time.perf_counter() - start
+
+# --------------------------------------------------------------------------
+# Instrumentación por etapa
+# --------------------------------------------------------------------------
+
+class StageTimer:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.attempts: Dict[int, int] = {}
+        self._queries = 0
+        self._restore: List[Callable[[], None]] = []
+
+    def begin(self) -> None:
+        self._queries = 0
+
+    def end(self) -> None:
+        self.attempts[self._queries] = self.attempts.get(self._queries, 0) + 1
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples.setdefault(stage, []).append(seconds)
+
+    def wrap(self, owner: Any, attr: str, stage: Optional[str] = None) -> None:
+        original = getattr(owner, attr)
+
+        @functools.wraps(original)
+        def timed(*args: Any, **kwargs: Any) -> Any:
+            label = stage or attr
+            if label == "chroma.query":
+                self._queries += 1
+                label = f"chroma.query#{self._queries}"
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.record(label, time.perf_counter() - start)
+
+        setattr(owner, attr, timed)
+        self._restore.append(lambda: setattr(owner, attr, original))
+
+    def restore(self) -> None:
+        while self._restore:
+            self._restore.pop()()
+
+def instrument(session: RetrieverSession) -> StageTimer:
+    timer = StageTimer()
+    timer.wrap(retriever_utils, "detect_signals")
+    timer.wrap(retriever, "embed_query")
+    timer.wrap(retriever, "query_collection", "chroma.query")
+    timer.wrap(retriever, "retrieve")
+    timer.wrap(prompt, "build_context")
+    timer.wrap(session.oai.chat.completions, "create", "llm.chat")
+    return timer
+
+# --------------------------------------------------------------------------
+# Corrida
+# --------------------------------------------------------------------------
+
+def make_questions(n: int, seed: int) -> List[str]:
+    rnd = random.Random(seed)
+    out = []
+    for i in range(n):
+        # Incluye años fuera de la colección para forzar las relajaciones.
+        year = rnd.choice(YEARS + [2016, 2030])
+        out.append(f"{rnd.choice(QUESTIONS).format(year=year)} #{i}")
+    return out
+
+def run_size(collection: Any, server_url: str, questions: List[str], top_k: int,
+             strategy: str, warm_cache: bool, metadata_index: Optional[MetadataIndex] = None) -> Dict[str, Any]:
+    oai = OpenAI(base_url=server_url, api_key="bench", max_retries=0)
+    embedder = OpenAIEmbeddingBackend(oai)
+    cache = QueryEmbeddingCache(model=embedder.model_name, max_entries=config.QUERY_CACHE_SIZE if warm_cache else 0)
+    session = RetrieverSession(oai=oai, collection=collection, embedding_cache=cache,
+                               use_answer_cache=False, embedder=embedder, metadata_index=metadata_index)
+
+    original_retrieve = retriever.retrieve
+    retriever.retrieve = functools.partial(original_retrieve, strategy=strategy)
+    timer = None
+
+    try:
+        # Calentamiento: conexión HTTP, carga del índice HNSW y regex compiladas.
+        for q in questions[:5]:
+            qa.answer_question(q, top_k=top_k, session=session)
+
+        timer = instrument(session)
+        for q in questions:
+            timer.begin()
+            start = time.perf_counter()
+            qa.answer_question(q, top_k=top_k, session=session)
+            timer.record("answer_question", time.perf_counter() - start)
+            timer.end()
+    finally:
+        if timer is not None:
+            timer.restore()
+        retriever.retrieve = original_retrieve
+        session.close()
+
+    total = len(questions)
+    return {
+        "stages": {stage: percentiles(samples) for stage, samples in timer.samples.items()},
+        "queries_per_question": {str(k): v for k, v in sorted(timer.attempts.items())},
+        "fallback_rate": round(sum(v for k, v in timer.attempts.items() if k > 1) / total, 3) if total else 0.0,
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=config.TOP_K)
+    parser.add_argument("--strategy", choices=["cascade", "wide", "planned"], default=config.RETRIEVAL_STRATEGY)
+    parser.add_argument("--backend", choices=["chroma", "numpy"], default=config.VECTOR_BACKEND)
+    parser.add_argument("--dim", type=int, default=256, help="dimensión de los vectores sintéticos")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="latencia artificial de /embeddings")
+    parser.add_argument("--chat-ms", type=float, default=0.0, help="latencia artificial de /chat/completions")
+    parser.add_argument("--token-ms", type=float, default=0.0, help="latencia artificial por token generado")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--warm-cache", action="store_true", help="usa la caché de embeddings de consulta")
+    parser.add_argument("--chroma-path", type=Path, default=None, help="persistir/reutilizar las colecciones sintéticas")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--out", type=Path, default=None)
+    parser.add_argument("--compare", type=Path, default=None)
+    args = parser.parse_args()
+
+    server = start_server(FakeOpenAIConfig(args.dim, args.embed_ms, args.chat_ms, args.token_ms, args.jitter))
+    config.API_KEY = config.API_KEY or "bench"
+    questions = make_questions(args.questions, args.seed)
+
+    collections: Dict[str, Any] = {}
+    stages: Dict[str, Any] = {}
+
+    with tempfile.TemporaryDirectory(prefix="bench_retrieval_") as tmp:
+        client = chromadb.PersistentClient(path=str(args.chroma_path or Path(tmp)),
+                                           settings=Settings(anonymized_telemetry=False))
+        for n in args.sizes:
+            # RSS muestreado por tamaño (construcción + consultas), no el máximo acumulado del proceso.
+            with RssSampler() as rss:
+                collection, build_s = build_collection(client, n, args.dim, args.seed)
+                if args.backend == "numpy":
+                    numpy_path = Path(tmp) / f"numpy_{n}"
+                    export_collection(collection, numpy_path)
+                    collection = NumpyCollection(numpy_path)
+                metadata_index = None
+                if args.strategy == "planned":
+                    index_path = Path(tmp) / f"metadata_index_{n}.json"
+                    build_metadata_index(collection.get(include=["metadatas"])["metadatas"], index_path)
+                    metadata_index = MetadataIndex(index_path, retriever_utils.matches_where)
+                result = run_size(collection, server.base_url, questions, args.top_k, args.strategy, args.warm_cache, metadata_index)
+
+            collections[str(n)] = {
+                "build_s": round(build_s, 2),
+                "queries_per_question": result["queries_per_question"],
+                "fallback_rate": result["fallback_rate"],
+                **rss.result(),
+            }
+            for stage, stats in result["stages"].items():
+                stages[f"{n}/{stage}"] = stats
+                print(f"{n:>9,} {stage:<24} p50 {stats['p50_ms']:>9.2f} ms  p95 {stats['p95_ms']:>9.2f} ms", flush=True)
+
+    server.shutdown()
+
+    results = {
+        "benchmark": "retrieval",
+        "questions": args.questions,
+        "top_k": args.top_k,
+        "strategy": args.strategy,
+        "backend": args.backend,
+        "dim": args.dim,
+        "latency_ms": {"embed": args.embed_ms, "chat": args.chat_ms, "token": args.token_ms, "jitter": args.jitter},
+        **environment(),
+        "collections": collections,
+        "stages": stages,
+        "process_peak_rss_mb": round(process_peak_rss_mb(), 1),
+    }
+
+    write_results(results, args.out)
+    if args.compare is not None:
+        compare(results, args.compare, ["p50_ms", "p95_ms", "p99_ms"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# ==============================================================================l
+# Utilidades compartidas por los benchmarks.                                    |
+#                                                                               |
+# - Medición de tiempo por etapa y memoria pico (RSS) del proceso y por etapa.  |
+# - Escritura de resultados en JSON y comparación contra una corrida previa.    |
+# ==============================================================================|
+import json
+import os
+import platform
+import resource
+import statistics
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+def process_peak_rss_mb() -> float:
+    # Máximo del proceso desde que arrancó (acumulado): no sirve para comparar etapas.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB; macOS reporta bytes.
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def current_rss_mb() -> Optional[float]:
+    # RSS actual (no el máximo); solo donde existe /proc (Linux).
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            pages = int(f.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+class RssSampler:
+    # Muestrea el RSS actual en un hilo mientras dura la etapa: pico y delta de esa etapa.
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.start_mb: Optional[float] = None
+        self.peak_mb: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _sample(self) -> None:
+        rss = current_rss_mb()
+        if rss is not None and (self.peak_mb is None or rss > self.peak_mb):
+            self.peak_mb = rss
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> "RssSampler":
+        self.start_mb = current_rss_mb()
+        self.peak_mb = self.start_mb
+        if self.start_mb is not None:
+            self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    def result(self) -> Dict[str, Any]:
+        if self.start_mb is None or self.peak_mb is None:
+            return {}
+        return {"peak_rss_mb": round(self.peak_mb, 1), "rss_delta_mb": round(self.peak_mb - self.start_mb, 1)}
+
+@contextmanager
+def timer(out: Dict[str, float], key: str = "seconds") -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        out[key] = out.get(key, 0.0) + time.perf_counter() - start
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pct(p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))]
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p50_ms": round(pct(0.50) * 1000, 3),
+        "p95_ms": round(pct(0.95) * 1000, 3),
+        "p99_ms": round(pct(0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def environment() -> Dict[str, Any]:
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+
+def write_results(results: Dict[str, Any], out: Optional[Path]) -> None:
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    print(text)
+    if out is not None:
+        out.parent.mkdir(parents=True, exist_ok=True)
+        out.write_text(text + "\n", encoding="utf-8")
+
+def compare(current: Dict[str, Any], baseline_path: Path, metric_keys: List[str]) -> None:
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))
+    print(f"\n--- comparación contra {baseline_path} ---")
+
+    for stage, values in current.get("stages", {}).items():
+        before = baseline.get("stages", {}).get(stage)
+        if not before:
+            continue
+        for key in metric_keys:
+            if key in values and before.get(key):
+                ratio = values[key] / before[key]
+                print(f"{stage:<42} {key:<14} {before[key]:>12.2f} -> {values[key]:>12.2f}  (x{ratio:.2f})")
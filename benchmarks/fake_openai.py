@@ -0,0 +1,182 @@
+# ==============================================================================l
+# Servidor HTTP local que imita la API de OpenAI para benchmarks.               |
+#                                                                               |
+# Responsabilidad:                                                              |
+# - POST /v1/embeddings: vectores deterministas por texto (float o base64).     |
+# - POST /v1/chat/completions: respuesta fija, con o sin stream (SSE).          |
+# - Latencia artificial configurable por endpoint (+ jitter y por token).       |
+#                                                                               |
+# No hace:                                                                      |
+# - No valida API keys ni modelos; no tiene rate limits.                        |
+#                                                                               |
+# Uso:                                                                          |
+#   python -m benchmarks.fake_openai --port 8765 --embed-ms 40 --chat-ms 800    |
+#   OpenAI(base_url="http://127.0.0.1:8765/v1", api_key="bench")                |
+# ==============================================================================|
+import argparse
+import base64
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Tuple
+import numpy as np
+
+ANSWER = ("- Utilidad neta: S/ 1,234,567 (Estados financieros auditados 2023, pág. 12)\n"
+          "- La cifra corresponde al ejercicio solicitado según la evidencia proporcionada.")
+
+@dataclass
+class FakeOpenAIConfig:
+    dim: int = 1536
+    embed_ms: float = 0.0
+    chat_ms: float = 0.0
+    token_ms: float = 0.0
+    jitter: float = 0.0
+
+def fake_embedding(text: str, dim: int) -> np.ndarray:
+    rng = np.random.default_rng(zlib.crc32(text.encode("utf-8")))
+    v = rng.standard_normal(dim).astype(np.float32)
+    return v / np.linalg.norm(v)
+
+def _sleep(ms: float, jitter: float) -> None:
+    if ms > 0:
+        time.sleep(ms / 1000 * (1 + random.uniform(-jitter, jitter)))
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    server: "FakeOpenAIServer"
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def _send_json(self, payload: Dict[str, Any]) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+
+        if self.path.endswith("/embeddings"):
+            self._embeddings(request)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(request)
+        else:
+            self.send_error(404)
+
+    def _embeddings(self, request: Dict[str, Any]) -> None:
+        cfg = self.server.cfg
+        texts = request.get("input") or []
+        if isinstance(texts, str):
+            texts = [texts]
+
+        _sleep(cfg.embed_ms, cfg.jitter)
+
+        data = []
+        for i, text in enumerate(texts):
+            v = fake_embedding(text, cfg.dim)
+            embedding: Any = (base64.b64encode(v.astype("<f4").tobytes()).decode("ascii")
+                              if request.get("encoding_format") == "base64" else v.tolist())
+            data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+        tokens = sum(_tokens(t) for t in texts)
+        self._send_json({
+            "object": "list",
+            "data": data,
+            "model": request.get("model", "fake"),
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        })
+
+    def _chat(self, request: Dict[str, Any]) -> None:
+        cfg = self.server.cfg
+        prompt_tokens = sum(_tokens(m.get("content") or "") for m in request.get("messages", []))
+        completion_tokens = _tokens(ANSWER)
+        model = request.get("model", "fake")
+        created = int(time.time())
+
+        _sleep(cfg.chat_ms, cfg.jitter)
+
+        if not request.get("stream"):
+            _sleep(cfg.token_ms * completion_tokens, cfg.jitter)
+            self._send_json({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": ANSWER}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(payload: Any) -> None:
+            data = f"data: {payload}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        for piece in ANSWER.split(" "):
+            _sleep(cfg.token_ms, cfg.jitter)
+            event(json.dumps({
+                "id": "chatcmpl-bench",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece + " "}, "finish_reason": None}],
+            }))
+        event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], cfg: FakeOpenAIConfig):
+        super().__init__(address, _Handler)
+        self.cfg = cfg
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+def start_server(cfg: FakeOpenAIConfig, host: str = "127.0.0.1", port: int = 0) -> FakeOpenAIServer:
+    server = FakeOpenAIServer((host, port), cfg)
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--embed-ms", type=float, default=0.0)
+    parser.add_argument("--chat-ms", type=float, default=0.0)
+    parser.add_argument("--token-ms", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0, help="fracción de variación aleatoria (ej. 0.2)")
+    args = parser.parse_args()
+
+    cfg = FakeOpenAIConfig(args.dim, args.embed_ms, args.chat_ms, args.token_ms, args.jitter)
+    server = FakeOpenAIServer((args.host, args.port), cfg)
+    print(f"fake OpenAI en {server.base_url}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -17,9 +17,55 @@ import os
 PDFS_PATH = Path("data/raw/")
 PAGES_FILE = Path("data/processed/pages.jsonl")
 CHUNKS_FILE = Path("data/processed/chunks.jsonl")
+CHUNK_STORE_PATH = Path("data/processed/chunk_store")
+BM25_INDEX_PATH = Path("data/processed/bm25")
+METADATA_INDEX_PATH = Path("data/processed/metadata_index.json")
+MANIFEST_FILE = Path("data/processed/manifest.json")
+INGEST_CACHE_PATH = Path("data/processed/cache")
 CHROMA_PATH = Path("vector_store")
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+NUMPY_INDEX_PATH = CHROMA_PATH.with_name("numpy_index")
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")
 API_KEY = os.getenv("OPENAI_API_KEY")
 BATCH_SIZE = 128
 EMBED_MODEL = "text-embedding-3-small"
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "openai")
+LOCAL_EMBED_DIM = 1536
+COLLECTION_NAME = "rag_finanzas" if EMBED_BACKEND == "openai" else f"rag_finanzas_{EMBED_BACKEND}"
 TOP_K = 10
-LLM_MODEL = "gpt-4o-mini"
\ No newline at end of file
+LLM_MODEL = "gpt-4o-mini"
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", "4000"))
+QUERY_CACHE_SIZE = 2048
+QUERY_CACHE_DISK = os.getenv("QUERY_CACHE_DISK", "0") == "1"
+QUERY_CACHE_PATH = CHROMA_PATH.with_name("query_cache")
+RETRIEVAL_STRATEGY = "cascade"
+WIDE_QUERY_FACTOR = 5
+RETRIEVAL_SEARCH = os.getenv("RETRIEVAL_SEARCH", "vector")
+BM25_K1 = 1.2
+BM25_B = 0.75
+HYBRID_RRF_K = 60
+HYBRID_QUERY_FACTOR = 2
+EMBED_BATCH_TOKENS = 100_000
+EMBED_BATCH_MAX_ITEMS = 2048
+QA_MAX_CONCURRENCY = 8
+ASYNC_EMBED_CONCURRENCY = 16
+ASYNC_QUERY_WORKERS = 8
+ASYNC_CHAT_CONCURRENCY = 64
+ASYNC_EMBED_TIMEOUT = 15.0
+ASYNC_QUERY_TIMEOUT = 10.0
+ASYNC_CHAT_TIMEOUT = 90.0
+INDEX_VERSION_FILE = CHROMA_PATH / "index_version"
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE", "0") == "1"
+ANSWER_CACHE_PATH = CHROMA_PATH.with_name("answer_cache.sqlite3")
+ANSWER_CACHE_TTL = 7 * 24 * 3600
+ANSWER_CACHE_MAX_ENTRIES = 10_000
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+EMBED_CONCURRENCY = 4
+EMBED_RPM = 3_000
+EMBED_TPM = 1_000_000
+EMBED_MAX_RETRIES = 6
+EMBED_STORE_ENABLED = os.getenv("EMBED_STORE", "1") == "1"
+EMBED_STORE_PATH = CHROMA_PATH.with_name("embedding_store")
+TRACE_ENABLED = os.getenv("TRACE", "0") == "1"
+TRACE_LOG_PATH = Path(os.getenv("TRACE_LOG", "logs/traces.jsonl"))
+TRACE_METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
@@ -0,0 +1,214 @@
+# ===================================================================================l
+# Índice léxico BM25 (término -> postings de chunks).                                |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Tokenizar chunks y preguntas igual (minúsculas, sin tildes, números completos    |
+#   como "1,234.56" y códigos como "4t2023" en un solo token).                       |
+# - Construir offline un índice invertido compacto: postings como arreglos numpy     |
+#   (ordinal de chunk uint32 + frecuencia uint16) más un léxico término -> rango.    |
+# - Guardar por chunk solo el chunk_id y las columnas de filtro (arreglos tipados).  |
+# - Abrir los arreglos con mmap en consulta y puntuar con BM25 sin red ni            |
+#   embeddings, filtrando con una máscara sobre las columnas (src.ingest.columns)    |
+#   con la misma semántica que Chroma (matches_where).                               |
+# - Registrar la versión del vector store con la que se construyó.                   |
+#                                                                                    |
+# No hace:                                                                           |
+# - No guarda el texto ni la metadata completa (se hidratan desde chunk_store).      |
+# - No fusiona con la búsqueda vectorial (eso es del retriever).                     |
+# ===================================================================================|
+import json
+import math
+import os
+import re
+import unicodedata
+from array import array
+from collections import Counter
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.config import BM25_INDEX_PATH, BM25_K1, BM25_B
+from src.ingest.columns import ColumnTable, save_array, save_columns, where_keys
+
+INDEX_VERSION = 2
+
+LEXICON_FILE = "lexicon.json"
+POSTINGS_FILE = "postings.npy"
+TFS_FILE = "tfs.npy"
+DOC_LEN_FILE = "doc_len.npy"
+CHUNK_IDS_FILE = "chunk_ids.npy"
+
+# Claves de metadata que puede usar un filtro where (las que produce loader.extract_metadata).
+FILTER_COLUMNS = ("doc_id", "doc_type", "year", "period", "audited")
+
+TOKEN_RE = re.compile(r"\w+(?:[.,]\d+)*")
+MAX_TF = 65535
+
+STOPWORDS = {
+    "a", "al", "como", "con", "cual", "cuales", "de", "del", "el", "en", "es", "fue", "la", "las",
+    "lo", "los", "o", "para", "por", "que", "se", "su", "sus", "un", "una", "y",
+    "and", "of", "the", "to",
+}
+
+def fold(text: str) -> str:
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(fold(text)) if t not in STOPWORDS]
+
+def build_bm25_index(chunks: Iterable[Dict[str, Any]],
+                     path: Path = BM25_INDEX_PATH,
+                     index_version: Optional[str] = None) -> int:
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    postings: Dict[str, Tuple[array, array]] = {}
+    doc_len = array("I")
+    chunk_ids: List[bytes] = []
+    values_by_name: Dict[str, List[Any]] = {name: [] for name in FILTER_COLUMNS}
+
+    for ordinal, chunk_record in enumerate(chunks):
+        tokens = tokenize(chunk_record["chunk_text"])
+        doc_len.append(len(tokens))
+        chunk_ids.append(str(chunk_record["chunk_id"]).encode("utf-8"))
+        for name, values in values_by_name.items():
+            values.append(chunk_record.get(name))
+
+        for term, tf in Counter(tokens).items():
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array("I"), array("H"))
+            entry[0].append(ordinal)
+            entry[1].append(min(tf, MAX_TF))
+
+    terms: Dict[str, List[int]] = {}
+    all_docs = array("I")
+    all_tfs = array("H")
+    for term in sorted(postings):
+        ids, tfs = postings[term]
+        terms[term] = [len(all_docs), len(ids)]
+        all_docs.extend(ids)
+        all_tfs.extend(tfs)
+
+    save_array(path / POSTINGS_FILE, np.frombuffer(all_docs, dtype=np.uint32))
+    save_array(path / TFS_FILE, np.frombuffer(all_tfs, dtype=np.uint16))
+    save_array(path / DOC_LEN_FILE, np.frombuffer(doc_len, dtype=np.uint32))
+    # Ancho fijo para poder abrirlo con mmap; numpy recorta los bytes nulos al leer.
+    save_array(path / CHUNK_IDS_FILE, np.array(chunk_ids, dtype=f"S{max(map(len, chunk_ids), default=1)}"))
+
+    columns = save_columns(path, values_by_name)
+
+    # El léxico se escribe al final: su presencia marca un índice completo.
+    n_docs = len(doc_len)
+    lexicon = {
+        "version": INDEX_VERSION,
+        "index_version": index_version,
+        "n_docs": n_docs,
+        "avgdl": (sum(doc_len) / n_docs) if n_docs else 0.0,
+        "columns": columns,
+        "terms": terms,
+    }
+    lexicon_tmp = path / (LEXICON_FILE + ".tmp")
+    with lexicon_tmp.open("w", encoding="utf-8") as f:
+        json.dump(lexicon, f, ensure_ascii=False)
+    os.replace(lexicon_tmp, path / LEXICON_FILE)
+
+    return n_docs
+
+class Bm25Index:
+    def __init__(self,
+                 path: Path = BM25_INDEX_PATH,
+                 k1: float = BM25_K1,
+                 b: float = BM25_B,
+                 index_version: Optional[str] = None):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+
+        lexicon_path = self.path / LEXICON_FILE
+        if not lexicon_path.exists():
+            raise FileNotFoundError(f"El índice BM25 {self.path} no existe.")
+
+        with lexicon_path.open("r", encoding="utf-8") as f:
+            lexicon = json.load(f)
+        if lexicon.get("version") != INDEX_VERSION:
+            raise ValueError(f"Versión de índice BM25 no soportada en {self.path}: {lexicon.get('version')}")
+        # Con index_version se exige que el índice corresponda al vector store actual.
+        if index_version is not None and lexicon.get("index_version") != index_version:
+            raise ValueError(f"El índice BM25 {self.path} está desactualizado respecto del vector store "
+                             f"({lexicon.get('index_version')} != {index_version}); regenérelo con build_index.build_search_indexes.")
+
+        self.n_docs: int = lexicon["n_docs"]
+        self.avgdl: float = lexicon["avgdl"] or 1.0
+        self.terms: Dict[str, List[int]] = lexicon["terms"]
+        self.columns: Dict[str, Any] = lexicon["columns"]
+
+        self._chunk_ids = np.load(self.path / CHUNK_IDS_FILE, mmap_mode="r")
+        self._table = ColumnTable(self.path, self.columns, self.n_docs)
+
+        self._postings = np.load(self.path / POSTINGS_FILE, mmap_mode="r")
+        self._tfs = np.load(self.path / TFS_FILE, mmap_mode="r")
+        doc_len = np.load(self.path / DOC_LEN_FILE, mmap_mode="r")
+
+        # Parte del denominador de BM25 que solo depende del largo del chunk.
+        self._norm = (k1 * (1.0 - b + b * doc_len / self.avgdl)).astype(np.float32)
+
+    def __len__(self) -> int:
+        return self.n_docs
+
+    def chunk_id(self, ordinal: int) -> str:
+        return self._chunk_ids[ordinal].decode("utf-8")
+
+    def row(self, ordinal: int) -> Dict[str, Any]:
+        # Solo las columnas de filtro, con la misma forma que la metadata del chunk.
+        return self._table.row(ordinal)
+
+    def idf(self, df: int) -> float:
+        return math.log(1.0 + (self.n_docs - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+
+        for term in set(tokenize(query)):
+            entry = self.terms.get(term)
+            if entry is None:
+                continue
+            start, df = entry
+            ids = self._postings[start:start + df]
+            tfs = self._tfs[start:start + df].astype(np.float32)
+            scores[ids] += self.idf(df) * tfs * (self.k1 + 1.0) / (tfs + self._norm[ids])
+
+        return scores
+
+    def _top(self, scores: np.ndarray, candidates: np.ndarray, top_k: int) -> List[Tuple[int, float]]:
+        # candidates viene en orden de ordinal: los empates se resuelven igual que un orden estable completo.
+        if len(candidates) > top_k:
+            kth = -np.partition(-scores[candidates], top_k - 1)[top_k - 1]
+            candidates = candidates[scores[candidates] >= kth]
+        order = candidates[np.argsort(-scores[candidates], kind="stable")][:top_k]
+        return [(int(i), float(scores[i])) for i in order]
+
+    def search(self,
+               query: str,
+               top_k: int,
+               where: Optional[Dict[str, Any]] = None,
+               matches: Optional[Callable[[Dict[str, Any], Optional[Dict[str, Any]]], bool]] = None) -> List[Tuple[int, float]]:
+        scores = self.scores(query)
+        candidates = np.flatnonzero(scores)
+        if not len(candidates) or top_k <= 0:
+            return []
+
+        if not where or matches is None:
+            return self._top(scores, candidates, top_k)
+
+        unknown = set(where_keys(where)) - set(self.columns)
+        if unknown:
+            raise ValueError(f"El índice BM25 no tiene columnas de filtro para: {sorted(unknown)}")
+
+        # Operadores que las columnas no expresan: esa condición sola se evalúa fila a fila.
+        def fallback(key: str, op: str, c: Any) -> np.ndarray:
+            return np.fromiter((matches(self.row(i), {key: {op: c}}) for i in range(self.n_docs)), dtype=bool, count=self.n_docs)
+
+        mask = self._table.mask(where, fallback)
+        candidates = candidates[mask[candidates]]
+        return self._top(scores, candidates, top_k)
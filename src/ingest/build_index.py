@@ -12,12 +12,23 @@
 # ==============================================================================|
 import os
 import json
+import threading
+import time
+import uuid
 from pathlib import Path
-from typing import List, Dict, Any, Iterator, Set
+from typing import List, Dict, Any, Iterator, Iterable, Callable, Optional, Set
 import chromadb
 from chromadb.config import Settings
-from openai import OpenAI
-from src.config import CHUNKS_FILE, CHROMA_PATH, BATCH_SIZE, EMBED_MODEL, API_KEY
+from openai import AsyncOpenAI, OpenAI
+from src.config import CHUNKS_FILE, CHROMA_PATH, BATCH_SIZE, EMBED_MODEL, API_KEY, INDEX_VERSION_FILE, EMBED_BATCH_TOKENS, EMBED_BATCH_MAX_ITEMS
+from src.config import EMBED_STORE_ENABLED, EMBED_STORE_PATH, EMBED_BACKEND, COLLECTION_NAME, BM25_INDEX_PATH, METADATA_INDEX_PATH
+from src.ingest.bm25_index import build_bm25_index
+from src.ingest.metadata_index import build_metadata_index
+from src.ingest.tokens import estimate_tokens
+from src.ingest.embedding_store import EmbeddingStore, content_key
+from src.ingest.embeddings import EmbeddingBackend, get_embedding_backend
+
+Embedder = OpenAI | EmbeddingBackend
 
 def iter_chunks_from_file(chunks_file_path: Path) -> Iterator[Dict[str, Any]]:
     if not chunks_file_path.exists():
@@ -40,7 +51,26 @@ def iter_chunks_from_file(chunks_file_path: Path) -> Iterator[Dict[str, Any]]:
             
             yield chunk_record
 
-def batch_iter(chunks_generator: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+def build_lexical_index(chunks_file_path: Path = CHUNKS_FILE, index_path: Path = BM25_INDEX_PATH) -> int:
+    # Índice BM25 del mismo archivo de chunks que alimenta a Chroma (sin embeddings),
+    # sellado con la versión actual del vector store: el retriever rechaza otra versión.
+    return build_bm25_index(iter_chunks_from_file(chunks_file_path), index_path, index_version=read_index_version())
+
+def build_search_indexes(chunks_file_path: Path = CHUNKS_FILE) -> Dict[str, int]:
+    # Índices derivados de chunks.jsonl que deben acompañar a cada cambio del vector store.
+    return {
+        "bm25": build_lexical_index(chunks_file_path),
+        "metadata": build_metadata_index(iter_chunks_from_file(chunks_file_path), METADATA_INDEX_PATH,
+                                         index_version=read_index_version()),
+    }
+
+def batch_iter(chunks_generator: Iterator[Dict[str, Any]],
+               batch_size: int,
+               max_tokens: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    if max_tokens:
+        yield from batch_by_tokens(chunks_generator, max_tokens, batch_size, text_of=lambda c: c["chunk_text"])
+        return
+
     batch: List[Dict[str, Any]] = []
     for item in chunks_generator:
         batch.append(item)
@@ -52,23 +82,60 @@ def batch_iter(chunks_generator: Iterator[Dict[str, Any]], batch_size: int) -> I
     if batch:
         yield batch
 
-def get_clients() -> tuple[OpenAI, chromadb.api.Collection]:
+def batch_by_tokens(items: Iterable[Any],
+                    max_tokens: int,
+                    max_items: int,
+                    text_of: Callable[[Any], str] = lambda x: x) -> Iterator[List[Any]]:
+    batch: List[Any] = []
+    batch_tokens = 0
+
+    for item in items:
+        tokens = estimate_tokens(text_of(item))
+
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_items):
+            yield batch
+            batch = []
+            batch_tokens = 0
+
+        batch.append(item)
+        batch_tokens += tokens
+
+    if batch:
+        yield batch
+
+def get_openai_client() -> OpenAI:
     if not API_KEY:
         raise ValueError("La variable de entorno OPENAI_API_KEY no fue encontrada.")
     
-    oai = OpenAI(api_key=API_KEY)
+    return OpenAI(api_key=API_KEY)
+
+def get_async_openai_client() -> AsyncOpenAI:
+    if not API_KEY:
+        raise ValueError("La variable de entorno OPENAI_API_KEY no fue encontrada.")
     
+    return AsyncOpenAI(api_key=API_KEY)
+
+def get_collection() -> chromadb.api.Collection:
     chroma = chromadb.PersistentClient(
         path=str(CHROMA_PATH),
         settings=Settings(anonymized_telemetry=False)
     )
     
-    collection = chroma.get_or_create_collection(
-        name="rag_finanzas",
+    return chroma.get_or_create_collection(
+        name=COLLECTION_NAME,
         metadata={"hnsw:space": "cosine"}
     )
-    
-    return oai, collection
+
+def get_embedder() -> EmbeddingBackend:
+    oai = get_openai_client() if EMBED_BACKEND == "openai" else None
+    return get_embedding_backend(oai)
+
+def get_clients() -> tuple[OpenAI, chromadb.api.Collection]:
+    return get_openai_client(), get_collection()
+
+def get_embedder_and_collection() -> tuple[EmbeddingBackend, chromadb.api.Collection]:
+    # Como get_clients, pero con el backend de config.EMBED_BACKEND (openai o local).
+    return get_embedder(), get_collection()
 
 def filter_existing_chunk_ids(collection: chromadb.api.Collection, chunk_ids: List[str]) -> Set[str]:
     if collection.count() == 0:
@@ -91,17 +158,80 @@ def filter_existing_chunk_ids(collection: chromadb.api.Collection, chunk_ids: Li
     
     return existing_ids
 
-def embed_texts(oai: OpenAI, texts: List[str]) -> List[List[float]]:
+def embedder_model(oai: Embedder) -> str:
+    return oai.model_name if isinstance(oai, EmbeddingBackend) else EMBED_MODEL
+
+def embed_texts(oai: Embedder, texts: List[str]) -> List[List[float]]:
+    if isinstance(oai, EmbeddingBackend):
+        return oai.embed(texts)
     resp = oai.embeddings.create(model=EMBED_MODEL, input=texts)
     return [d.embedding for d in resp.data]
 
-def index_batch(collection: chromadb.api.Collection, oai: OpenAI, batch: List[Dict[str, Any]]) -> int:
+def embed_texts_budgeted(oai: Embedder,
+                         texts: List[str],
+                         max_tokens: int = EMBED_BATCH_TOKENS,
+                         max_items: int = EMBED_BATCH_MAX_ITEMS) -> List[List[float]]:
+    vectors: List[List[float]] = []
+    for sub in batch_by_tokens(texts, max_tokens, max_items):
+        vectors.extend(embed_texts(oai, sub))
+    return vectors
+
+def embed_with_store(texts: List[str],
+                     embed: Callable[[List[str]], List[List[float]]],
+                     store: Optional[EmbeddingStore],
+                     model: str = EMBED_MODEL) -> List[List[float]]:
+    if store is None:
+        return embed(texts)
+
+    keys = [content_key(model, t) for t in texts]
+    found: Dict[str, Any] = {}
+    misses: Dict[str, str] = {}
+
+    for key, text in zip(keys, texts):
+        if key in found or key in misses:
+            continue
+        vector = store.get(key)
+        if vector is not None:
+            found[key] = vector.tolist()
+        else:
+            misses[key] = text
+
+    if misses:
+        embedded = embed(list(misses.values()))
+        store.put_many(zip(misses.keys(), embedded))
+        found.update(zip(misses.keys(), embedded))
+
+    return [found[k] for k in keys]
+
+_embedding_store: Optional[EmbeddingStore] = None
+_embedding_store_lock = threading.Lock()
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    global _embedding_store
+    if not EMBED_STORE_ENABLED:
+        return None
+    if _embedding_store is None:
+        with _embedding_store_lock:
+            if _embedding_store is None:
+                _embedding_store = EmbeddingStore(EMBED_STORE_PATH)
+    return _embedding_store
+
+def resolve_embedding_store(store: Optional[EmbeddingStore], use_store: bool = True) -> Optional[EmbeddingStore]:
+    # Un almacén recién creado está vacío y es falsy (__len__): se compara con None.
+    if not use_store:
+        return None
+    return store if store is not None else get_embedding_store()
+
+async def embed_texts_async(oai: AsyncOpenAI | EmbeddingBackend, texts: List[str]) -> List[List[float]]:
+    if isinstance(oai, EmbeddingBackend):
+        return await oai.embed_async(texts)
+    resp = await oai.embeddings.create(model=EMBED_MODEL, input=texts)
+    return [d.embedding for d in resp.data]
+
+def prepare_batch(collection: chromadb.api.Collection, batch: List[Dict[str, Any]]) -> tuple[List[str], List[str], List[Dict[str, Any]]]:
     ids = [c["chunk_id"] for c in batch]
     existing = filter_existing_chunk_ids(collection, ids)
     new = [c for c in batch if c["chunk_id"] not in existing]
-    
-    if not new:
-        return 0
 
     documents: List[str] = [c["chunk_text"] for c in new]
     metadatas = []
@@ -112,8 +242,21 @@ def index_batch(collection: chromadb.api.Collection, oai: OpenAI, batch: List[Di
         m = dict(c)
         m.pop("chunk_text", None)
         metadatas.append(m)
+
+    return new_ids, documents, metadatas
+
+def index_batch(collection: chromadb.api.Collection,
+                oai: Embedder,
+                batch: List[Dict[str, Any]],
+                store: Optional[EmbeddingStore] = None,
+                use_store: bool = True) -> int:
+    new_ids, documents, metadatas = prepare_batch(collection, batch)
     
-    vectors = embed_texts(oai, documents)
+    if not new_ids:
+        return 0
+    
+    store = resolve_embedding_store(store, use_store)
+    vectors = embed_with_store(documents, lambda texts: embed_texts_budgeted(oai, texts), store, model=embedder_model(oai))
 
     collection.add(
         ids=new_ids,
@@ -122,6 +265,22 @@ def index_batch(collection: chromadb.api.Collection, oai: OpenAI, batch: List[Di
         metadatas=metadatas
     )
 
+    bump_index_version()
+
     return len(new_ids)
 
+def read_index_version() -> str:
+    try:
+        return INDEX_VERSION_FILE.read_text(encoding="utf-8").strip() or "0"
+    except FileNotFoundError:
+        return "0"
+
+def bump_index_version() -> str:
+    version = f"{time.time_ns():x}-{uuid.uuid4().hex[:8]}"
+    INDEX_VERSION_FILE.parent.mkdir(parents=True, exist_ok=True)
+    tmp = INDEX_VERSION_FILE.with_suffix(".tmp")
+    tmp.write_text(version, encoding="utf-8")
+    os.replace(tmp, INDEX_VERSION_FILE)
+    return version
+
 
@@ -0,0 +1,234 @@
+# ===================================================================================l
+# Almacén binario de chunks (chunk_id -> registro) con acceso directo.               |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Guardar cada chunk como registro con prefijo de largo (u32 + JSON UTF-8).        |
+# - Mantener un índice ordenado (hash64(chunk_id), offset) que se lee vía mmap y     |
+#   se consulta con búsqueda binaria: no hay que parsear el archivo completo.        |
+# - Mantener una tabla doc_id -> rangos de registros contiguos.                      |
+# - Ofrecer un lector secuencial rápido para la indexación.                          |
+#                                                                                    |
+# No hace:                                                                           |
+# - No genera chunks (eso es del splitter) ni embeddings.                            |
+# - No actualiza registros en sitio: el almacén se reescribe completo.               |
+# ===================================================================================|
+import hashlib
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from src.config import CHUNK_STORE_PATH
+
+STORE_VERSION = 1
+
+RECORDS_FILE = "records.bin"
+INDEX_FILE = "index.bin"
+DOCS_FILE = "docs.json"
+
+LENGTH = struct.Struct("<I")
+# Orden nativo, igual que la vista memoryview.cast("Q") con la que se lee.
+INDEX_ENTRY = struct.Struct("=QQ")
+
+def chunk_key(chunk_id: str) -> int:
+    return int.from_bytes(hashlib.blake2b(chunk_id.encode("utf-8"), digest_size=8).digest(), "little")
+
+class ChunkStoreWriter:
+    def __init__(self, path: Path = CHUNK_STORE_PATH):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._records_tmp = self.path / (RECORDS_FILE + ".tmp")
+        self._f = self._records_tmp.open("wb")
+        self._offset = 0
+        self._entries: List[Tuple[int, int]] = []
+        self._docs: Dict[str, List[List[int]]] = {}
+        self.count = 0
+
+    def add(self, chunk_record: Dict[str, Any]) -> None:
+        if "chunk_id" not in chunk_record or "chunk_text" not in chunk_record:
+            raise ValueError("El registro carece de 'chunk_id' o 'chunk_text'.")
+
+        data = json.dumps(chunk_record, ensure_ascii=False).encode("utf-8")
+        offset = self._offset
+        self._f.write(LENGTH.pack(len(data)))
+        self._f.write(data)
+        self._offset += LENGTH.size + len(data)
+
+        self._entries.append((chunk_key(chunk_record["chunk_id"]), offset))
+
+        # Un doc suele llegar contiguo (una sola corrida); si reaparece se abre otro rango.
+        ranges = self._docs.setdefault(str(chunk_record.get("doc_id", "")), [])
+        if ranges and ranges[-1][1] == offset:
+            ranges[-1][1] = self._offset
+            ranges[-1][2] += 1
+        else:
+            ranges.append([offset, self._offset, 1])
+
+        self.count += 1
+
+    def add_many(self, chunk_records: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for chunk_record in chunk_records:
+            self.add(chunk_record)
+            n += 1
+        return n
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        self._f.close()
+
+        # Orden estable: ante chunk_id repetidos gana el primero escrito (como en Chroma).
+        self._entries.sort()
+        index_tmp = self.path / (INDEX_FILE + ".tmp")
+        with index_tmp.open("wb") as f:
+            for key, offset in self._entries:
+                f.write(INDEX_ENTRY.pack(key, offset))
+
+        docs_tmp = self.path / (DOCS_FILE + ".tmp")
+        with docs_tmp.open("w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "count": self.count, "size": self._offset, "docs": self._docs},
+                      f, ensure_ascii=False)
+
+        os.replace(self._records_tmp, self.path / RECORDS_FILE)
+        os.replace(index_tmp, self.path / INDEX_FILE)
+        os.replace(docs_tmp, self.path / DOCS_FILE)
+
+    def abort(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+        self._records_tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "ChunkStoreWriter":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc: Any) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+class ChunkStore:
+    def __init__(self, path: Path = CHUNK_STORE_PATH):
+        self.path = Path(path)
+
+        docs_path = self.path / DOCS_FILE
+        if not docs_path.exists():
+            raise FileNotFoundError(f"El almacén de chunks {self.path} no existe.")
+
+        with docs_path.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != STORE_VERSION:
+            raise ValueError(f"Versión de almacén de chunks no soportada en {self.path}: {meta.get('version')}")
+
+        self.count: int = meta["count"]
+        self.docs: Dict[str, List[List[int]]] = meta["docs"]
+
+        self._records = self._map(self.path / RECORDS_FILE)
+        self._index = self._map(self.path / INDEX_FILE)
+
+        if len(self._records) != meta["size"]:
+            raise ValueError(f"El almacén de chunks {self.path} está incompleto (tamaño distinto al registrado).")
+
+        # Vista u64 sin copia: posiciones pares = hash, impares = offset.
+        self._slots = memoryview(self._index).cast("Q") if len(self._index) else memoryview(b"").cast("Q")
+
+    @staticmethod
+    def _map(path: Path) -> mmap.mmap | bytes:
+        with path.open("rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return self._lookup(chunk_id) is not None
+
+    def _read_at(self, offset: int) -> Tuple[Dict[str, Any], int]:
+        (size,) = LENGTH.unpack_from(self._records, offset)
+        start = offset + LENGTH.size
+        return json.loads(self._records[start:start + size]), start + size
+
+    def _lookup(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        key = chunk_key(chunk_id)
+        slots = self._slots
+        lo, hi = 0, len(slots) // 2
+
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if slots[2 * mid] < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        # Colisiones de hash (improbables): se confirma el chunk_id leyendo el registro.
+        while lo < len(slots) // 2 and slots[2 * lo] == key:
+            record, _ = self._read_at(slots[2 * lo + 1])
+            if record.get("chunk_id") == chunk_id:
+                return record
+            lo += 1
+
+        return None
+
+    def get(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        return self._lookup(chunk_id)
+
+    def get_many(self, chunk_ids: Iterable[str]) -> List[Optional[Dict[str, Any]]]:
+        return [self.get(chunk_id) for chunk_id in chunk_ids]
+
+    def _iter_range(self, start: int, end: int) -> Iterator[Dict[str, Any]]:
+        offset = start
+        while offset < end:
+            record, offset = self._read_at(offset)
+            yield record
+
+    def iter_doc(self, doc_id: str) -> Iterator[Dict[str, Any]]:
+        for start, end, _ in self.docs.get(doc_id, []):
+            yield from self._iter_range(start, end)
+
+    def doc_ids(self) -> List[str]:
+        return list(self.docs)
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return self._iter_range(0, len(self._records))
+
+    def close(self) -> None:
+        self._slots.release()
+        for m in (self._records, self._index):
+            if isinstance(m, mmap.mmap):
+                m.close()
+
+    def __enter__(self) -> "ChunkStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+def iter_chunks_from_store(path: Path = CHUNK_STORE_PATH) -> Iterator[Dict[str, Any]]:
+    # Lector secuencial: recorre records.bin en orden de escritura sin tocar el índice.
+    records_path = Path(path) / RECORDS_FILE
+    if not records_path.exists():
+        raise FileNotFoundError(f"El almacén de chunks {path} no existe.")
+
+    with records_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset, end = 0, len(mm)
+            while offset < end:
+                (size,) = LENGTH.unpack_from(mm, offset)
+                start = offset + LENGTH.size
+                offset = start + size
+                yield json.loads(mm[start:offset])
+
+def build_from_jsonl(chunks_file: Path, path: Path = CHUNK_STORE_PATH) -> int:
+    with chunks_file.open("r", encoding="utf-8") as f, ChunkStoreWriter(path) as writer:
+        for line in f:
+            line = line.strip()
+            if line:
+                writer.add(json.loads(line))
+    return writer.count
@@ -11,17 +11,42 @@
 # - No asigna metadata (eso viene del loader).                                       |
 # ===================================================================================|
 import re
+from typing import Iterable, Iterator
+
+# Reglas precompiladas, en el mismo orden que las aplicaba clean_text originalmente:
+# 1) une palabras cortadas con guion al final de línea,
+# 2) une líneas partidas entre caracteres de palabra,
+# 3) quita espacios/tabs antes de un salto,
+# 4) colapsa 3+ saltos en un párrafo,
+# 5) colapsa espacios/tabs repetidos.
+# La regla "letra\nletra" -> "letra letra" que venía después de (2) ya no podía coincidir
+# (toda letra es \w y (2) consume ese salto), así que se eliminó sin cambiar la salida.
+HYPHEN_BREAK_RE = re.compile(r"(\w)-\n(\w)")
+# Equivale a (?<=\w)\s*\n\s*(?=\w), pero empieza por \s para que el motor salte rápido
+# las posiciones que no son espacio: la corrida debe seguir a un \w y contener un salto.
+LINE_BREAK_RE = re.compile(r"\s(?<=\w\s)(?:(?<=\n)|(?=[^\S\n]*\n))\s*(?=\w)")
+TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+BLANK_LINES_RE = re.compile(r"\n{3,}")
+MULTI_SPACE_RE = re.compile(r"[ \t]{2,}")
 
 def clean_text(text: str) -> str:
     if not text:
         return ""
-    
-    # Clearning rules
-    text = re.sub(r"(\w)-\n(\w)", r"\1\2", text)
-    text = re.sub(r"(?<=\w)\s*\n\s*(?=\w)", " ", text)
-    text = re.sub(r"([A-Za-zÁÉÍÓÚÜÑáéíóúüñ])\n([A-Za-zÁÉÍÓÚÜÑáéíóúüñ])", r"\1 \2", text)
-    text = re.sub(r"[ \t]+\n", "\n", text)
-    text = re.sub(r"\n{3,}", "\n\n", text)
-    text = re.sub(r"[ \t]{2,}", " ", text)
-    
-    return text.strip()
\ No newline at end of file
+
+    # Las comprobaciones con "in" evitan recorrer la página cuando la regla no puede aplicar.
+    if "-\n" in text:
+        text = HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    text = LINE_BREAK_RE.sub(" ", text)
+    if " \n" in text or "\t\n" in text:
+        text = TRAILING_SPACE_RE.sub("\n", text)
+    if "\n\n\n" in text:
+        text = BLANK_LINES_RE.sub("\n\n", text)
+    text = MULTI_SPACE_RE.sub(" ", text)
+
+    return text.strip()
+
+def iter_clean_pages(pages: Iterable[dict]) -> Iterator[dict]:
+    # Limpia página por página a medida que llegan: no retiene el documento completo.
+    for page in pages:
+        page["page_text"] = clean_text(page["page_text"])
+        yield page
@@ -0,0 +1,197 @@
+# ===================================================================================l
+# Columnas de metadata tipadas (metadata por fila -> arreglos numpy + máscaras).     |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Guardar columnas de filtro como arreglos .npy: strings codificados contra un     |
+#   vocabulario (int32, -1 = ausente) y enteros/booleanos (int64 + máscara present). |
+# - Abrirlas con mmap y traducir un filtro where a una máscara booleana vectorizada  |
+#   (con caché LRU), con la misma semántica que matches_where.                       |
+# - Compartido por bm25_index y numpy_collection.                                    |
+#                                                                                    |
+# No hace:                                                                           |
+# - No evalúa fila a fila: lo que las columnas no expresan lo resuelve el llamador.  |
+# ===================================================================================|
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+MASK_CACHE_SIZE = 128
+
+# (clave, operador, valor) -> máscara, para condiciones sin columna tipada.
+Fallback = Callable[[str, str, Any], np.ndarray]
+
+def save_array(path: Path, data: np.ndarray) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("wb") as f:
+        np.save(f, data)
+    os.replace(tmp, path)
+
+def column_file(name: str) -> str:
+    return f"col_{name}.npy"
+
+def where_keys(where: Dict[str, Any]) -> Iterator[str]:
+    for key, cond in where.items():
+        if key in ("$and", "$or"):
+            for sub in cond:
+                yield from where_keys(sub)
+        else:
+            yield key
+
+def build_columns(values_by_name: Dict[str, List[Any]]) -> Tuple[Dict[str, np.ndarray], Dict[str, Any]]:
+    arrays: Dict[str, np.ndarray] = {}
+    columns: Dict[str, Any] = {}
+
+    for name, values in values_by_name.items():
+        if all(v is None or isinstance(v, str) for v in values):
+            vocab = sorted({v for v in values if v is not None})
+            code_of = {v: i for i, v in enumerate(vocab)}
+            arrays[name] = np.array([code_of[v] if v is not None else -1 for v in values], dtype=np.int32)
+            columns[name] = {"kind": "coded", "vocab": vocab}
+            continue
+
+        # bool e int no se mezclan: True == 1 en Python, pero el tipo guardado debe ser uno solo.
+        is_bool = all(v is None or isinstance(v, bool) for v in values)
+        is_int = all(v is None or (isinstance(v, int) and not isinstance(v, bool)) for v in values)
+        if not (is_bool or is_int):
+            continue
+        arrays[name] = np.array([int(v) if v is not None else 0 for v in values], dtype=np.int64)
+        arrays[f"{name}__present"] = np.array([v is not None for v in values], dtype=bool)
+        columns[name] = {"kind": "bool" if is_bool else "int"}
+
+    return arrays, columns
+
+def save_columns(path: Path, values_by_name: Dict[str, List[Any]]) -> Dict[str, Any]:
+    arrays, columns = build_columns(values_by_name)
+    for name, data in arrays.items():
+        save_array(Path(path) / column_file(name), data)
+    return columns
+
+class ColumnTable:
+    def __init__(self, path: Path, columns: Dict[str, Any], count: int):
+        self.columns = columns
+        self.count = count
+
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, info in columns.items():
+            self._arrays[name] = np.load(Path(path) / column_file(name), mmap_mode="r")
+            if info["kind"] != "coded":
+                self._arrays[f"{name}__present"] = np.load(Path(path) / column_file(f"{name}__present"), mmap_mode="r")
+        self._codes = {name: {v: i for i, v in enumerate(c["vocab"])} for name, c in columns.items() if c["kind"] == "coded"}
+
+        self._lock = threading.Lock()
+        self._masks: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def row(self, ordinal: int) -> Dict[str, Any]:
+        # Las columnas de una fila con la misma forma que su metadata (sin claves ausentes).
+        row: Dict[str, Any] = {}
+        for name, info in self.columns.items():
+            if info["kind"] == "coded":
+                code = int(self._arrays[name][ordinal])
+                if code >= 0:
+                    row[name] = info["vocab"][code]
+            elif self._arrays[f"{name}__present"][ordinal]:
+                value = int(self._arrays[name][ordinal])
+                row[name] = bool(value) if info["kind"] == "bool" else value
+        return row
+
+    def column_mask(self, key: str, op: str, c: Any) -> Optional[np.ndarray]:
+        # None = la columna no existe o no puede expresar esta condición.
+        info = self.columns.get(key)
+        if info is None:
+            return None
+        values = self._arrays[key]
+
+        if info["kind"] == "coded":
+            def code(v: Any) -> Optional[int]:
+                if v is None:
+                    return -1
+                if not isinstance(v, str):
+                    return None
+                return self._codes[key].get(v, -2)
+
+            if op in ("$eq", "$ne"):
+                k = code(c)
+                if k is None:
+                    return None
+                mask = values == k
+                return mask if op == "$eq" else ~mask
+            if op in ("$in", "$nin") and isinstance(c, (list, tuple, set)):
+                ks = [code(v) for v in c]
+                if any(k is None for k in ks):
+                    return None
+                mask = np.isin(values, ks)
+                return mask if op == "$in" else ~mask
+            return None
+
+        present = self._arrays[f"{key}__present"]
+        scalar_ok = lambda v: v is None or isinstance(v, (int, float))
+
+        if op in ("$eq", "$ne"):
+            if not scalar_ok(c):
+                return None
+            mask = ~present if c is None else present & (values == c)
+            return mask if op == "$eq" else ~mask
+        if op in ("$in", "$nin") and isinstance(c, (list, tuple, set)):
+            if not all(scalar_ok(v) for v in c):
+                return None
+            nums = [v for v in c if v is not None]
+            mask = present & np.isin(values, nums) if nums else np.zeros(len(values), dtype=bool)
+            if any(v is None for v in c):
+                mask = mask | ~present
+            return mask if op == "$in" else ~mask
+        if op in ("$gt", "$gte", "$lt", "$lte") and isinstance(c, (int, float)) and not isinstance(c, bool):
+            compare = {"$gt": np.greater, "$gte": np.greater_equal, "$lt": np.less, "$lte": np.less_equal}[op]
+            return present & compare(values, c)
+        return None
+
+    def _condition_mask(self, key: str, cond: Any, fallback: Fallback) -> np.ndarray:
+        ops = cond.items() if isinstance(cond, dict) else [("$eq", cond)]
+        mask = np.ones(self.count, dtype=bool)
+
+        for op, c in ops:
+            m = self.column_mask(key, op, c)
+            mask &= m if m is not None else fallback(key, op, c)
+
+        return mask
+
+    def _where_mask(self, where: Dict[str, Any], fallback: Fallback) -> np.ndarray:
+        mask = np.ones(self.count, dtype=bool)
+
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._where_mask(sub, fallback)
+            elif key == "$or":
+                any_mask = np.zeros(self.count, dtype=bool)
+                for sub in cond:
+                    any_mask |= self._where_mask(sub, fallback)
+                mask &= any_mask
+            else:
+                mask &= self._condition_mask(key, cond, fallback)
+
+        return mask
+
+    def mask(self, where: Optional[Dict[str, Any]], fallback: Fallback) -> Optional[np.ndarray]:
+        if not where:
+            return None
+
+        key = json.dumps(where, sort_keys=True, default=str)
+        with self._lock:
+            cached = self._masks.get(key)
+            if cached is not None:
+                self._masks.move_to_end(key)
+                return cached
+
+        mask = self._where_mask(where, fallback)
+        mask.setflags(write=False)
+
+        with self._lock:
+            self._masks[key] = mask
+            while len(self._masks) > MASK_CACHE_SIZE:
+                self._masks.popitem(last=False)
+
+        return mask
@@ -0,0 +1,114 @@
+# ===================================================================================l
+# Almacén de embeddings en disco (clave -> vector float32).                          |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Guardar vectores en un archivo binario append-only (float32, orden nativo).      |
+# - Mantener un índice de offsets (clave -> posición, dimensión) en un TSV aparte.   |
+# - Leer vectores vía mmap sin cargar el archivo completo en memoria.                |
+#                                                                                    |
+# No hace:                                                                           |
+# - No calcula embeddings (eso es de build_index / retriever).                       |
+# - No decide qué se cachea ni cuándo se invalida.                                   |
+# ===================================================================================|
+import hashlib
+import mmap
+import threading
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+def content_key(model: str, text: str) -> str:
+    return hashlib.sha256(f"{model}\x00{text}".encode("utf-8")).hexdigest()
+
+class EmbeddingStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        self._vectors_path = self.path / "vectors.f32"
+        self._index_path = self.path / "index.tsv"
+        self._vectors_path.touch(exist_ok=True)
+        self._index_path.touch(exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[int, int]] = {}
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_size = 0
+
+        self._load_index()
+
+    def _load_index(self) -> None:
+        size = self._vectors_path.stat().st_size
+
+        with self._index_path.open("r", encoding="utf-8") as f:
+            for line in f:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) != 3:
+                    continue
+
+                key, offset, dim = parts[0], int(parts[1]), int(parts[2])
+
+                # Entradas de una escritura interrumpida apuntan fuera del archivo.
+                if offset + dim * 4 > size:
+                    continue
+
+                self._index[key] = (offset, dim)
+
+    def _view(self, end: int) -> mmap.mmap:
+        if self._mm is None or end > self._mm_size:
+            if self._mm is not None:
+                self._mm.close()
+            with self._vectors_path.open("rb") as f:
+                self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._mm_size = len(self._mm)
+        return self._mm
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def get(self, key: str) -> Optional[array]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+
+            offset, dim = entry
+            end = offset + dim * 4
+            vector = array("f")
+            vector.frombytes(self._view(end)[offset:end])
+            return vector
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[array]]:
+        return [self.get(k) for k in keys]
+
+    def put(self, key: str, vector: Sequence[float]) -> None:
+        self.put_many([(key, vector)])
+
+    def put_many(self, items: Iterable[Tuple[str, Sequence[float]]]) -> None:
+        with self._lock:
+            pending = {k: v for k, v in items if k not in self._index}
+            if not pending:
+                return
+
+            lines: List[str] = []
+            with self._vectors_path.open("ab") as f:
+                offset = f.tell()
+                for key, vector in pending.items():
+                    data = array("f", vector)
+                    f.write(data.tobytes())
+                    self._index[key] = (offset, len(data))
+                    lines.append(f"{key}\t{offset}\t{len(data)}\n")
+                    offset += len(data) * 4
+
+            with self._index_path.open("a", encoding="utf-8") as f:
+                f.writelines(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+            self._mm = None
+            self._mm_size = 0
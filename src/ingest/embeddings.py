@@ -0,0 +1,102 @@
+# ==================================================================================l
+# Backends de embeddings (texto -> vector).                                         |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Definir la interfaz EmbeddingBackend usada por build_index y el retriever.      |
+# - OpenAIEmbeddingBackend: embeddings remotos (EMBED_MODEL).                       |
+# - LocalHashEmbeddingBackend: embeddings locales deterministas, sin red, a partir  |
+#   de n-gramas de caracteres hasheados y proyectados con NumPy a dimensión fija.   |
+# - Elegir el backend según config.EMBED_BACKEND.                                   |
+#                                                                                   |
+# No hace:                                                                          |
+# - No escribe al vector store ni cachea vectores.                                  |
+# ==================================================================================|
+import asyncio
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional, Sequence
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+import src.config as config
+
+class EmbeddingBackend(ABC):
+    model_name: str = ""
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        ...
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.to_thread(self.embed, texts)
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, oai: OpenAI, async_oai: Optional[AsyncOpenAI] = None, model: str = config.EMBED_MODEL):
+        self.oai = oai
+        self.async_oai = async_oai
+        self.model_name = model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        resp = self.oai.embeddings.create(model=self.model_name, input=texts)
+        return [d.embedding for d in resp.data]
+
+    async def embed_async(self, texts: List[str]) -> List[List[float]]:
+        if self.async_oai is None:
+            return await super().embed_async(texts)
+        resp = await self.async_oai.embeddings.create(model=self.model_name, input=texts)
+        return [d.embedding for d in resp.data]
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def _mix32(h: np.ndarray) -> np.ndarray:
+    # Finalizador de murmur3: reparte los bits del hash polinomial.
+    h = h ^ (h >> np.uint32(16))
+    h = h * np.uint32(0x85EBCA6B)
+    h = h ^ (h >> np.uint32(13))
+    h = h * np.uint32(0xC2B2AE35)
+    return h ^ (h >> np.uint32(16))
+
+class LocalHashEmbeddingBackend(EmbeddingBackend):
+    def __init__(self, dim: int = config.LOCAL_EMBED_DIM, ngrams: Sequence[int] = (3, 4, 5)):
+        self.dim = dim
+        self.ngrams = tuple(ngrams)
+        self.model_name = f"local-hash-{dim}-n{''.join(str(n) for n in self.ngrams)}"
+
+    def _vector(self, text: str) -> np.ndarray:
+        text = f" {_WHITESPACE_RE.sub(' ', text.lower()).strip()} "
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        out = np.zeros(self.dim, dtype=np.float64)
+
+        with np.errstate(over="ignore"):
+            for n in self.ngrams:
+                if len(codes) < n:
+                    continue
+
+                # Hash polinomial vectorizado de todas las ventanas de n caracteres.
+                h = np.full(len(codes) - n + 1, n, dtype=np.uint32)
+                for k in range(n):
+                    h = h * np.uint32(0x01000193) + codes[k:len(codes) - n + 1 + k]
+                h = _mix32(h)
+
+                buckets = (h % np.uint32(self.dim)).astype(np.int64)
+                signs = np.where(h & np.uint32(0x80000000), -1.0, 1.0)
+                out += np.bincount(buckets, weights=signs, minlength=self.dim)
+
+        norm = np.linalg.norm(out)
+        if norm > 0:
+            out /= norm
+        return out
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._vector(t).astype(np.float32).tolist() for t in texts]
+
+def get_embedding_backend(oai: Optional[OpenAI] = None,
+                          async_oai: Optional[AsyncOpenAI] = None,
+                          name: Optional[str] = None) -> EmbeddingBackend:
+    name = name or config.EMBED_BACKEND
+    if name == "local":
+        return LocalHashEmbeddingBackend()
+    if name == "openai":
+        if oai is None:
+            raise ValueError("El backend de embeddings 'openai' requiere un cliente OpenAI.")
+        return OpenAIEmbeddingBackend(oai, async_oai)
+    raise ValueError(f"Backend de embeddings desconocido: {name!r} (use 'openai' o 'local').")
@@ -0,0 +1,238 @@
+# ==================================================================================l
+# Motor de indexación concurrente (chunks -> embeddings -> vector store).           |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Mantener N llamadas de embeddings en vuelo en lugar de una a la vez.            |
+# - Respetar la cuota de la API con token buckets (requests/min y tokens/min).      |
+# - Reintentar 429 y 5xx con backoff exponencial (respetando Retry-After).          |
+# - Reutilizar embeddings ya calculados (EmbeddingStore por hash de contenido).     |
+# - Serializar collection.add en un único hilo escritor.                            |
+# - Regenerar los índices derivados (BM25, conteos de metadata) tras indexar.       |
+# - Reportar throughput (chunks/s y tokens/s).                                      |
+#                                                                                   |
+# No hace:                                                                          |
+# - No genera chunks (eso es del splitter).                                         |
+# - No responde preguntas.                                                          |
+# ==================================================================================|
+import queue
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Set
+import chromadb
+import openai
+import src.config as config
+import src.ingest.build_index as build_index
+from src.ingest.embedding_store import EmbeddingStore
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, amount: float = 1.0) -> None:
+        # Una petición mayor que la capacidad se deja pasar con el bucket lleno.
+        amount = min(amount, self.capacity)
+
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait_s = (amount - self._tokens) / self.rate
+            time.sleep(wait_s)
+
+class RateLimiter:
+    def __init__(self, requests_per_min: float = config.EMBED_RPM, tokens_per_min: float = config.EMBED_TPM):
+        self.requests = TokenBucket(requests_per_min)
+        self.tokens = TokenBucket(tokens_per_min)
+
+    def acquire(self, tokens: int) -> None:
+        self.requests.acquire(1)
+        self.tokens.acquire(tokens)
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return getattr(error, "status_code", 0) >= 500
+    return False
+
+def retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("retry-after")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+def embed_with_backoff(embed: Callable[[List[str]], List[List[float]]],
+                       texts: List[str],
+                       limiter: Optional[RateLimiter] = None,
+                       max_retries: int = config.EMBED_MAX_RETRIES,
+                       base_delay: float = 1.0,
+                       max_delay: float = 60.0) -> List[List[float]]:
+    tokens = sum(build_index.estimate_tokens(t) for t in texts)
+
+    for attempt in range(max_retries + 1):
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return embed(texts)
+        except Exception as e:
+            if attempt >= max_retries or not is_retryable(e):
+                raise
+            delay = retry_after(e) or min(max_delay, base_delay * 2 ** attempt)
+            time.sleep(delay * (0.5 + random.random() / 2))
+
+    raise RuntimeError("unreachable")
+
+@dataclass
+class IndexStats:
+    batches: int = 0
+    read: int = 0
+    indexed: int = 0
+    tokens: int = 0
+    started: float = 0.0
+    elapsed: float = 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.indexed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def tokens_per_s(self) -> float:
+        return self.tokens / self.elapsed if self.elapsed else 0.0
+
+@dataclass
+class _Job:
+    ids: List[str]
+    documents: List[str]
+    metadatas: List[Dict[str, Any]]
+    tokens: int
+
+class IndexingEngine:
+    def __init__(self,
+                 collection: chromadb.api.Collection,
+                 oai: build_index.Embedder,
+                 concurrency: int = config.EMBED_CONCURRENCY,
+                 limiter: Optional[RateLimiter] = None,
+                 batch_size: int = config.EMBED_BATCH_MAX_ITEMS,
+                 max_tokens: Optional[int] = config.EMBED_BATCH_TOKENS,
+                 progress: Optional[Callable[[IndexStats], None]] = None,
+                 store: Optional[EmbeddingStore] = None,
+                 use_store: bool = True,
+                 chunks_file: Optional[Path] = config.CHUNKS_FILE):
+        self.collection = collection
+        self.oai = oai
+        self.concurrency = max(concurrency, 1)
+        self.limiter = limiter or RateLimiter()
+        self.batch_size = batch_size
+        self.max_tokens = max_tokens
+        self.progress = progress
+        self.store = build_index.resolve_embedding_store(store, use_store)
+        # Archivo del que se regeneran los índices derivados tras indexar (None = no regenerar).
+        self.chunks_file = chunks_file
+        # El cliente de Chroma no garantiza get/add concurrentes: prepare_batch y el escritor se turnan.
+        self._collection_lock = threading.Lock()
+
+    def _embed(self, job: _Job) -> tuple[_Job, List[List[float]]]:
+        sent: List[str] = []
+
+        def embed(texts: List[str]) -> List[List[float]]:
+            sent.extend(texts)
+            return embed_with_backoff(lambda t: build_index.embed_texts(self.oai, t), texts, self.limiter)
+
+        vectors = build_index.embed_with_store(job.documents, embed, self.store, model=build_index.embedder_model(self.oai))
+        job.tokens = sum(build_index.estimate_tokens(t) for t in sent)
+        return job, vectors
+
+    def _writer(self, pending: "queue.Queue", stats: IndexStats, errors: List[Exception]) -> None:
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            if errors:
+                continue
+
+            job, vectors = item
+            try:
+                with self._collection_lock:
+                    self.collection.add(
+                        ids=job.ids,
+                        documents=job.documents,
+                        embeddings=vectors,
+                        metadatas=job.metadatas
+                    )
+            except Exception as e:
+                errors.append(e)
+                continue
+
+            stats.batches += 1
+            stats.indexed += len(job.ids)
+            stats.tokens += job.tokens
+            stats.elapsed = time.perf_counter() - stats.started
+            if self.progress is not None:
+                self.progress(stats)
+
+    def run(self, chunks: Iterator[Dict[str, Any]]) -> IndexStats:
+        stats = IndexStats()
+        errors: List[Exception] = []
+        pending: "queue.Queue" = queue.Queue(maxsize=self.concurrency * 2)
+        writer = threading.Thread(target=self._writer, args=(pending, stats, errors), name="chroma-writer", daemon=True)
+
+        stats.started = time.perf_counter()
+        writer.start()
+        in_flight: Set[Future] = set()
+
+        def drain(block_until: int) -> None:
+            nonlocal in_flight
+            while len(in_flight) > block_until:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    pending.put(fut.result())
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="embed") as pool:
+                for batch in build_index.batch_iter(chunks, self.batch_size, max_tokens=self.max_tokens):
+                    stats.read += len(batch)
+                    if errors:
+                        break
+
+                    with self._collection_lock:
+                        ids, documents, metadatas = build_index.prepare_batch(self.collection, batch)
+                    if not ids:
+                        continue
+
+                    in_flight.add(pool.submit(self._embed, _Job(ids, documents, metadatas, 0)))
+                    drain(self.concurrency - 1)
+
+                drain(0)
+        finally:
+            pending.put(None)
+            writer.join()
+            stats.elapsed = time.perf_counter() - stats.started
+            # También si falló un embedding: los lotes ya escritos cambian las respuestas cacheadas,
+            # y los índices derivados se re-sellan con la nueva versión para no quedar desactualizados.
+            if stats.indexed:
+                build_index.bump_index_version()
+                if self.chunks_file is not None:
+                    build_index.build_search_indexes(self.chunks_file)
+
+        if errors:
+            raise errors[0]
+
+        return stats
@@ -0,0 +1,162 @@
+# =============================================================================l
+# Ingesta incremental (manifest de PDFs + caché por archivo).                  |
+#                                                                              |
+# Responsabilidad:                                                             |
+# - Registrar por PDF su tamaño, mtime y hash de contenido.                    |
+# - Guardar por archivo las páginas limpias y los chunks ya generados.         |
+# - Re-extraer solo los PDFs nuevos o modificados y reutilizar el resto.       |
+# - Reconstruir pages.jsonl y chunks.jsonl en el orden de get_pdfs_paths.      |
+# - Regenerar el almacén binario de chunks (chunk_store) desde chunks.jsonl.   |
+#                                                                              |
+# No hace:                                                                     |
+# - No genera embeddings ni escribe al vector store (eso es del build_index).  |
+# =============================================================================|
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from src.config import PDFS_PATH, PAGES_FILE, CHUNKS_FILE, MANIFEST_FILE, INGEST_CACHE_PATH, INGEST_WORKERS, CHUNK_STORE_PATH
+from src.ingest.chunk_store import build_from_jsonl
+from src.ingest.loader import get_pdfs_paths
+from src.ingest.splitter import iter_pdf_pages_cleaned, split_page_to_chunks
+
+# Subir este valor cuando cambie la extracción, la limpieza o el chunking.
+MANIFEST_VERSION = 1
+
+def file_sha256(path: Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def load_manifest(path: Path = MANIFEST_FILE) -> Dict[str, Any]:
+    if not path.exists():
+        return {"version": MANIFEST_VERSION, "files": {}}
+
+    with path.open("r", encoding="utf-8") as f:
+        manifest = json.load(f)
+
+    if manifest.get("version") != MANIFEST_VERSION:
+        return {"version": MANIFEST_VERSION, "files": {}}
+
+    return manifest
+
+def save_manifest(manifest: Dict[str, Any], path: Path = MANIFEST_FILE) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+def cache_paths(cache_id: str, cache_dir: Path = INGEST_CACHE_PATH) -> Tuple[Path, Path]:
+    return cache_dir / f"{cache_id}.pages.jsonl", cache_dir / f"{cache_id}.chunks.jsonl"
+
+def extract_pdf_records(pdf: Path) -> Tuple[List[str], List[str]]:
+    # Se ejecuta en un proceso worker; devuelve líneas JSONL ya serializadas.
+    pages: List[str] = []
+    chunks: List[str] = []
+
+    for page_record in iter_pdf_pages_cleaned(pdf):
+        pages.append(json.dumps(page_record, ensure_ascii=False) + "\n")
+        for chunk_record in split_page_to_chunks(page_record):
+            chunks.append(json.dumps(chunk_record, ensure_ascii=False) + "\n")
+
+    return pages, chunks
+
+def _write_lines(path: Path, lines: List[str]) -> None:
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.writelines(lines)
+    os.replace(tmp, path)
+
+def _concat(sources: List[Path], out_path: Path) -> None:
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_suffix(".tmp")
+    with tmp.open("wb") as out:
+        for src in sources:
+            with src.open("rb") as f:
+                while block := f.read(1 << 20):
+                    out.write(block)
+    os.replace(tmp, out_path)
+
+def build_incremental(workers: int = INGEST_WORKERS,
+                      pdfs_dir: Path = PDFS_PATH,
+                      pages_file: Path = PAGES_FILE,
+                      chunks_file: Path = CHUNKS_FILE,
+                      manifest_file: Path = MANIFEST_FILE,
+                      cache_dir: Path = INGEST_CACHE_PATH,
+                      chunk_store_path: Optional[Path] = CHUNK_STORE_PATH) -> Dict[str, int]:
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(manifest_file)
+    previous: Dict[str, Any] = manifest["files"]
+    current: Dict[str, Any] = {}
+
+    pdfs = get_pdfs_paths(pdfs_dir)
+    to_extract: List[Tuple[str, Path]] = []
+    reused = 0
+
+    for pdf in pdfs:
+        rel = pdf.relative_to(pdfs_dir).as_posix()
+        st = pdf.stat()
+        entry = previous.get(rel)
+        cached = entry is not None and all(p.exists() for p in cache_paths(entry["cache_id"], cache_dir))
+
+        if cached and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            current[rel] = entry
+            reused += 1
+            continue
+
+        sha = file_sha256(pdf)
+
+        if cached and entry["sha256"] == sha:
+            current[rel] = {**entry, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+            reused += 1
+            continue
+
+        # El id incluye la ruta: doc_id y source_path dependen de ella.
+        path_hash = hashlib.sha256(rel.encode("utf-8")).hexdigest()[:16]
+        current[rel] = {
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "sha256": sha,
+            "cache_id": f"{path_hash}-{sha[:16]}",
+        }
+        to_extract.append((rel, pdf))
+
+    if workers > 1 and len(to_extract) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            extracted = pool.map(extract_pdf_records, [pdf for _, pdf in to_extract])
+            for (rel, _), (pages, chunks) in zip(to_extract, extracted):
+                pages_path, chunks_path = cache_paths(current[rel]["cache_id"], cache_dir)
+                _write_lines(pages_path, pages)
+                _write_lines(chunks_path, chunks)
+    else:
+        for rel, pdf in to_extract:
+            pages, chunks = extract_pdf_records(pdf)
+            pages_path, chunks_path = cache_paths(current[rel]["cache_id"], cache_dir)
+            _write_lines(pages_path, pages)
+            _write_lines(chunks_path, chunks)
+
+    live = {entry["cache_id"] for entry in current.values()}
+    removed = 0
+    for rel, entry in previous.items():
+        if entry["cache_id"] in live:
+            continue
+        for p in cache_paths(entry["cache_id"], cache_dir):
+            p.unlink(missing_ok=True)
+        if rel not in current:
+            removed += 1
+
+    ordered = [current[pdf.relative_to(pdfs_dir).as_posix()]["cache_id"] for pdf in pdfs]
+    _concat([cache_paths(c, cache_dir)[0] for c in ordered], pages_file)
+    _concat([cache_paths(c, cache_dir)[1] for c in ordered], chunks_file)
+    if chunk_store_path is not None:
+        build_from_jsonl(chunks_file, chunk_store_path)
+
+    manifest["files"] = current
+    save_manifest(manifest, manifest_file)
+
+    return {"pdfs": len(pdfs), "extracted": len(to_extract), "reused": reused, "removed": removed}
@@ -0,0 +1,127 @@
+# ===================================================================================l
+# Índice de cardinalidad de metadata (filtro where -> cuántos chunks lo cumplen).    |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Contar, al indexar, los chunks por combinación (doc_type, year, period,          |
+#   audited) tal como los produce loader.extract_metadata, y guardarlo en JSON       |
+#   junto con la versión del vector store con la que se construyó.                   |
+# - Cargarlo en memoria en el retriever y responder count(where) sin consultar el    |
+#   vector store (el mismo matches_where que usa Chroma se inyecta al abrirlo).      |
+# - Elegir de antemano el nivel de relajación más específico con candidatos,         |
+#   para que cada pregunta necesite una sola consulta vectorial.                     |
+#                                                                                    |
+# No hace:                                                                           |
+# - No busca por similitud ni decide los niveles de relajación (retriever).          |
+# ===================================================================================|
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import src.config as config
+from src.ingest.columns import where_keys
+
+INDEX_VERSION = 2
+
+FIELDS = ("doc_type", "year", "period", "audited")
+
+PLAN_CACHE_SIZE = 4096
+
+Matches = Callable[[Dict[str, Any], Optional[Dict[str, Any]]], bool]
+
+def build_metadata_index(chunks: Iterable[Dict[str, Any]],
+                         path: Path = config.METADATA_INDEX_PATH,
+                         index_version: Optional[str] = None) -> int:
+    counts: Dict[Tuple[Any, ...], int] = {}
+    total = 0
+
+    for chunk_record in chunks:
+        key = tuple(chunk_record.get(f) for f in FIELDS)
+        counts[key] = counts.get(key, 0) + 1
+        total += 1
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "index_version": index_version,
+            "total": total,
+            "fields": list(FIELDS),
+            "combos": [[*key, n] for key, n in counts.items()],
+        }, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+    return total
+
+class MetadataIndex:
+    def __init__(self, path: Path, matches: Matches):
+        self.path = Path(path)
+        self.matches = matches
+
+        with self.path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != INDEX_VERSION or tuple(data.get("fields", ())) != FIELDS:
+            raise ValueError(f"Índice de metadata no soportado en {self.path}")
+
+        self.index_version: Optional[str] = data.get("index_version")
+        self.total: int = data["total"]
+        # Misma forma que la metadata de un chunk (sin las claves ausentes), para usar matches.
+        self.combos: List[Tuple[Dict[str, Any], int]] = [
+            ({f: v for f, v in zip(FIELDS, row[:-1]) if v is not None}, row[-1])
+            for row in data["combos"]
+        ]
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Optional[int]] = {}
+
+    def count(self, where: Optional[Dict[str, Any]]) -> Optional[int]:
+        # None = el filtro usa claves que el índice no cuenta: no se puede planificar.
+        if not where:
+            return self.total
+
+        key = json.dumps(where, sort_keys=True, default=str)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        if any(f not in FIELDS for f in where_keys(where)):
+            n = None
+        else:
+            n = sum(count for meta, count in self.combos if self.matches(meta, where))
+
+        with self._lock:
+            if len(self._cache) >= PLAN_CACHE_SIZE:
+                self._cache.clear()
+            self._cache[key] = n
+        return n
+
+    def plan(self, levels: List[Optional[Dict[str, Any]]], top_k: int) -> Optional[int]:
+        # Primer nivel filtrado con top_k candidatos; si ninguno llega, el más específico
+        # con alguno (saltar al nivel sin filtro mezclaría años). Sin candidatos: el último.
+        counts: List[int] = []
+        for level in levels:
+            if not level:
+                break
+            n = self.count(level)
+            if n is None:
+                return None
+            if n >= top_k:
+                return len(counts)
+            counts.append(n)
+
+        for i, n in enumerate(counts):
+            if n:
+                return i
+        return len(levels) - 1
+
+def load_metadata_index(path: Path,
+                        matches: Matches,
+                        index_version: Optional[str] = None) -> Optional[MetadataIndex]:
+    # Sin índice, o construido para otra versión del vector store, no se planifica.
+    if not Path(path).exists():
+        return None
+    index = MetadataIndex(path, matches)
+    if index_version is not None and index.index_version != index_version:
+        return None
+    return index
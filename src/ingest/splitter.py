@@ -9,13 +9,15 @@
 # - No genera embeddings.                                                                     |
 # - No escribe en el vector store.                                                            |   
 # ============================================================================================|
-from typing import Iterator
+from typing import Iterator, List, Optional
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from src.ingest.cleaner import clean_text
-from src.ingest.loader import full_extract_document
-from src.config import PDFS_PATH
-from src.ingest.table_extractor import looks_like_table, extract_table_rows, extract_table_fact_total, normalize_for_table
+from src.ingest.cleaner import iter_clean_pages
+from src.ingest.chunk_store import ChunkStoreWriter
+from src.ingest.loader import full_extract_document, get_pdfs_paths
+from src.config import PDFS_PATH, INGEST_WORKERS
+from src.ingest.table_extractor import looks_like_table, extract_table_rows, extract_table_fact_total, analyze_page
 
 def split_page_to_chunks(page_record: dict, chunk_size: int = 1200, overlap: int = 200) -> Iterator[dict]:
     raw_text = (page_record.get("page_text") or "")
@@ -25,15 +27,16 @@ def split_page_to_chunks(page_record: dict, chunk_size: int = 1200, overlap: int
 
     chunk_index = 0
 
-    text_norm = normalize_for_table(raw_text)
-
     doc_type = (page_record.get("doc_type") or "").lower()
     allow_table_mode = (doc_type == "important_facts")
 
-    if allow_table_mode and looks_like_table(text_norm):
+    # Normalización, conteos y recortes de tabla se calculan una vez y se comparten.
+    page = analyze_page(page_record) if allow_table_mode else None
+
+    if page is not None and looks_like_table(page):
         emitted_any_table_chunk = False
 
-        total_fact = extract_table_fact_total(page_record)
+        total_fact = extract_table_fact_total(page_record, page)
         if total_fact:
             chunk_index += 1
             emitted_any_table_chunk = True
@@ -44,7 +47,7 @@ def split_page_to_chunks(page_record: dict, chunk_size: int = 1200, overlap: int
                 "chunk_text": total_fact["chunk_text"],
             }
 
-        for row_fact in extract_table_rows(page_record):
+        for row_fact in extract_table_rows(page_record, page):
             chunk_index += 1
             emitted_any_table_chunk = True
             yield {
@@ -77,15 +80,29 @@ def split_page_to_chunks(page_record: dict, chunk_size: int = 1200, overlap: int
         start = max(0, end - overlap)
 
         
-def write_chunks_to_jsonl(pages_iter: Iterator[dict], out_path: Path) -> int:
+def write_chunks_to_jsonl(pages_iter: Iterator[dict], out_path: Path, store_path: Optional[Path] = None) -> int:
     out_path.parent.mkdir(parents=True, exist_ok=True)
     count = 0
     
-    with out_path.open("w", encoding="utf-8") as f:
-        for page_record in pages_iter:
-            for chunk_record in split_page_to_chunks(page_record):
-                f.write(json.dumps(chunk_record, ensure_ascii=False) + "\n")
-                count += 1
+    # Con store_path también se escribe el almacén binario (acceso por chunk_id sin parsear el JSONL).
+    writer = ChunkStoreWriter(store_path) if store_path is not None else None
+    try:
+        with out_path.open("w", encoding="utf-8") as f:
+            for page_record in pages_iter:
+                for chunk_record in split_page_to_chunks(page_record):
+                    f.write(json.dumps(chunk_record, ensure_ascii=False) + "\n")
+                    if writer is not None:
+                        writer.add(chunk_record)
+                    count += 1
+    except BaseException:
+        if writer is not None:
+            writer.abort()
+        raise
+
+    if writer is not None:
+        writer.close()
+
+    return count
 
 def write_pages_to_jsonl(pages_iter: Iterator[dict], out_path: Path) -> int:
     out_path.parent.mkdir(parents=True, exist_ok=True)
@@ -99,9 +116,22 @@ def write_pages_to_jsonl(pages_iter: Iterator[dict], out_path: Path) -> int:
     return count
    
 print("\n")
-def iter_pages_cleaned():
-    for pdf in PDFS_PATH.rglob("*.pdf"):
-        for page in full_extract_document(pdf):
-            clean_t = clean_text(page["page_text"])
-            page["page_text"] = clean_t
-            yield page
+def iter_pdf_pages_cleaned(pdf: Path) -> Iterator[dict]:
+    yield from iter_clean_pages(full_extract_document(pdf))
+
+def extract_pdf_pages_cleaned(pdf: Path) -> List[dict]:
+    # Se ejecuta en un proceso worker: abre su propio documento fitz.
+    return list(iter_pdf_pages_cleaned(pdf))
+
+def iter_pages_cleaned(workers: int = INGEST_WORKERS):
+    pdfs = get_pdfs_paths(PDFS_PATH)
+
+    if workers <= 1 or len(pdfs) <= 1:
+        for pdf in pdfs:
+            yield from iter_pdf_pages_cleaned(pdf)
+        return
+
+    # map() conserva el orden de entrada: la salida es idéntica a la serial.
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for pages in pool.map(extract_pdf_pages_cleaned, pdfs):
+            yield from pages
@@ -1,5 +1,7 @@
 import re
-from typing import Iterator, Optional, Tuple
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
 
 TABLE_HEADERS_COMMON = [
     "cantidad", "monto", "importe", "total",
@@ -25,88 +27,207 @@ NOTE_CUT_RE = re.compile(r"\bnota\s*:\b|\bobservaci[oó]n\s*:\b", re.IGNORECASE)
 
 DATE_PAT = r"\d{1,2}[-/][A-Za-zÁÉÍÓÚÜÑáéíóúüñ]{3,9}[-/]\d{2,4}|\d{1,2}[-/]\d{1,2}[-/]\d{2,4}"
 
+TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+NEWLINES_RE = re.compile(r"\n+")
+MULTI_SPACE_RE = re.compile(r"\s{2,}")
+WHITESPACE_RE = re.compile(r"\s+")
+NUMBER_RE = re.compile(r"\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?")
+DIGIT_RE = re.compile(r"\d")
+DATE_LOWER_RE = re.compile(r"\b\d{1,2}[-/][a-z]{3,9}[-/]\d{2,4}\b")
+SEGMENT_SPLIT_RE = re.compile(f"(?=({DATE_PAT}))")
+
+ROW_RE = re.compile(
+    rf"(?:(?P<date>{DATE_PAT})\s+)?"
+    r"(?P<qty>\d{1,3}(?:,\d{3})+|\d+)\s+"
+    r"(?P<pct>\d+(?:\.\d+)?)%\s+"
+    r"(?P<cur1>S/|USD|US\$|\$)\s*"
+    r"(?P<price>\d+(?:\.\d+)?)\s+"
+    r"(?P<cur2>S/|USD|US\$|\$)\s*"
+    r"(?P<amt>\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+(?:\.\d{2})?)",
+    flags=re.IGNORECASE,
+)
+
+TOTAL_QTY_PAT = r"(?:\d{1,3}(?:,\d{3})+|\d{4,})"
+TOTAL_AMT_PAT = r"(?:\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d{4,}(?:\.\d{2})?)"
+TOTAL_RE = re.compile(
+    rf"\btotal\b[^\d]{{0,40}}(?P<qty>{TOTAL_QTY_PAT}).{{0,80}}"
+    rf"(?P<cur>s/|usd|us\$|\$|eur)\s*(?P<amt>{TOTAL_AMT_PAT})",
+    flags=re.IGNORECASE,
+)
+
 def normalize_for_table(text: str) -> str:
     if not text:
         return ""
     text = NOTE_CUT_RE.split(text)[0]
-    text = re.sub(r"[ \t]+\n", "\n", text)
-    text = re.sub(r"\n+", " ", text)
-    text = re.sub(r"\s{2,}", " ", text).strip()
+    text = TRAILING_SPACE_RE.sub("\n", text)
+    text = NEWLINES_RE.sub(" ", text)
+    text = MULTI_SPACE_RE.sub(" ", text).strip()
     return text
 
-def find_table_region(text: str, headers: list[str], window: int = 900, min_hits: int = 3) -> Optional[Tuple[int, int]]:
-    if not text:
-        return None
+REGION_STEP = 200
 
-    t_lower = re.sub(r"\s+", " ", text.lower()).strip()
-    if not t_lower:
-        return None
+def _header_hits_per_window(t: str, headers: list[str], window: int, step: int, n_windows: int) -> list[int]:
+    # Un header cuenta en la ventana k si alguna ocurrencia [p, p+len) cae completa dentro de ella:
+    # k*step <= p  y  k*step + window >= p + len.
+    hits = [0] * n_windows
+
+    for h in headers:
+        if not h:
+            continue
+        size = len(h)
+        marked = -1
+        p = t.find(h)
+        while p != -1:
+            k_lo = max(0, -(-(p + size - window) // step), marked + 1)
+            k_hi = min(p // step, n_windows - 1)
+            for k in range(k_lo, k_hi + 1):
+                hits[k] += 1
+            marked = max(marked, k_hi)
+            # Las ocurrencias anteriores a la ventana marked+1 ya no aportan ventanas nuevas.
+            p = t.find(h, max(p + 1, (marked + 1) * step))
+
+    return hits
+
+def _is_number_char(c: str) -> bool:
+    return c.isdecimal() or c == "." or c == ","
+
+class _NumberIndex:
+    # Un número solo se forma dentro de una corrida de [\d.,]. Las corridas completas dentro de la
+    # ventana aportan sus coincidencias globales (búsqueda binaria); las cortadas por un borde se
+    # re-escanean sobre el fragmento, como haría findall sobre el slice.
+    def __init__(self, t: str):
+        self.t = t
+        self.match_starts = [m.start() for m in NUMBER_RE.finditer(t)]
+
+    def count(self, s: int, e: int) -> int:
+        t = self.t
+
+        lo = s
+        if s > 0 and _is_number_char(t[s - 1]):
+            while lo < e and _is_number_char(t[lo]):
+                lo += 1
+            if lo == e:
+                return len(NUMBER_RE.findall(t, s, e))
+
+        hi = e
+        if e < len(t) and _is_number_char(t[e]):
+            while hi > lo and _is_number_char(t[hi - 1]):
+                hi -= 1
+
+        total = bisect_left(self.match_starts, hi) - bisect_left(self.match_starts, lo)
+        if lo > s:
+            total += len(NUMBER_RE.findall(t, s, lo))
+        if hi < e:
+            total += len(NUMBER_RE.findall(t, hi, e))
+
+        return total
+
+def _best_window(t_lower: str, numbers: _NumberIndex, headers: list[str], window: int, min_hits: int) -> Optional[Tuple[int, int]]:
+    n = len(t_lower)
+    step = REGION_STEP
+    n_windows = -(-n // step)
+    hits = _header_hits_per_window(t_lower, headers, window, step, n_windows)
 
     best = None
     best_score = 0
-    step = 200
 
-    for start in range(0, len(t_lower), step):
-        end = min(start + window, len(t_lower))
-        chunk = t_lower[start:end]
+    for k in range(n_windows):
+        if hits[k] < min_hits:
+            continue
 
-        hits = sum(1 for h in headers if h in chunk)
-        nums = len(re.findall(r"\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?", chunk))
-        score = hits * 10 + nums
+        start = k * step
+        end = min(start + window, n)
+        score = hits[k] * 10 + numbers.count(start, end)
 
-        if hits >= min_hits and score > best_score:
+        if score > best_score:
             best_score = score
             best = (start, end)
 
     return best
 
+def find_table_region(text: str, headers: list[str], window: int = 900, min_hits: int = 3) -> Optional[Tuple[int, int]]:
+    if not text:
+        return None
+
+    t_lower = WHITESPACE_RE.sub(" ", text.lower()).strip()
+    if not t_lower:
+        return None
+
+    return _best_window(t_lower, _NumberIndex(t_lower), headers, window, min_hits)
+
+@dataclass
+class PageAnalysis:
+    # Todo lo que las funciones de tabla necesitan de una página, calculado una sola vez.
+    text_norm: str
+    lower: str = field(init=False)
+    token_count: int = field(init=False)
+    number_count: int = field(init=False)
+    header_hits: int = field(init=False)
+    date_spans: List[Tuple[int, int]] = field(init=False)
+    _region_text: str = field(init=False, repr=False)
+    _numbers: Optional[_NumberIndex] = field(default=None, init=False, repr=False)
+    _crops: Dict[Tuple[int, int], str] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self):
+        self.lower = self.text_norm.lower()
+        # Igual que el texto que recorre find_table_region (mismo largo que lower).
+        self._region_text = WHITESPACE_RE.sub(" ", self.lower).strip()
+        self.token_count = len(self.lower.split())
+        self.number_count = len(self.numbers.match_starts) if self._region_text == self.lower else len(NUMBER_RE.findall(self.lower))
+        self.header_hits = sum(1 for h in TABLE_HEADERS_COMMON if h in self.lower)
+        self.date_spans = [m.span() for m in DATE_LOWER_RE.finditer(self.lower)]
+
+    @property
+    def numbers(self) -> _NumberIndex:
+        if self._numbers is None:
+            self._numbers = _NumberIndex(self._region_text)
+        return self._numbers
+
+    def region(self, window: int, min_hits: int) -> Optional[Tuple[int, int]]:
+        if not self._region_text:
+            return None
+        return _best_window(self._region_text, self.numbers, TABLE_HEADERS_COMMON, window, min_hits)
+
+    def crop(self, window: int, min_hits: int) -> str:
+        key = (window, min_hits)
+        if key not in self._crops:
+            region = self.region(window, min_hits)
+            self._crops[key] = self.text_norm[region[0]:region[1]].strip() if region else self.text_norm
+        return self._crops[key]
+
+def analyze_page(page_record: dict) -> PageAnalysis:
+    return PageAnalysis(normalize_for_table((page_record.get("page_text") or "")))
+
 def crop_to_table_region(text_norm: str, window: int, min_hits: int) -> str:
-    region = find_table_region(text_norm, TABLE_HEADERS_COMMON, window=window, min_hits=min_hits)
-    if region:
-        return text_norm[region[0]:region[1]].strip()
-    return text_norm
+    return PageAnalysis(text_norm).crop(window, min_hits)
 
-def looks_like_table(text: str) -> bool:
+def looks_like_table(text: "str | PageAnalysis") -> bool:
     if not text:
         return False
 
-    t = text.lower()
-    tokens = re.findall(r"\S+", t)
-    if not tokens:
+    page = text if isinstance(text, PageAnalysis) else PageAnalysis(text)
+    if not page.token_count:
         return False
 
-    num_tokens = len(re.findall(r"\d{1,3}(?:,\d{3})+|\d+(?:\.\d+)?", t))
-    numbers_ratio = num_tokens / max(len(tokens), 1)
+    numbers_ratio = page.number_count / max(page.token_count, 1)
     has_enough_numbers = numbers_ratio > 0.12
 
-    header_hits = sum(1 for h in TABLE_HEADERS_COMMON if h in t)
-    has_dates = len(re.findall(r"\b\d{1,2}[-/][a-z]{3,9}[-/]\d{2,4}\b", t)) >= 2
+    has_dates = len(page.date_spans) >= 2
 
-    return (header_hits >= 3 and has_enough_numbers) or (has_dates and header_hits >= 2)
+    return (page.header_hits >= 3 and has_enough_numbers) or (has_dates and page.header_hits >= 2)
 
-def extract_table_rows(page_record: dict) -> Iterator[dict]:
-    text = normalize_for_table((page_record.get("page_text") or ""))
-    if not text:
+def extract_table_rows(page_record: dict, page: Optional[PageAnalysis] = None) -> Iterator[dict]:
+    page = page or analyze_page(page_record)
+    if not page.text_norm:
         return
 
-    text = crop_to_table_region(text, window=1200, min_hits=3)
+    text = page.crop(window=1200, min_hits=3)
 
     doc_type = (page_record.get("doc_type") or "").lower()
     allow_row_parsing = (doc_type == "important_facts")
 
     if allow_row_parsing:
-        row_re = re.compile(
-            rf"(?:(?P<date>{DATE_PAT})\s+)?"
-            r"(?P<qty>\d{1,3}(?:,\d{3})+|\d+)\s+"
-            r"(?P<pct>\d+(?:\.\d+)?)%\s+"
-            r"(?P<cur1>S/|USD|US\$|\$)\s*"
-            r"(?P<price>\d+(?:\.\d+)?)\s+"
-            r"(?P<cur2>S/|USD|US\$|\$)\s*"
-            r"(?P<amt>\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d+(?:\.\d{2})?)",
-            flags=re.IGNORECASE,
-        )
-
-        matches = list(row_re.finditer(text))
+        matches = list(ROW_RE.finditer(text))
         if len(matches) >= 3:
             last_date = None
             row_i = 0
@@ -135,13 +256,13 @@ def extract_table_rows(page_record: dict) -> Iterator[dict]:
                 }
             return
 
-    parts = re.split(f"(?=({DATE_PAT}))", text)
+    parts = SEGMENT_SPLIT_RE.split(text)
     seg_i = 0
     for p in parts:
         p = p.strip()
         if not p:
             continue
-        if len(re.findall(r"\d", p)) < 8:
+        if len(DIGIT_RE.findall(p)) < 8:
             continue
         seg_i += 1
         yield {
@@ -152,26 +273,18 @@ def extract_table_rows(page_record: dict) -> Iterator[dict]:
             "chunk_text": f"Tabla | Segmento {seg_i} | {p}",
         }
 
-def extract_table_fact_total(page_record: dict) -> Optional[dict]:
+def extract_table_fact_total(page_record: dict, page: Optional[PageAnalysis] = None) -> Optional[dict]:
     doc_type = (page_record.get("doc_type") or "").lower()
     if doc_type != "important_facts":
         return None
 
-    text = normalize_for_table((page_record.get("page_text") or ""))
-    if not text:
+    page = page or analyze_page(page_record)
+    if not page.text_norm:
         return None
 
-    text = crop_to_table_region(text, window=1600, min_hits=2)
-
-    qty_pat = r"(?:\d{1,3}(?:,\d{3})+|\d{4,})"
-    amt_pat = r"(?:\d{1,3}(?:,\d{3})+(?:\.\d{2})?|\d{4,}(?:\.\d{2})?)"
+    text = page.crop(window=1600, min_hits=2)
 
-    m = re.search(
-        rf"\btotal\b[^\d]{{0,40}}(?P<qty>{qty_pat}).{{0,80}}"
-        rf"(?P<cur>s/|usd|us\$|\$|eur)\s*(?P<amt>{amt_pat})",
-        text,
-        flags=re.IGNORECASE,
-    )
+    m = TOTAL_RE.search(text)
     if not m:
         return None
 
@@ -0,0 +1,13 @@
+# ===============================================================================l
+# Estimación local de tokens (texto -> cantidad aproximada de tokens).           |
+#                                                                                |
+# Responsabilidad:                                                               |
+# - Estimar tokens sin tokenizer ni red, para armar lotes de embeddings          |
+#   (build_index) y acotar el contexto del prompt (prompt.build_context).        |
+#                                                                                |
+# No hace:                                                                       |
+# - No importa clientes ni otros módulos (se usa desde ingest y desde rag).      |
+# ===============================================================================|
+def estimate_tokens(text: str) -> int:
+    # Estimación local conservadora: ~3 caracteres por token en español.
+    return len(text) // 3 + 1
@@ -0,0 +1,104 @@
+# ==================================================================================l
+# Caché de respuestas (pregunta + evidencia -> respuesta del LLM).                  |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Evitar una nueva llamada al LLM cuando la pregunta normalizada, el modo, la     |
+#   temperatura, el modelo y los chunk_ids recuperados coinciden.                   |
+# - Persistir en SQLite local con TTL y desalojo LRU.                               |
+# - Invalidarse sola cuando cambia la versión del índice (build_index).             |
+#                                                                                   |
+# No hace:                                                                          |
+# - No recupera evidencia ni invoca al LLM.                                         |
+# ==================================================================================|
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import List, Optional
+import src.config as config
+import src.ingest.build_index as build_index
+from src.rag.retriever_utils import normalize_question
+
+def answer_key(question: str, mode: str, temperature: float, chunk_ids: List[str]) -> str:
+    payload = json.dumps(
+        [normalize_question(question), mode, float(temperature), config.LLM_MODEL, list(chunk_ids)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class AnswerCache:
+    def __init__(self,
+                 path: Path = config.ANSWER_CACHE_PATH,
+                 ttl: float = config.ANSWER_CACHE_TTL,
+                 max_entries: int = config.ANSWER_CACHE_MAX_ENTRIES):
+        self.path = Path(path)
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " key TEXT PRIMARY KEY,"
+            " index_version TEXT NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_last_access ON answers(last_access)")
+
+    def get(self, key: str) -> Optional[str]:
+        version = build_index.read_index_version()
+        now = time.time()
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT answer, index_version, created FROM answers WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+
+            answer, row_version, created = row
+
+            if row_version != version:
+                # El índice cambió: todo lo guardado con otra versión es inválido.
+                self._conn.execute("DELETE FROM answers WHERE index_version != ?", (version,))
+                return None
+
+            if self.ttl and created + self.ttl < now:
+                self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                return None
+
+            self._conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+            return answer
+
+    def put(self, key: str, answer: str) -> None:
+        version = build_index.read_index_version()
+        now = time.time()
+
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers (key, index_version, answer, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, version, answer, now, now),
+            )
+
+            count = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM answers WHERE key IN"
+                    " (SELECT key FROM answers ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
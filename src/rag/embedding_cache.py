@@ -0,0 +1,105 @@
+# ==================================================================================l
+# Caché de embeddings de preguntas (pregunta normalizada -> vector).                |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Evitar la llamada al modelo de embeddings para preguntas repetidas.             |
+# - Nivel 1: LRU en memoria acotado por número de entradas.                         |
+# - Nivel 2 (opcional): vectores float32 en disco vía mmap (EmbeddingStore).        |
+# - Llevar contadores de aciertos por nivel y tasa de acierto.                      |
+#                                                                                   |
+# No hace:                                                                          |
+# - No calcula embeddings (eso es del retriever).                                   |
+# ==================================================================================|
+import threading
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+import src.config as config
+from src.ingest.embedding_store import EmbeddingStore, content_key
+from src.rag.retriever_utils import normalize_question
+
+@dataclass
+class CacheStats:
+    memory_hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+
+    @property
+    def lookups(self) -> int:
+        return self.memory_hits + self.disk_hits + self.misses
+
+    @property
+    def hit_rate(self) -> float:
+        if not self.lookups:
+            return 0.0
+        return (self.memory_hits + self.disk_hits) / self.lookups
+
+class QueryEmbeddingCache:
+    def __init__(self,
+                 model: str = config.EMBED_MODEL,
+                 max_entries: int = config.QUERY_CACHE_SIZE,
+                 disk_path: Optional[Path] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.disk = EmbeddingStore(disk_path) if disk_path else None
+        self.stats = CacheStats()
+
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, array]" = OrderedDict()
+
+    def key(self, question: str) -> str:
+        return content_key(self.model, normalize_question(question))
+
+    def _remember(self, key: str, vector: array) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, question: str) -> Optional[List[float]]:
+        key = self.key(question)
+
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats.memory_hits += 1
+                return vector.tolist()
+
+        vector = self.disk.get(key) if self.disk is not None else None
+
+        with self._lock:
+            if vector is None:
+                self.stats.misses += 1
+                return None
+
+            self.stats.disk_hits += 1
+            self._remember(key, vector)
+            return vector.tolist()
+
+    def put(self, question: str, vector: Sequence[float]) -> None:
+        key = self.key(question)
+        data = array("f", vector)
+
+        with self._lock:
+            self._remember(key, data)
+
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self.stats = CacheStats()
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **asdict(self.stats),
+                "lookups": self.stats.lookups,
+                "hit_rate": round(self.stats.hit_rate, 4),
+                "memory_entries": len(self._memory),
+                "disk_entries": len(self.disk) if self.disk is not None else 0,
+            }
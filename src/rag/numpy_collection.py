@@ -0,0 +1,260 @@
+# ===================================================================================l
+# Backend vectorial exacto en NumPy (alternativa a la colección de Chroma).          |
+#                                                                                    |
+# Responsabilidad:                                                                   |
+# - Exportar una colección (ids, embeddings, documentos, metadata) a disco: matriz   |
+#   de vectores normalizados float32/float16 (.npy) y columnas de metadata           |
+#   (doc_type, year, period, audited) como arreglos tipados.                         |
+# - Abrir la matriz con mmap y responder query/get/count con el mismo contrato que   |
+#   Chroma, para que query_collection y get_evidence no cambien.                     |
+# - Traducir el filtro where a máscaras booleanas sobre las columnas y buscar con    |
+#   un matmul + argpartition: recall exacto (nunca menos de top_k si hay con qué).   |
+# - Registrar la versión del vector store exportada; al abrirla se rechaza si no     |
+#   coincide con la actual (session vuelve a Chroma).                                |
+#                                                                                    |
+# No hace:                                                                           |
+# - No calcula embeddings ni decide relajaciones de filtros (eso es del retriever).  |
+# - No admite escrituras incrementales: se re-exporta completo.                      |
+# ===================================================================================|
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+import src.config as config
+import src.ingest.build_index as build_index
+from src.ingest.chunk_store import ChunkStore, ChunkStoreWriter
+from src.ingest.columns import ColumnTable, save_array, save_columns
+from src.rag.retriever_utils import WHERE_OPERATORS
+
+INDEX_VERSION = 1
+
+META_FILE = "meta.json"
+IDS_FILE = "ids.json"
+VECTORS_FILE = "vectors.npy"
+RECORDS_DIR = "records"
+
+# Columnas con arreglo tipado; el resto de claves se evalúa fila a fila (WHERE_OPERATORS).
+FILTER_COLUMNS = ("doc_type", "year", "period", "audited")
+
+SCORE_BLOCK_ROWS = 65_536
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def export_collection(collection: Any,
+                      path: Path = config.NUMPY_INDEX_PATH,
+                      dtype: str = config.NUMPY_INDEX_DTYPE,
+                      batch_size: int = 5_000,
+                      index_version: Optional[str] = None) -> int:
+    # Sellada con la versión del vector store exportado (por defecto, la actual).
+    index_version = index_version if index_version is not None else build_index.read_index_version()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+
+    total = collection.count()
+    ids: List[str] = []
+    metadatas: List[Dict[str, Any]] = []
+    vectors: Optional[np.ndarray] = None
+    vectors_tmp = path / (VECTORS_FILE + ".tmp")
+
+    with ChunkStoreWriter(path / RECORDS_DIR) as writer:
+        for offset in range(0, total, batch_size):
+            page = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            block = np.asarray(page["embeddings"], dtype=np.float32)
+            if not len(block):
+                break
+
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(vectors_tmp, mode="w+", dtype=dtype, shape=(total, block.shape[1]))
+            vectors[len(ids):len(ids) + len(block)] = _normalize(block).astype(dtype)
+
+            for _id, doc, meta in zip(page["ids"], page["documents"] or [], page["metadatas"] or []):
+                meta = dict(meta or {})
+                writer.add({"chunk_id": _id, "doc_id": meta.get("doc_id", ""), "chunk_text": doc or "", "metadata": meta})
+                ids.append(_id)
+                metadatas.append(meta)
+
+    count = len(ids)
+    if vectors is None:
+        vectors = np.zeros((0, 0), dtype=dtype)
+        save_array(path / VECTORS_FILE, vectors)
+    else:
+        vectors.flush()
+        del vectors
+        os.replace(vectors_tmp, path / VECTORS_FILE)
+
+    columns = save_columns(path, {name: [m.get(name) for m in metadatas] for name in FILTER_COLUMNS})
+
+    ids_tmp = path / (IDS_FILE + ".tmp")
+    with ids_tmp.open("w", encoding="utf-8") as f:
+        json.dump(ids, f, ensure_ascii=False)
+    os.replace(ids_tmp, path / IDS_FILE)
+
+    # meta.json se escribe al final: su presencia marca una exportación completa.
+    meta_tmp = path / (META_FILE + ".tmp")
+    with meta_tmp.open("w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "index_version": index_version, "count": count, "dtype": dtype,
+                   "columns": columns}, f, ensure_ascii=False)
+    os.replace(meta_tmp, path / META_FILE)
+
+    return count
+
+class NumpyCollection:
+    def __init__(self, path: Path = config.NUMPY_INDEX_PATH, index_version: Optional[str] = None):
+        self.path = Path(path)
+
+        meta_path = self.path / META_FILE
+        if not meta_path.exists():
+            raise FileNotFoundError(f"El índice NumPy {self.path} no existe.")
+
+        with meta_path.open("r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Versión de índice NumPy no soportada en {self.path}: {meta.get('version')}")
+        # Con index_version se exige que la exportación corresponda al vector store actual.
+        if index_version is not None and meta.get("index_version") != index_version:
+            raise ValueError(f"El índice NumPy {self.path} está desactualizado respecto del vector store "
+                             f"({meta.get('index_version')} != {index_version}); vuelva a exportarlo con export_collection.")
+
+        with (self.path / IDS_FILE).open("r", encoding="utf-8") as f:
+            self.ids: List[str] = json.load(f)
+
+        self.columns: Dict[str, Any] = meta["columns"]
+        self.vectors = np.load(self.path / VECTORS_FILE, mmap_mode="r")
+        self.records = ChunkStore(self.path / RECORDS_DIR)
+
+        self._table = ColumnTable(self.path, self.columns, len(self.ids))
+
+        self._ordinal: Optional[Dict[str, int]] = None
+        self._fallback: Optional[List[Dict[str, Any]]] = None
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def close(self) -> None:
+        self.records.close()
+
+    # ------------------------------------------------------------------
+    # Filtro where -> máscara booleana
+    # ------------------------------------------------------------------
+
+    def _metadata_rows(self) -> List[Dict[str, Any]]:
+        # Solo para claves sin columna tipada: se carga una vez y se reutiliza.
+        if self._fallback is None:
+            self._fallback = [r.get("metadata", {}) for r in self.records]
+        return self._fallback
+
+    def _row_mask(self, key: str, op: str, c: Any) -> np.ndarray:
+        rows = self._metadata_rows()
+        check = WHERE_OPERATORS[op]
+        return np.fromiter((check(r.get(key), c) for r in rows), dtype=bool, count=len(rows))
+
+    def mask(self, where: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        return self._table.mask(where, self._row_mask)
+
+    # ------------------------------------------------------------------
+    # Búsqueda
+    # ------------------------------------------------------------------
+
+    def _similarities(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        if rows is not None:
+            return queries @ np.asarray(self.vectors[rows], dtype=np.float32).T
+
+        n = self.count()
+        sims = np.empty((len(queries), n), dtype=np.float32)
+        # Por bloques: con float16 evita convertir la matriz completa en cada consulta.
+        for lo in range(0, n, SCORE_BLOCK_ROWS):
+            hi = min(lo + SCORE_BLOCK_ROWS, n)
+            sims[:, lo:hi] = queries @ np.asarray(self.vectors[lo:hi], dtype=np.float32).T
+        return sims
+
+    def _row(self, ordinal: int) -> Dict[str, Any]:
+        return self.records.get(self.ids[ordinal]) or {}
+
+    def query(self,
+              query_embeddings: Sequence[Sequence[float]],
+              n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None,
+              include: Iterable[str] = ("documents", "metadatas", "distances"),
+              **_: Any) -> Dict[str, Any]:
+        include = set(include)
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        queries = _normalize(queries)
+
+        mask = self.mask(where)
+        rows: Optional[np.ndarray] = None
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+
+        n_candidates = self.count() if rows is None else len(rows)
+        k = min(max(n_results, 0), n_candidates)
+
+        out: Dict[str, Any] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        if k == 0 or self.vectors.ndim != 2 or not self.vectors.shape[1]:
+            for _ in range(len(queries)):
+                for field in out:
+                    out[field].append([])
+            return {f: v for f, v in out.items() if f == "ids" or f in include}
+
+        # Filtro poco selectivo (pasa más de la mitad): matmul por bloques de toda la matriz y se
+        # enmascara. Si es selectivo, solo se multiplican las filas que pasan.
+        if rows is not None and len(rows) > self.count() // 2:
+            sims = self._similarities(queries, None)
+            sims[:, ~mask] = -np.inf
+            rows = None
+        else:
+            sims = self._similarities(queries, rows)
+
+        top = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < sims.shape[1] else np.tile(np.arange(sims.shape[1]), (len(queries), 1))
+
+        for q in range(len(queries)):
+            cols = top[q][np.argsort(-sims[q, top[q]], kind="stable")]
+            ordinals = cols if rows is None else rows[cols]
+            records = [self._row(int(i)) for i in ordinals] if ("documents" in include or "metadatas" in include) else []
+
+            out["ids"].append([self.ids[int(i)] for i in ordinals])
+            out["distances"].append([float(1.0 - s) for s in sims[q, cols]])
+            out["documents"].append([r.get("chunk_text", "") for r in records])
+            out["metadatas"].append([r.get("metadata", {}) for r in records])
+
+        return {f: v for f, v in out.items() if f == "ids" or f in include}
+
+    def get(self,
+            ids: Optional[Sequence[str]] = None,
+            where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None,
+            offset: Optional[int] = None,
+            include: Iterable[str] = ("documents", "metadatas"),
+            **_: Any) -> Dict[str, Any]:
+        include = set(include)
+
+        if ids is not None:
+            if self._ordinal is None:
+                self._ordinal = {_id: i for i, _id in enumerate(self.ids)}
+            ordinals = [self._ordinal[_id] for _id in ids if _id in self._ordinal]
+        else:
+            ordinals = list(range(self.count()))
+
+        mask = self.mask(where)
+        if mask is not None:
+            ordinals = [i for i in ordinals if mask[i]]
+
+        start = offset or 0
+        ordinals = ordinals[start:start + limit] if limit is not None else ordinals[start:]
+
+        out: Dict[str, Any] = {"ids": [self.ids[i] for i in ordinals]}
+        if "documents" in include or "metadatas" in include:
+            records = [self._row(i) for i in ordinals]
+            if "documents" in include:
+                out["documents"] = [r.get("chunk_text", "") for r in records]
+            if "metadatas" in include:
+                out["metadatas"] = [r.get("metadata", {}) for r in records]
+        if "embeddings" in include:
+            out["embeddings"] = np.asarray(self.vectors[ordinals], dtype=np.float32)
+
+        return out
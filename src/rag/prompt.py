@@ -7,13 +7,18 @@
 #   - no inventar si no hay evidencia                                            |
 #   - no mezclar años o fuentes                                                  |
 #   - incluir citas (documento/página) cuando sea posible                        |
+# - Empaquetar la evidencia en el contexto: fusionar chunks contiguos o          |
+#   solapados de la misma página (sin repetir el solape), ordenar por            |
+#   relevancia y llenar un presupuesto de tokens sin perder las citas.           |
 #                                                                                | 
 # No hace:                                                                       |
 # - No recupera documentos.                                                      |
 # - No llama directamente al vector store.                                       |
 # ===============================================================================|
-from typing import Any, List
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
+from src.config import CONTEXT_MAX_TOKENS
+from src.ingest.tokens import estimate_tokens
 
 SYSTEM_RULES_BASE = """\
 Eres un asistente de QA financiero especializado en análisis de estados financieros.
@@ -152,26 +157,117 @@ INSTRUCCIONES:
 
 CURRENT_YEAR = datetime.now().year
 
-def build_context(evidences: List[Any], max_chars_per_chunk: int = 1600) -> str:
-    parts: List[str] = []
+# Solape mínimo (en caracteres) para considerar que dos chunks repiten texto.
+MIN_OVERLAP_CHARS = 20
+
+# Bajo este resto de presupuesto no vale la pena recortar una fuente para que entre.
+MIN_PARTIAL_TOKENS = 64
+
+def _evidence_fields(ev: Any) -> Tuple[Dict[str, Any], str]:
+    meta = ev.metadata if hasattr(ev, "metadata") else ev.get("metadata", {})
+    text = ev.text if hasattr(ev, "text") else ev.get("text", "")
+    return meta or {}, text or ""
+
+def _overlap(left: str, right: str) -> int:
+    # Largo del sufijo más largo de left que es prefijo de right (el solape del splitter).
+    if len(right) < MIN_OVERLAP_CHARS:
+        return len(right) if right in left else 0
+
+    probe = right[:MIN_OVERLAP_CHARS]
+    pos = left.find(probe, max(0, len(left) - len(right)))
+    while pos != -1:
+        if right.startswith(left[pos:]):
+            return len(left) - pos
+        pos = left.find(probe, pos + 1)
+
+    return len(right) if right in left else 0
+
+def _chunk_index(meta: Dict[str, Any]) -> Optional[int]:
+    value = meta.get("chunk_index")
+    return value if isinstance(value, int) else None
+
+def _merge_page(items: List[Tuple[int, Dict[str, Any], str]]) -> List[Dict[str, Any]]:
+    # items: (rango de relevancia, metadata, texto) de una misma página, en orden de lectura.
+    blocks: List[Dict[str, Any]] = []
+
+    for rank, meta, text in items:
+        prev = blocks[-1] if blocks else None
+        if prev is not None:
+            idx = _chunk_index(meta)
+            adjacent = idx is not None and prev["last_index"] is not None and idx - prev["last_index"] == 1
+            n = _overlap(prev["text"], text)
+            if n or adjacent:
+                if n < len(text):
+                    prev["text"] = prev["text"] + ("" if n else "\n") + text[n:]
+                prev["rank"] = min(prev["rank"], rank)
+                prev["chunk_ids"].append(str(meta.get("chunk_id", "N/A")))
+                prev["last_index"] = idx if idx is not None else prev["last_index"]
+                continue
 
-    for i, ev in enumerate(evidences, start=1):
-        meta = ev.metadata if hasattr(ev, "metadata") else ev.get("metadata", {})
-        text = ev.text if hasattr(ev, "text") else ev.get("text", "")
+        blocks.append({
+            "rank": rank,
+            "meta": meta,
+            "text": text,
+            "chunk_ids": [str(meta.get("chunk_id", "N/A"))],
+            "last_index": _chunk_index(meta),
+        })
 
-        doc_id = meta.get("doc_id", "N/A")
-        year = meta.get("year", "N/A")
-        doc_type = meta.get("doc_type", "N/A")
-        page = meta.get("page_number", "N/A")
-        chunk_id = meta.get("chunk_id", "N/A")
+    return blocks
 
+def pack_evidences(evidences: List[Any], max_chars_per_chunk: int = 1600) -> List[Dict[str, Any]]:
+    # Agrupa por (doc_id, página); cada bloque conserva el mejor rango de sus chunks.
+    pages: Dict[Tuple[Any, Any], List[Tuple[int, Dict[str, Any], str]]] = {}
+    blocks: List[Dict[str, Any]] = []
+
+    for rank, ev in enumerate(evidences):
+        meta, text = _evidence_fields(ev)
+        text = text.strip()
         if max_chars_per_chunk and len(text) > max_chars_per_chunk:
-            text = text[:max_chars_per_chunk] + "…"
+            # Un chunk recortado ya no solapa con su vecino: va como bloque propio.
+            blocks.append({"rank": rank, "meta": meta, "text": text[:max_chars_per_chunk] + "…",
+                           "chunk_ids": [str(meta.get("chunk_id", "N/A"))], "last_index": None})
+            continue
+        pages.setdefault((meta.get("doc_id"), meta.get("page_number")), []).append((rank, meta, text))
+
+    for items in pages.values():
+        items.sort(key=lambda item: (_chunk_index(item[1]) is None, _chunk_index(item[1]) or 0, item[0]))
+        blocks.extend(_merge_page(items))
+
+    blocks.sort(key=lambda block: block["rank"])
+    return blocks
+
+def _source_header(i: int, meta: Dict[str, Any], chunk_ids: List[str]) -> str:
+    return (
+        f"[Fuente {i}] "
+        f"doc_id={meta.get('doc_id', 'N/A')} | año_del_documento={meta.get('year', 'N/A')} | "
+        f"tipo={meta.get('doc_type', 'N/A')} | página={meta.get('page_number', 'N/A')} | chunk_id={','.join(chunk_ids)} | \n"
+    )
+
+def build_context(evidences: List[Any],
+                  max_chars_per_chunk: int = 1600,
+                  max_tokens: Optional[int] = CONTEXT_MAX_TOKENS) -> str:
+    # El año actual va una sola vez al inicio, no repetido en cada fuente.
+    preamble = f"año_actual_para_respuesta={CURRENT_YEAR}\n"
+    budget = (max_tokens - estimate_tokens(preamble)) if max_tokens else None
+    parts: List[str] = []
+
+    for block in pack_evidences(evidences, max_chars_per_chunk):
+        header = _source_header(len(parts) + 1, block["meta"], block["chunk_ids"])
+        text = block["text"]
+
+        if budget is not None:
+            cost = estimate_tokens(header) + estimate_tokens(text)
+            if cost > budget:
+                room = budget - estimate_tokens(header)
+                # La fuente más relevante entra siempre, aunque sea recortada.
+                if parts and room < MIN_PARTIAL_TOKENS:
+                    continue
+                text = text[:max(room, MIN_PARTIAL_TOKENS) * 3].rstrip() + "…"
+                cost = estimate_tokens(header) + estimate_tokens(text)
+            budget -= cost
 
-        parts.append(
-            f"[Fuente {i}] "
-            f"año_actual_para_respuesta={CURRENT_YEAR} | doc_id={doc_id} | año_del_documento={year} | tipo={doc_type} | página={page} | chunk_id={chunk_id} | \n"
-            f"{text}\n"
-        )
+        parts.append(f"{header}{text}\n")
 
-    return "\n".join(parts).strip()
+    if not parts:
+        return ""
+    return (preamble + "\n" + "\n".join(parts)).strip()
@@ -14,24 +14,47 @@
 # =====================================================|
 #from src.rag.retriever import retrieve, Evidence
 import src.rag.retriever as retriever
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import List, Dict, Optional, Any, Tuple
+from typing import List, Dict, Iterator, Optional, Any
 import src.rag.prompt as prompt
+import src.rag.answer_cache as answer_cache
+import src.rag.tracing as tracing
 import src.config as config
-from openai import OpenAI
+from src.rag.session import AsyncLimits, RetrieverSession, get_async_limits, get_default_session
+
+NO_EVIDENCE_ANSWER = "Lo siento, no pude encontrar información relevante para responder a su pregunta."
 
 @dataclass
 class QAResult:
     answer: str
     evidences: List[retriever.Evidence]
+    error: Optional[Exception] = None
   
-def build_messages(question: str, evidences: List[retriever.Evidence], mode: str="strict") -> List[Dict[str, str]]:
-    context = prompt.build_context(evidences)
+def normalize_mode(mode: str) -> str:
     mode = (mode or "strict").strip().lower()
     
     if mode not in ("strict", "explanatory"):
         mode = "strict"
     
+    return mode
+
+def cache_key(session: RetrieverSession,
+              question: str,
+              evidences: List[retriever.Evidence],
+              mode: str,
+              temperature: float) -> Optional[str]:
+    if session.answer_cache is None:
+        return None
+    return answer_cache.answer_key(question, normalize_mode(mode), temperature, [ev.chunk_id for ev in evidences])
+
+def build_messages(question: str, evidences: List[retriever.Evidence], mode: str="strict") -> List[Dict[str, str]]:
+    with tracing.span("build_context", evidences=len(evidences)):
+        context = prompt.build_context(evidences)
+    mode = normalize_mode(mode)
+    
     system_rules: str = ""
     
     if mode == "strict":
@@ -54,35 +77,222 @@ def answer_question(question: str,
                     top_k: int=config.TOP_K,
                     where: Optional[Dict[str, Any]]=None,
                     temperature: float=0.1,
-                    mode: str="strict") -> QAResult:
+                    mode: str="strict",
+                    session: Optional[RetrieverSession]=None,
+                    stream: bool=False) -> "QAResult | QAStream":
+    if stream:
+        return answer_question_stream(question, top_k=top_k, where=where, temperature=temperature, mode=mode, session=session)
+
     if not config.API_KEY:
         raise ValueError("API_KEY no está configurada. Por favor, configure la clave de API para el LLM.")
     
-    evidences = retriever.retrieve(question, top_k=top_k, where=where, return_debug=False)
-              
-    if isinstance(evidences, Tuple):
-        evidences, _ = evidences
-        print("\n=== DEBUG detect_signals ===")
-        print("key:", _.key)
-        print("score:", _.score)
-        print("where:", _.where)
-        print("debug:", _.debug)
-              
-    if not evidences:
-        return QAResult(
-            answer="Lo siento, no pude encontrar información relevante para responder a su pregunta.",
-            evidences=[]
+    session = session or get_default_session()
+
+    with tracing.trace("answer_question", mode=normalize_mode(mode)):
+        evidences, match_r = retriever.retrieve(question, top_k=top_k, where=where, return_debug=True, session=session)
+        tracing.annotate(signal_key=match_r.key, signal_score=match_r.score, where=match_r.where, evidences=len(evidences))
+
+        if not evidences:
+            tracing.count("no_evidence_total")
+            return QAResult(
+                answer=NO_EVIDENCE_ANSWER,
+                evidences=[]
+            )
+
+        answer = generate_answer(session, question, evidences, mode, temperature)
+
+    return QAResult(answer=answer, evidences=evidences)
+
+def generate_answer(session: RetrieverSession,
+                    question: str,
+                    evidences: List[retriever.Evidence],
+                    mode: str="strict",
+                    temperature: float=0.1) -> str:
+    key = cache_key(session, question, evidences, mode, temperature)
+    if key is not None:
+        cached = session.answer_cache.get(key)
+        tracing.count("answer_cache_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            return cached
+
+    messages = build_messages(question, evidences, mode)
+    
+    with tracing.span("chat", model=config.LLM_MODEL):
+        response = session.oai.chat.completions.create(
+            model=config.LLM_MODEL,
+            messages=messages,
+            temperature=temperature
         )
+    tracing.record_usage(response.usage)
     
+    answer = (response.choices[0].message.content or "").strip()
+
+    if key is not None:
+        session.answer_cache.put(key, answer)
+
+    return answer
+
+class QAStream:
+    def __init__(self, evidences: List[retriever.Evidence], deltas: Iterator[str]):
+        self.evidences = evidences
+        self.result: Optional[QAResult] = None
+        self._deltas = deltas
+        self._parts: List[str] = []
+
+    def __iter__(self) -> Iterator[str]:
+        for delta in self._deltas:
+            self._parts.append(delta)
+            yield delta
+
+        self.result = QAResult(answer="".join(self._parts).strip(), evidences=self.evidences)
+
+    def finalize(self) -> QAResult:
+        for _ in self:
+            pass
+        return self.result
+
+def stream_answer(session: RetrieverSession,
+                  question: str,
+                  evidences: List[retriever.Evidence],
+                  mode: str="strict",
+                  temperature: float=0.1) -> Iterator[str]:
+    key = cache_key(session, question, evidences, mode, temperature)
+    if key is not None:
+        cached = session.answer_cache.get(key)
+        tracing.count("answer_cache_total", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            yield cached
+            return
+
     messages = build_messages(question, evidences, mode)
-    
-    client = OpenAI(api_key=config.API_KEY)
-    response = client.chat.completions.create(
+    extra: Dict[str, Any] = {"stream_options": {"include_usage": True}} if tracing.is_enabled() else {}
+
+    start = time.perf_counter()
+    response = session.oai.chat.completions.create(
         model=config.LLM_MODEL,
         messages=messages,
-        temperature=temperature
+        temperature=temperature,
+        stream=True,
+        **extra
     )
+
+    parts: List[str] = []
+
+    for chunk in response:
+        if getattr(chunk, "usage", None) is not None:
+            tracing.record_usage(chunk.usage)
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if not parts:
+                tracing.observe("chat_first_token", time.perf_counter() - start)
+            parts.append(delta)
+            yield delta
+
+    tracing.observe("chat_stream", time.perf_counter() - start)
+
+    if key is not None:
+        session.answer_cache.put(key, "".join(parts).strip())
+
+def answer_question_stream(question: str,
+                           top_k: int=config.TOP_K,
+                           where: Optional[Dict[str, Any]]=None,
+                           temperature: float=0.1,
+                           mode: str="strict",
+                           session: Optional[RetrieverSession]=None) -> QAStream:
+    if not config.API_KEY:
+        raise ValueError("API_KEY no está configurada. Por favor, configure la clave de API para el LLM.")
     
-    answer = (response.choices[0].message.content or "").strip()
+    session = session or get_default_session()
+
+    with tracing.trace("answer_question_stream", mode=normalize_mode(mode)):
+        evidences = retriever.retrieve(question, top_k=top_k, where=where, return_debug=False, session=session)
+
+    if not evidences:
+        tracing.count("no_evidence_total")
+        return QAStream(evidences=[], deltas=iter([NO_EVIDENCE_ANSWER]))
+
+    # La evidencia queda disponible de inmediato; el LLM se invoca al iterar.
+    return QAStream(evidences=evidences, deltas=stream_answer(session, question, evidences, mode, temperature))
+
+def answer_many(questions: List[str],
+                top_k: int=config.TOP_K,
+                where: Optional[Dict[str, Any]]=None,
+                temperature: float=0.1,
+                mode: str="strict",
+                session: Optional[RetrieverSession]=None,
+                max_workers: int=config.QA_MAX_CONCURRENCY) -> List[QAResult]:
+    if not config.API_KEY:
+        raise ValueError("API_KEY no está configurada. Por favor, configure la clave de API para el LLM.")
     
+    session = session or get_default_session()
+    retrieved = retriever.retrieve_many(questions, top_k=top_k, where=where, session=session)
+
+    def answer_one(r: retriever.RetrievalResult) -> QAResult:
+        if r.error is not None:
+            return QAResult(answer="", evidences=[], error=r.error)
+        if not r.evidences:
+            return QAResult(answer=NO_EVIDENCE_ANSWER, evidences=[])
+        try:
+            answer = generate_answer(session, r.question, r.evidences, mode, temperature)
+        except Exception as e:
+            return QAResult(answer="", evidences=r.evidences, error=e)
+        return QAResult(answer=answer, evidences=r.evidences)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        return list(pool.map(answer_one, retrieved))
+
+async def answer_question_async(question: str,
+                                top_k: int=config.TOP_K,
+                                where: Optional[Dict[str, Any]]=None,
+                                temperature: float=0.1,
+                                mode: str="strict",
+                                session: Optional[RetrieverSession]=None,
+                                limits: Optional[AsyncLimits]=None) -> QAResult:
+    if not config.API_KEY:
+        raise ValueError("API_KEY no está configurada. Por favor, configure la clave de API para el LLM.")
+    
+    session = session or get_default_session()
+    limits = limits or get_async_limits()
+
+    with tracing.trace("answer_question", mode=normalize_mode(mode)):
+        evidences, match_r = await retriever.retrieve_async(question, top_k=top_k, where=where, session=session, limits=limits)
+        tracing.annotate(signal_key=match_r.key, signal_score=match_r.score, where=match_r.where, evidences=len(evidences))
+
+        if not evidences:
+            tracing.count("no_evidence_total")
+            return QAResult(
+                answer=NO_EVIDENCE_ANSWER,
+                evidences=[]
+            )
+
+        # La caché de respuestas es SQLite (bloqueante): se consulta desde el pool de hilos.
+        loop = asyncio.get_running_loop()
+        key = cache_key(session, question, evidences, mode, temperature)
+        if key is not None:
+            cached = await loop.run_in_executor(limits.executor, session.answer_cache.get, key)
+            tracing.count("answer_cache_total", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                return QAResult(answer=cached, evidences=evidences)
+
+        messages = build_messages(question, evidences, mode)
+
+        async with limits.chat:
+            with tracing.span("chat", model=config.LLM_MODEL):
+                response = await asyncio.wait_for(
+                    session.async_oai.chat.completions.create(
+                        model=config.LLM_MODEL,
+                        messages=messages,
+                        temperature=temperature
+                    ),
+                    limits.chat_timeout,
+                )
+        tracing.record_usage(response.usage)
+
+        answer = (response.choices[0].message.content or "").strip()
+
+        if key is not None:
+            await loop.run_in_executor(limits.executor, session.answer_cache.put, key, answer)
+
     return QAResult(answer=answer, evidences=evidences)
\ No newline at end of file
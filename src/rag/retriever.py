@@ -4,20 +4,29 @@
 # Responsabilidad:                                                                    |
 # - Recibir una pregunta y recuperar los chunks más relevantes desde el vector store. |
 # - Aplicar reglas de búsqueda y/o filtros por metadata (ej. año, tipo de documento). |
+# - Buscar por vector (Chroma), por BM25 (índice léxico) o fusionando ambos (RRF).    |
 # - Devolver evidencia lista para ser usada como contexto por el generador.           |
 #                                                                                     |
 # No hace:                                                                            |
 # - No redacta la respuesta final (eso es del QA).                                    |
 # - No define la política de respuesta (eso es del prompt).                           |
 # ====================================================================================|
+import asyncio
+import functools
+import json
 from dataclasses import dataclass
 from typing import Dict
 import src.ingest.build_index as build_index
-from openai import OpenAI
+from openai import AsyncOpenAI
+from src.ingest.embeddings import EmbeddingBackend
 from typing import List, Any, Optional
 import src.config as config
 from typing import Dict, Any, Tuple
 import src.rag.retriever_utils as retriever_utils
+import src.rag.tracing as tracing
+from src.rag.session import AsyncLimits, RetrieverSession, get_async_limits, get_default_session
+from src.rag.embedding_cache import QueryEmbeddingCache
+from src.ingest.metadata_index import MetadataIndex
 
 @dataclass
 class Evidence:
@@ -26,8 +35,40 @@ class Evidence:
     metadata: Dict[str, Any]
     distance: float
 
-def embed_query(oai: OpenAI, question: str) -> List[float]:
-    return build_index.embed_texts(oai, [question])[0]
+def embed_query(oai: build_index.Embedder, question: str, cache: Optional[QueryEmbeddingCache]=None) -> List[float]:
+    if cache is not None:
+        vector = cache.get(question)
+        if vector is not None:
+            tracing.count("embedding_cache_total", result="hit")
+            return vector
+        tracing.count("embedding_cache_total", result="miss")
+
+    vector = build_index.embed_texts(oai, [question])[0]
+
+    if cache is not None:
+        cache.put(question, vector)
+
+    return vector
+
+async def embed_query_async(oai: AsyncOpenAI | EmbeddingBackend,
+                            question: str,
+                            cache: Optional[QueryEmbeddingCache]=None,
+                            limits: Optional[AsyncLimits]=None) -> List[float]:
+    if cache is not None:
+        vector = cache.get(question)
+        if vector is not None:
+            tracing.count("embedding_cache_total", result="hit")
+            return vector
+        tracing.count("embedding_cache_total", result="miss")
+
+    limits = limits or get_async_limits()
+    async with limits.embed:
+        vector = (await asyncio.wait_for(build_index.embed_texts_async(oai, [question]), limits.embed_timeout))[0]
+
+    if cache is not None:
+        cache.put(question, vector)
+
+    return vector
 
 def normalize_where(where: Dict[str, Any]) -> Dict[str, Any]:
     if not where:
@@ -43,13 +84,50 @@ def normalize_where(where: Dict[str, Any]) -> Dict[str, Any]:
     
     return {"$and": items}
 
+# Evaluación local del filtro where (misma semántica que Chroma); vive en retriever_utils.
+WHERE_OPERATORS = retriever_utils.WHERE_OPERATORS
+matches_where = retriever_utils.matches_where
+
+def relaxation_levels(where: Optional[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+    if not where:
+        return [None]
+
+    levels: List[Optional[Dict[str, Any]]] = [where]
+
+    for key in ("period", "year"):
+        if key in where:
+            relaxed = dict(where)
+            relaxed.pop(key, None)
+            if relaxed:
+                levels.append(relaxed)
+
+    levels.append(None)
+    return levels
+
+def common_where(levels: List[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    filtered = [l for l in levels if l]
+    if not filtered or any(k.startswith("$") for l in filtered for k in l):
+        return {}
+
+    common = dict(filtered[0])
+    for level in filtered[1:]:
+        common = {k: v for k, v in common.items() if k in level and level[k] == v}
+
+    return common
+
 def query_collection(collection,
                      query_vector: List[float],
                      top_k: int,
                      where: Optional[Dict[str, Any]] = None):
+    return query_collection_many(collection, [query_vector], top_k, where)
+
+def query_collection_many(collection,
+                          query_vectors: List[List[float]],
+                          top_k: int,
+                          where: Optional[Dict[str, Any]] = None):
     
     kwargs = {
-        "query_embeddings": [query_vector],
+        "query_embeddings": query_vectors,
         "n_results": top_k,
         "include": ["documents", "metadatas", "distances"]
     }
@@ -59,10 +137,10 @@ def query_collection(collection,
 
     return collection.query(**kwargs)    
 
-def get_evidence(result) -> List[Evidence]:
-    docs = result.get("documents", [[]])[0] or []
-    metas = result.get("metadatas", [[]])[0] or []
-    dists = result.get("distances", [[]])[0] or []
+def get_evidence(result, index: int=0) -> List[Evidence]:
+    docs = (result.get("documents") or [[]])[index] or []
+    metas = (result.get("metadatas") or [[]])[index] or []
+    dists = (result.get("distances") or [[]])[index] or []
 
     evidences: List[Evidence] = []
 
@@ -78,38 +156,429 @@ def get_evidence(result) -> List[Evidence]:
 
     return evidences
 
+def retrieve_cascade(collection,
+                     query_vector: List[float],
+                     top_k: int,
+                     where: Optional[Dict[str, Any]],
+                     start: int=0) -> List[Evidence]:
+    evidences: List[Evidence] = []
+    levels = relaxation_levels(where)
+
+    for attempt in range(min(start, len(levels) - 1), len(levels)):
+        level = levels[attempt]
+        if attempt > start:
+            tracing.count("relaxation_fallbacks_total", level=attempt)
+        with tracing.span("query_collection", attempt=attempt, where=level):
+            result = query_collection(collection, query_vector, top_k, level)
+        evidences = get_evidence(result)
+        if evidences:
+            break
+
+    return evidences
+
+def plan_start(index: Optional[MetadataIndex],
+               levels: List[Optional[Dict[str, Any]]],
+               top_k: int) -> int:
+    # Sin índice (o con claves que no cuenta) se parte del filtro original, como en cascade.
+    start = index.plan(levels, top_k) if index is not None else None
+    if start:
+        tracing.count("planned_relaxations_total", level=start)
+    return start or 0
+
+def retrieve_planned(collection,
+                     query_vector: List[float],
+                     top_k: int,
+                     where: Optional[Dict[str, Any]],
+                     index: Optional[MetadataIndex]) -> List[Evidence]:
+    # El conteo previo elige el nivel; la cascada desde ahí solo sigue si el índice quedó desactualizado.
+    with tracing.span("plan_filter"):
+        start = plan_start(index, relaxation_levels(where), top_k)
+    return retrieve_cascade(collection, query_vector, top_k, where, start=start)
+
+def retrieve_wide(collection,
+                  query_vector: List[float],
+                  top_k: int,
+                  where: Optional[Dict[str, Any]],
+                  overfetch: int=config.WIDE_QUERY_FACTOR) -> List[Evidence]:
+    levels = relaxation_levels(where)
+    base = common_where(levels)
+
+    with tracing.span("query_collection", attempt=0, where=base or None):
+        result = query_collection(collection, query_vector, top_k * max(overfetch, 1), base or None)
+    candidates = get_evidence(result)
+
+    # Solo si el filtro base no devuelve nada hace falta la consulta sin filtro.
+    if not candidates and base:
+        tracing.count("relaxation_fallbacks_total", level="unfiltered")
+        with tracing.span("query_collection", attempt=1, where=None):
+            result = query_collection(collection, query_vector, top_k, None)
+        return get_evidence(result)
+
+    return rank_by_levels(candidates, levels, top_k)
+
+def rank_by_levels(candidates: List[Evidence],
+                   levels: List[Optional[Dict[str, Any]]],
+                   top_k: int) -> List[Evidence]:
+    def level_rank(ev: Evidence) -> int:
+        for rank, level in enumerate(levels):
+            if matches_where(ev.metadata, level):
+                return rank
+        return len(levels)
+
+    ranked = sorted(candidates, key=lambda ev: (level_rank(ev), ev.distance))
+    return ranked[:top_k]
+
+def bm25_evidence(session: RetrieverSession, hits: List[Tuple[int, float]]) -> List[Evidence]:
+    index = session.bm25
+    store = session.chunk_store
+    evidences: List[Evidence] = []
+
+    for ordinal, score in hits:
+        chunk_id = index.chunk_id(ordinal)
+        record = store.get(chunk_id)
+        if record is None:
+            # Sin texto no hay evidencia: mejor una fuente menos que una vacía en el prompt.
+            tracing.count("bm25_missing_chunks_total")
+            continue
+        evidences.append(
+            Evidence(
+                chunk_id=chunk_id,
+                text=record["chunk_text"],
+                metadata={k: v for k, v in record.items() if k != "chunk_text"},
+                # Más puntaje BM25 -> menor "distancia", para ordenar igual que Chroma.
+                distance=1.0 / (1.0 + score)
+            )
+        )
+
+    return evidences
+
+def retrieve_bm25(session: RetrieverSession,
+                  question: str,
+                  top_k: int,
+                  where: Optional[Dict[str, Any]]) -> List[Evidence]:
+    index = session.bm25
+    hits: List[Tuple[int, float]] = []
+
+    for attempt, level in enumerate(relaxation_levels(where)):
+        if attempt:
+            tracing.count("relaxation_fallbacks_total", level=attempt)
+        with tracing.span("bm25_search", attempt=attempt, where=level):
+            hits = index.search(question, top_k, normalize_where(level) if level else None, matches_where)
+        if hits:
+            break
+
+    with tracing.span("hydrate_chunks", chunks=len(hits)):
+        return bm25_evidence(session, hits)
+
+def fuse_rrf(rankings: List[List[Evidence]], top_k: int, k: int=config.HYBRID_RRF_K) -> List[Evidence]:
+    scores: Dict[str, float] = {}
+    first: Dict[str, Evidence] = {}
+
+    for ranking in rankings:
+        for rank, ev in enumerate(ranking):
+            scores[ev.chunk_id] = scores.get(ev.chunk_id, 0.0) + 1.0 / (k + rank + 1)
+            first.setdefault(ev.chunk_id, ev)
+
+    # Puntaje RRF normalizado a [0, 1): 0 = primero en todas las listas.
+    best = len(rankings) / (k + 1)
+    fused: List[Evidence] = []
+    for chunk_id in sorted(scores, key=lambda c: -scores[c])[:top_k]:
+        ev = first[chunk_id]
+        fused.append(Evidence(chunk_id=ev.chunk_id, text=ev.text, metadata=ev.metadata, distance=1.0 - scores[chunk_id] / best))
+
+    return fused
+
+def vector_search(session: RetrieverSession,
+                  query_vector: List[float],
+                  top_k: int,
+                  where: Optional[Dict[str, Any]],
+                  strategy: str=config.RETRIEVAL_STRATEGY) -> List[Evidence]:
+    if strategy == "wide":
+        return retrieve_wide(session.collection, query_vector, top_k, where)
+    if strategy == "planned":
+        return retrieve_planned(session.collection, query_vector, top_k, where, session.metadata_index)
+    return retrieve_cascade(session.collection, query_vector, top_k, where)
+
+def resolve_search(session: RetrieverSession, search: str) -> str:
+    # Sin índice BM25 utilizable (ausente o desactualizado) se degrada a búsqueda vectorial.
+    if search in ("bm25", "hybrid") and session.bm25 is None:
+        tracing.count("lexical_fallbacks_total", search=search)
+        return "vector"
+    return search
+
+def search_evidence(session: RetrieverSession,
+                    question: str,
+                    query_vector: Optional[List[float]],
+                    top_k: int,
+                    where: Optional[Dict[str, Any]],
+                    strategy: str=config.RETRIEVAL_STRATEGY,
+                    search: str=config.RETRIEVAL_SEARCH) -> List[Evidence]:
+    if search == "bm25":
+        return retrieve_bm25(session, question, top_k, where)
+
+    if search != "hybrid":
+        return vector_search(session, query_vector, top_k, where, strategy)
+
+    n = top_k * max(config.HYBRID_QUERY_FACTOR, 1)
+    dense = vector_search(session, query_vector, n, where, strategy)
+    lexical = retrieve_bm25(session, question, n, where)
+    with tracing.span("fuse_rrf", dense=len(dense), lexical=len(lexical)):
+        return fuse_rrf([dense, lexical], top_k)
+
 def retrieve(question: str,
              top_k: int=config.TOP_K,
              where: Optional[Dict[str, Any]]=None,
-             return_debug: bool=True) -> List[Evidence] | Tuple[List[Evidence], retriever_utils.SignalMatch]:
+             return_debug: bool=True,
+             session: Optional[RetrieverSession]=None,
+             strategy: str=config.RETRIEVAL_STRATEGY,
+             search: str=config.RETRIEVAL_SEARCH) -> List[Evidence] | Tuple[List[Evidence], retriever_utils.SignalMatch]:
     
-    oai, collection = build_index.get_clients()
-    query_vector = embed_query(oai, question)
+    session = session or get_default_session()
+    search = resolve_search(session, search)
 
-    match_r = retriever_utils.detect_signals(question)
-    effective_where = where if where is not None else match_r.where
+    with tracing.trace("retrieve", strategy=strategy, search=search, top_k=top_k) as span:
+        # En modo bm25 no hay ida y vuelta a la API de embeddings.
+        query_vector = None
+        if search != "bm25":
+            with tracing.span("embed_query"):
+                query_vector = embed_query(session.embedder, question, cache=session.embedding_cache)
 
-    result = query_collection(collection, query_vector, top_k, effective_where)
-    evidences = get_evidence(result)
+        with tracing.span("detect_signals"):
+            match_r = retriever_utils.detect_signals(question)
+        effective_where = where if where is not None else match_r.where
 
-    if not evidences and effective_where:
-        if "period" in effective_where:
-            relaxed = dict(effective_where)
-            relaxed.pop("period", None)
-            result = query_collection(collection, query_vector, top_k, relaxed)
-            evidences = get_evidence (result)
-    
-    if not evidences and effective_where and "year" in effective_where:
-        relaxed = dict(effective_where)
-        relaxed.pop("year", None)
-        result = query_collection(collection, query_vector, top_k, relaxed)
-        evidences = get_evidence(result)
+        evidences = search_evidence(session, question, query_vector, top_k, effective_where, strategy, search)
 
-    if not evidences:
-        result = query_collection(collection, query_vector, top_k, None)
-        evidences = get_evidence(result)
+        span.set(signal_key=match_r.key, where=effective_where, evidences=len(evidences))
+        tracing.count("evidences_total", len(evidences))
 
     if return_debug:
         return evidences, match_r
     
-    return evidences
\ No newline at end of file
+    return evidences
+
+async def retrieve_async(question: str,
+                         top_k: int=config.TOP_K,
+                         where: Optional[Dict[str, Any]]=None,
+                         session: Optional[RetrieverSession]=None,
+                         strategy: str=config.RETRIEVAL_STRATEGY,
+                         limits: Optional[AsyncLimits]=None,
+                         search: str=config.RETRIEVAL_SEARCH) -> Tuple[List[Evidence], retriever_utils.SignalMatch]:
+    session = session or get_default_session()
+    limits = limits or get_async_limits()
+    search = resolve_search(session, search)
+
+    with tracing.trace("retrieve", strategy=strategy, search=search, top_k=top_k) as span:
+        with tracing.span("detect_signals"):
+            match_r = retriever_utils.detect_signals(question)
+        effective_where = where if where is not None else match_r.where
+
+        query_vector = None
+        if search != "bm25":
+            with tracing.span("embed_query"):
+                query_vector = await embed_query_async(session.embedder, question, cache=session.embedding_cache, limits=limits)
+
+        loop = asyncio.get_running_loop()
+
+        # Chroma y BM25 son bloqueantes: se ejecutan en el pool de hilos dedicado.
+        async with limits.query:
+            evidences = await asyncio.wait_for(
+                loop.run_in_executor(
+                    limits.executor,
+                    tracing.bind(functools.partial(search_evidence, session, question, query_vector, top_k,
+                                                   effective_where, strategy, search)),
+                ),
+                limits.query_timeout,
+            )
+
+        span.set(signal_key=match_r.key, where=effective_where, evidences=len(evidences))
+        tracing.count("evidences_total", len(evidences))
+
+    return evidences, match_r
+
+@dataclass
+class RetrievalResult:
+    question: str
+    evidences: List[Evidence]
+    match: Optional[retriever_utils.SignalMatch] = None
+    error: Optional[Exception] = None
+
+def embed_queries(oai: build_index.Embedder,
+                  questions: List[str],
+                  cache: Optional[QueryEmbeddingCache]=None) -> List[List[float] | Exception]:
+    vectors: List[Any] = [None] * len(questions)
+    misses: Dict[str, List[int]] = {}
+
+    for i, q in enumerate(questions):
+        vector = cache.get(q) if cache is not None else None
+        if vector is not None:
+            vectors[i] = vector
+        else:
+            misses.setdefault(q, []).append(i)
+
+    pending = list(misses)
+    batches = build_index.batch_by_tokens(pending, config.EMBED_BATCH_TOKENS, config.EMBED_BATCH_MAX_ITEMS)
+
+    for batch in batches:
+        try:
+            embedded: List[Any] = build_index.embed_texts(oai, batch)
+        except Exception:
+            # Se reintenta pregunta por pregunta para aislar la que falla.
+            embedded = []
+            for q in batch:
+                try:
+                    embedded.append(build_index.embed_texts(oai, [q])[0])
+                except Exception as e:
+                    embedded.append(e)
+
+        for q, vector in zip(batch, embedded):
+            if cache is not None and not isinstance(vector, Exception):
+                cache.put(q, vector)
+            for i in misses[q]:
+                vectors[i] = vector
+
+    return vectors
+
+def _group_by_where(items: List[Tuple[int, Optional[Dict[str, Any]]]]) -> Dict[str, Tuple[Optional[Dict[str, Any]], List[int]]]:
+    groups: Dict[str, Tuple[Optional[Dict[str, Any]], List[int]]] = {}
+    for i, where in items:
+        key = json.dumps(where or {}, sort_keys=True, default=str)
+        groups.setdefault(key, (where or None, []))[1].append(i)
+    return groups
+
+def _query_group(collection,
+                 vectors: List[List[float]],
+                 top_k: int,
+                 where: Optional[Dict[str, Any]]) -> List[List[Evidence] | Exception]:
+    try:
+        with tracing.span("query_collection", where=where, queries=len(vectors)):
+            result = query_collection_many(collection, vectors, top_k, where)
+        return [get_evidence(result, j) for j in range(len(vectors))]
+    except Exception:
+        out: List[List[Evidence] | Exception] = []
+        for vector in vectors:
+            try:
+                out.append(get_evidence(query_collection(collection, vector, top_k, where)))
+            except Exception as e:
+                out.append(e)
+        return out
+
+def retrieve_many(questions: List[str],
+                  top_k: int=config.TOP_K,
+                  where: Optional[Dict[str, Any]]=None,
+                  session: Optional[RetrieverSession]=None,
+                  strategy: str=config.RETRIEVAL_STRATEGY,
+                  search: str=config.RETRIEVAL_SEARCH) -> List[RetrievalResult]:
+    session = session or get_default_session()
+    search = resolve_search(session, search)
+
+    if search == "bm25":
+        return _retrieve_many_bm25(questions, top_k, where, session)
+
+    if search == "hybrid":
+        n = top_k * max(config.HYBRID_QUERY_FACTOR, 1)
+        results = retrieve_many(questions, n, where, session, strategy, search="vector")
+        for r in results:
+            if r.error is not None:
+                continue
+            effective_where = where if where is not None else r.match.where
+            try:
+                lexical = retrieve_bm25(session, r.question, n, effective_where)
+            except Exception as e:
+                r.error = e
+                r.evidences = []
+                continue
+            r.evidences = fuse_rrf([r.evidences, lexical], top_k)
+        return results
+
+    collection = session.collection
+
+    results = [RetrievalResult(question=q, evidences=[]) for q in questions]
+    levels_by_q: Dict[int, List[Optional[Dict[str, Any]]]] = {}
+
+    for i, q in enumerate(questions):
+        try:
+            results[i].match = retriever_utils.detect_signals(q)
+        except Exception as e:
+            results[i].error = e
+            continue
+        effective_where = where if where is not None else results[i].match.where
+        levels_by_q[i] = relaxation_levels(effective_where)
+
+    if strategy == "planned":
+        index = session.metadata_index
+        for i, levels in levels_by_q.items():
+            levels_by_q[i] = levels[plan_start(index, levels, top_k):]
+
+    ok = list(levels_by_q)
+    with tracing.span("embed_query", queries=len(ok)):
+        vectors = embed_queries(session.embedder, [questions[i] for i in ok], cache=session.embedding_cache)
+    vector_by_q: Dict[int, List[float]] = {}
+
+    for i, vector in zip(ok, vectors):
+        if isinstance(vector, Exception):
+            results[i].error = vector
+            levels_by_q.pop(i)
+        else:
+            vector_by_q[i] = vector
+
+    def run(items: List[Tuple[int, Optional[Dict[str, Any]]]], n: int) -> Dict[int, List[Evidence]]:
+        found: Dict[int, List[Evidence]] = {}
+        for group_where, idx in _group_by_where(items).values():
+            outcome = _query_group(collection, [vector_by_q[i] for i in idx], n, group_where)
+            for i, evs in zip(idx, outcome):
+                if isinstance(evs, Exception):
+                    results[i].error = evs
+                    levels_by_q.pop(i, None)
+                else:
+                    found[i] = evs
+        return found
+
+    if strategy == "wide":
+        bases = {i: common_where(levels) for i, levels in levels_by_q.items()}
+        found = run([(i, bases[i]) for i in levels_by_q], top_k * max(config.WIDE_QUERY_FACTOR, 1))
+
+        fallback = [(i, None) for i, evs in found.items() if not evs and bases[i]]
+        if fallback:
+            tracing.count("relaxation_fallbacks_total", len(fallback), level="unfiltered")
+        for i, evs in found.items():
+            results[i].evidences = rank_by_levels(evs, levels_by_q[i], top_k)
+        for i, evs in run(fallback, top_k).items():
+            results[i].evidences = evs
+
+        return results
+
+    pending = list(levels_by_q)
+    step = 0
+
+    while pending:
+        items = [(i, levels_by_q[i][step]) for i in pending if i in levels_by_q]
+        if step:
+            tracing.count("relaxation_fallbacks_total", len(items), level=step)
+        found = run(items, top_k)
+
+        pending = []
+        for i, evs in found.items():
+            if evs or step + 1 >= len(levels_by_q[i]):
+                results[i].evidences = evs
+            else:
+                pending.append(i)
+        step += 1
+
+    return results
+
+def _retrieve_many_bm25(questions: List[str],
+                        top_k: int,
+                        where: Optional[Dict[str, Any]],
+                        session: RetrieverSession) -> List[RetrievalResult]:
+    results = [RetrievalResult(question=q, evidences=[]) for q in questions]
+
+    for r in results:
+        try:
+            r.match = retriever_utils.detect_signals(r.question)
+            effective_where = where if where is not None else r.match.where
+            r.evidences = retrieve_bm25(session, r.question, top_k, effective_where)
+        except Exception as e:
+            r.error = e
+
+    return results
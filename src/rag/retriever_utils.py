@@ -13,7 +13,9 @@
 # - No genera respuestas ni interpreta resultados.                                         |
 # =========================================================================================|
 import re
-from typing import Dict, Any, List, Optional, Tuple
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, Iterable, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 
@@ -221,38 +223,190 @@ class SignalMatch:
     where: Dict[str, Any]
     debug: Dict[str, Any]
 
-def detect_relative_year(text: str) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+AUDITED_TERMS = ["auditado", "auditados", "dictamen", "opinion del auditor", "auditor"]
+
+SIGNAL_CACHE_SIZE = 4096
+
+TOKEN_RE = re.compile(r"\b\w+\b")
+WHITESPACE_RE = re.compile(r"\s+")
+YEAR_RE = re.compile(r"\b(20\d{2})\b")
+PERIOD_RE = re.compile(r"\b(20\d{2})-(0[1-9]|1[0-2])\b")
+
+WHERE_OPERATORS = {
+    "$eq": lambda v, c: v == c,
+    "$ne": lambda v, c: v != c,
+    "$gt": lambda v, c: v is not None and v > c,
+    "$gte": lambda v, c: v is not None and v >= c,
+    "$lt": lambda v, c: v is not None and v < c,
+    "$lte": lambda v, c: v is not None and v <= c,
+    "$in": lambda v, c: v in c,
+    "$nin": lambda v, c: v not in c,
+}
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    if not where:
+        return True
+
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, c) for c in cond):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, c) for c in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            if not all(WHERE_OPERATORS[op](value, c) for op, c in cond.items()):
+                return False
+        elif metadata.get(key) != cond:
+            return False
+
+    return True
+
+class PhraseAutomaton:
+    # Aho-Corasick: una sola pasada sobre el texto devuelve todas las frases
+    # contenidas (equivalente a evaluar `p in text` para cada frase).
+    def __init__(self, phrases: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[str, ...]] = [()]
+
+        for phrase in phrases:
+            if phrase:
+                self._insert(phrase)
+
+        self._build_links()
+
+    def _insert(self, phrase: str) -> None:
+        node = 0
+        for ch in phrase:
+            nxt = self._goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = nxt
+
+        if phrase not in self._out[node]:
+            self._out[node] = self._out[node] + (phrase,)
+
+    def _build_links(self) -> None:
+        queue = deque(self._goto[0].values())
+
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[child] = self._goto[f].get(ch, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def find(self, text: str) -> Set[str]:
+        goto, fail, out = self._goto, self._fail, self._out
+        hits: Set[str] = set()
+        node = 0
+
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                hits.update(out[node])
+
+        return hits
+
+@dataclass
+class CompiledSignals:
+    automaton: PhraseAutomaton
+    month_re: re.Pattern
+    relative_regex: List[Tuple[str, re.Pattern]]
+
+_compiled: Optional[CompiledSignals] = None
+
+def compile_signals() -> CompiledSignals:
+    global _compiled
+
+    phrases: List[str] = list(AUDITED_TERMS)
+    for value in SIGNALS_DICT.values():
+        phrases.extend(value.get("phrase", []))
+    for rule in RELATIVE_YEAR_RULES:
+        if rule.get("type") == "phrase":
+            phrases.extend(rule["patterns"])
+
+    months = sorted(MONTHS_ES, key=len, reverse=True)
+
+    _compiled = CompiledSignals(
+        automaton=PhraseAutomaton(phrases),
+        month_re=re.compile(r"\b(" + "|".join(re.escape(m) for m in months) + r")\b"),
+        relative_regex=[
+            (rule["kind"], re.compile(rule["pattern"]))
+            for rule in RELATIVE_YEAR_RULES if rule.get("type") == "regex"
+        ],
+    )
+    _detect_signals_norm.cache_clear()
+
+    return _compiled
+
+def get_compiled_signals() -> CompiledSignals:
+    return _compiled or compile_signals()
+
+def detect_relative_year(text: str, hits: Optional[Set[str]] = None) -> Tuple[Optional[int], Optional[str], Optional[str]]:
+    compiled = get_compiled_signals()
+    if hits is None:
+        hits = compiled.automaton.find(text)
+
     for rule in RELATIVE_YEAR_RULES:
         if rule.get("type") == "phrase":
             
             for p in rule["patterns"]:
-                if p in text:
+                if p in hits:
                     return (CURRENT_YEAR + int(rule["offset"]), "relative_phrase", p)
                     
-    for rule in RELATIVE_YEAR_RULES:
-        if rule.get("type") == "regex":
-            
-            m = re.search(rule["pattern"], text)
-            if not m:
-                continue
-            
-            n = int(m.group(1))
-            if rule["kind"] == "past":
-                return (CURRENT_YEAR - n, "relative_regex_past", m.group(0))
-            if rule["kind"] == "future":
-                return (CURRENT_YEAR + n, "relative_regex_future", m.group(0))
+    for kind, pattern in compiled.relative_regex:
+        m = pattern.search(text)
+        if not m:
+            continue
+        
+        n = int(m.group(1))
+        if kind == "past":
+            return (CURRENT_YEAR - n, "relative_regex_past", m.group(0))
+        if kind == "future":
+            return (CURRENT_YEAR + n, "relative_regex_future", m.group(0))
     
     return (None, None, None)
 
-def detect_signals(question: str) -> SignalMatch:
+def normalize_question(question: str) -> str:
     question = question.lower()
-    question = re.sub(r"\s+", " ", question).strip()
-    
+    return WHITESPACE_RE.sub(" ", question).strip()
+
+def detect_signals(question: str) -> SignalMatch:
+    match = _detect_signals_norm(normalize_question(question))
+
+    # El resultado cacheado se comparte: se devuelve una copia mutable.
+    return SignalMatch(
+        key=match.key,
+        score=match.score,
+        where=dict(match.where),
+        debug={k: list(v) if isinstance(v, list) else v for k, v in match.debug.items()},
+    )
+
+@lru_cache(maxsize=SIGNAL_CACHE_SIZE)
+def _detect_signals_norm(question: str) -> SignalMatch:
+    compiled = get_compiled_signals()
+    hits = compiled.automaton.find(question)
+    tokens = set(TOKEN_RE.findall(question))
+
     month_detected: Optional[str] = None
     month_detected_token: Optional[str] = None
 
+    months_found = set(compiled.month_re.findall(question))
     for m, mm in MONTHS_ES.items():
-        if re.search(rf"\b{re.escape(m)}\b", question):
+        if m in months_found:
             if month_detected_token is None or len(m) > len(month_detected_token):
                 month_detected_token = m
                 month_detected = mm
@@ -260,41 +414,34 @@ def detect_signals(question: str) -> SignalMatch:
     year_source: Optional[str] = None
     year_trigger: Optional[str] = None
         
-    year_match = re.search(r"\b(20\d{2})\b", question)
+    year_match = YEAR_RE.search(question)
     year_detected: Optional[int] =int(year_match.group(1)) if year_match else None
 
     if year_detected is not None:
         year_source = "explicit"
         year_trigger = year_match.group(0)
     else:
-        y, src, trg = detect_relative_year(question)
+        y, src, trg = detect_relative_year(question, hits)
         if y is not None:
             year_detected = y
             year_source = src
             year_trigger = trg
 
-    period_match = re.search(r"\b(20\d{2})-(0[1-9]|1[0-2])\b", question)
+    period_match = PERIOD_RE.search(question)
     period_detected = period_match.group(0) if period_match else None
 
     if period_detected is None and month_detected and year_detected:
         period_detected = f"{year_detected}-{month_detected}"
 
-    audited_intent = any(w in question for w in ["auditado", "auditados", "dictamen", "opinion del auditor", "auditor"])
-
-    def phrase_hits(text: str, phrases: List[str]) -> List[str]:
-        return [p for p in phrases if p in text]
-    
-    def words_hits_count(text: str, words: set[str]) -> int:
-        tokens = set(re.findall(r"\b\w+\b", text))
-        return sum(1 for w in words if w in tokens)
+    audited_intent = any(w in hits for w in AUDITED_TERMS)
 
     best: Optional[SignalMatch] = None
 
     for key, value in SIGNALS_DICT.items():
         priority = float(value.get("priority", 0))
 
-        ph = phrase_hits(question, value.get("phrase", []))
-        ws = words_hits_count(question, value.get("words", set()))
+        ph = [p for p in value.get("phrase", []) if p in hits]
+        ws = len(tokens.intersection(value.get("words", set())))
 
         score = 6.0 * len(ph) + 1.0 * ws + priority
 
@@ -0,0 +1,231 @@
+# ==================================================================================l
+# Sesión de recuperación (clientes compartidos entre preguntas).                    |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Abrir una sola vez el cliente OpenAI, el backend de embeddings y la colección   |
+#   (Chroma o NumpyCollection según config.VECTOR_BACKEND).                         |
+# - Abrir bajo demanda el índice BM25 y el almacén de chunks (búsqueda léxica).     |
+# - Cargar el índice de cardinalidad de metadata (estrategia "planned").            |
+# - Reutilizar el pool de conexiones HTTP del cliente OpenAI entre llamadas.        |
+# - Mantener el handle de la colección "caliente" para consultas sucesivas.         |
+# - Compartir las cachés de embeddings y de respuestas entre llamadas.              |
+# - Ofrecer una instancia por proceso, segura para compartir entre hilos.           |
+# - Acotar la concurrencia del camino async (semáforos y timeouts por etapa).       |
+#                                                                                   |
+# No hace:                                                                          |
+# - No recupera chunks ni arma prompts (eso es del retriever y del QA).             |
+# ==================================================================================|
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+import chromadb
+from openai import AsyncOpenAI, OpenAI
+import src.config as config
+import src.ingest.build_index as build_index
+from src.ingest.bm25_index import Bm25Index
+from src.ingest.chunk_store import ChunkStore
+from src.ingest.embeddings import EmbeddingBackend, get_embedding_backend
+from src.ingest.metadata_index import MetadataIndex, load_metadata_index
+from src.rag.embedding_cache import QueryEmbeddingCache
+from src.rag.answer_cache import AnswerCache
+from src.rag.numpy_collection import NumpyCollection
+from src.rag.retriever_utils import matches_where
+import src.rag.tracing as tracing
+
+logger = logging.getLogger(__name__)
+
+class RetrieverSession:
+    def __init__(self,
+                 oai: Optional[OpenAI] = None,
+                 collection: Optional[chromadb.api.Collection] = None,
+                 embedding_cache: Optional[QueryEmbeddingCache] = None,
+                 async_oai: Optional[AsyncOpenAI] = None,
+                 answer_cache: Optional[AnswerCache] = None,
+                 use_answer_cache: bool = config.ANSWER_CACHE_ENABLED,
+                 embedder: Optional[EmbeddingBackend] = None,
+                 bm25: Optional[Bm25Index] = None,
+                 chunk_store: Optional[ChunkStore] = None,
+                 metadata_index: Optional[MetadataIndex] = None):
+        self._lock = threading.Lock()
+        self._oai = oai
+        self._async_oai = async_oai
+        self._embedder = embedder
+        self._collection = collection
+        self._embedding_cache = embedding_cache
+        self._answer_cache = answer_cache
+        self._bm25 = bm25
+        self._bm25_loaded = bm25 is not None
+        self._chunk_store = chunk_store
+        self._metadata_index = metadata_index
+        self._metadata_index_loaded = metadata_index is not None
+        self._use_answer_cache = use_answer_cache or answer_cache is not None
+
+    @property
+    def oai(self) -> OpenAI:
+        if self._oai is None:
+            with self._lock:
+                if self._oai is None:
+                    self._oai = build_index.get_openai_client()
+        return self._oai
+
+    @property
+    def async_oai(self) -> AsyncOpenAI:
+        if self._async_oai is None:
+            with self._lock:
+                if self._async_oai is None:
+                    self._async_oai = build_index.get_async_openai_client()
+        return self._async_oai
+
+    @property
+    def embedder(self) -> EmbeddingBackend:
+        if self._embedder is None:
+            if config.EMBED_BACKEND == "openai":
+                embedder = get_embedding_backend(self.oai, self.async_oai)
+            else:
+                embedder = get_embedding_backend()
+            with self._lock:
+                if self._embedder is None:
+                    self._embedder = embedder
+        return self._embedder
+
+    @property
+    def collection(self) -> chromadb.api.Collection:
+        if self._collection is None:
+            with self._lock:
+                if self._collection is None:
+                    if config.VECTOR_BACKEND == "numpy":
+                        self._collection = self._open_numpy_collection()
+                    else:
+                        self._collection = build_index.get_collection()
+        return self._collection
+
+    def _open_numpy_collection(self) -> NumpyCollection | chromadb.api.Collection:
+        # Una exportación de otra versión del vector store daría resultados viejos: se usa Chroma.
+        try:
+            return NumpyCollection(config.NUMPY_INDEX_PATH, index_version=build_index.read_index_version())
+        except ValueError as e:
+            logger.warning("Índice NumPy desactualizado, se usa la colección de Chroma: %s", e)
+            tracing.count("stale_index_total", index="numpy")
+            return build_index.get_collection()
+
+    @property
+    def bm25(self) -> Optional[Bm25Index]:
+        # Sin índice (o desactualizado respecto del vector store) el retriever busca solo por vectores.
+        if not self._bm25_loaded:
+            with self._lock:
+                if not self._bm25_loaded:
+                    try:
+                        self._bm25 = Bm25Index(config.BM25_INDEX_PATH, index_version=build_index.read_index_version())
+                    except (FileNotFoundError, ValueError) as e:
+                        logger.warning("Índice BM25 no disponible, se usa búsqueda vectorial: %s", e)
+                        tracing.count("stale_index_total", index="bm25")
+                        self._bm25 = None
+                    self._bm25_loaded = True
+        return self._bm25
+
+    @property
+    def chunk_store(self) -> ChunkStore:
+        if self._chunk_store is None:
+            with self._lock:
+                if self._chunk_store is None:
+                    self._chunk_store = ChunkStore(config.CHUNK_STORE_PATH)
+        return self._chunk_store
+
+    @property
+    def metadata_index(self) -> Optional[MetadataIndex]:
+        # Opcional: sin índice construido (o desactualizado), "planned" se comporta como "cascade".
+        if not self._metadata_index_loaded:
+            with self._lock:
+                if not self._metadata_index_loaded:
+                    self._metadata_index = load_metadata_index(config.METADATA_INDEX_PATH, matches_where,
+                                                               index_version=build_index.read_index_version())
+                    self._metadata_index_loaded = True
+        return self._metadata_index
+
+    @property
+    def embedding_cache(self) -> QueryEmbeddingCache:
+        if self._embedding_cache is None:
+            model = self.embedder.model_name
+            with self._lock:
+                if self._embedding_cache is None:
+                    disk_path = config.QUERY_CACHE_PATH if config.QUERY_CACHE_DISK else None
+                    self._embedding_cache = QueryEmbeddingCache(model=model, disk_path=disk_path)
+        return self._embedding_cache
+
+    @property
+    def answer_cache(self) -> Optional[AnswerCache]:
+        if self._answer_cache is None and self._use_answer_cache:
+            with self._lock:
+                if self._answer_cache is None:
+                    self._answer_cache = AnswerCache()
+        return self._answer_cache
+
+    def close(self) -> None:
+        # El cliente async necesita un loop para cerrarse: en código async usar aclose().
+        with self._lock:
+            if self._oai is not None:
+                self._oai.close()
+            if self._embedding_cache is not None and self._embedding_cache.disk is not None:
+                self._embedding_cache.disk.close()
+            if self._answer_cache is not None:
+                self._answer_cache.close()
+            if self._chunk_store is not None:
+                self._chunk_store.close()
+            if isinstance(self._collection, NumpyCollection):
+                self._collection.close()
+            self._answer_cache = None
+            self._chunk_store = None
+            self._bm25 = None
+            self._bm25_loaded = False
+            self._metadata_index = None
+            self._metadata_index_loaded = False
+            self._oai = None
+            self._async_oai = None
+            self._embedder = None
+            self._collection = None
+
+    async def aclose(self) -> None:
+        async_oai = self._async_oai
+        self.close()
+        if async_oai is not None:
+            await async_oai.close()
+
+_default_session: Optional[RetrieverSession] = None
+_default_lock = threading.Lock()
+
+def get_default_session() -> RetrieverSession:
+    global _default_session
+    if _default_session is None:
+        with _default_lock:
+            if _default_session is None:
+                _default_session = RetrieverSession()
+    return _default_session
+
+@dataclass
+class AsyncLimits:
+    embed: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(config.ASYNC_EMBED_CONCURRENCY))
+    query: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(config.ASYNC_QUERY_WORKERS))
+    chat: asyncio.Semaphore = field(default_factory=lambda: asyncio.Semaphore(config.ASYNC_CHAT_CONCURRENCY))
+    embed_timeout: float = config.ASYNC_EMBED_TIMEOUT
+    query_timeout: float = config.ASYNC_QUERY_TIMEOUT
+    chat_timeout: float = config.ASYNC_CHAT_TIMEOUT
+    executor: ThreadPoolExecutor = field(default_factory=lambda: ThreadPoolExecutor(
+        max_workers=config.ASYNC_QUERY_WORKERS, thread_name_prefix="chroma-query"))
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False)
+
+# Los semáforos de asyncio quedan ligados al loop que los usa: uno por loop, guardado en el
+# propio loop. Un diccionario global por loop no los libera nunca (el semáforo referencia al loop).
+_LOOP_ATTR = "_rag_async_limits"
+
+def get_async_limits() -> AsyncLimits:
+    loop = asyncio.get_running_loop()
+    limits = getattr(loop, _LOOP_ATTR, None)
+    if limits is None:
+        limits = AsyncLimits()
+        setattr(loop, _LOOP_ATTR, limits)
+    return limits
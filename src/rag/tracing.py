@@ -0,0 +1,286 @@
+# ==================================================================================l
+# Trazas y métricas del camino de consulta (retrieve / answer_question).            |
+#                                                                                   |
+# Responsabilidad:                                                                  |
+# - Medir con spans el tiempo de cada etapa (detect_signals, embed_query, cada      |
+#   intento de query_collection, build_context, llamada al LLM).                    |
+# - Contar fallbacks de relajación, hits de caché, tokens y evidencias.             |
+# - Exportar cada traza como una línea JSON y las métricas agregadas en formato     |
+#   de texto Prometheus (opcionalmente servidas por HTTP en /metrics).              |
+# - Costar prácticamente nada cuando está deshabilitado (config.TRACE_ENABLED).     |
+#                                                                                   |
+# No hace:                                                                          |
+# - No decide nada del flujo de RAG; solo observa.                                  |
+# ==================================================================================|
+import contextvars
+import json
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import src.config as config
+
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class _Noop:
+    def __enter__(self) -> "_Noop":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        return None
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+_NOOP = _Noop()
+
+class Span:
+    __slots__ = ("name", "start", "duration", "attrs")
+
+    def __init__(self, name: str, start: float, attrs: Dict[str, Any]):
+        self.name = name
+        self.start = start
+        self.duration = 0.0
+        self.attrs = attrs
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+class Trace:
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[Span] = []
+        self.counters: Dict[str, float] = {}
+
+    def set(self, **attrs: Any) -> None:
+        self.attrs.update(attrs)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "ts": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat(timespec="milliseconds"),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attrs": self.attrs,
+            "counters": self.counters,
+            "spans": [
+                {
+                    "name": s.name,
+                    "start_ms": round((s.start - self.start) * 1000, 3),
+                    "duration_ms": round(s.duration * 1000, 3),
+                    **({"attrs": s.attrs} if s.attrs else {}),
+                }
+                for s in self.spans
+            ],
+        }
+
+class Metrics:
+    def __init__(self, buckets: Tuple[float, ...] = STAGE_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], float] = {}
+        self._histograms: Dict[str, List[float]] = {}
+        self._sums: Dict[str, float] = {}
+
+    def inc(self, name: str, value: float = 1.0, **labels: Any) -> None:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + value
+
+    def observe(self, stage: str, seconds: float) -> None:
+        i = bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts = self._histograms.get(stage)
+            if counts is None:
+                counts = self._histograms[stage] = [0.0] * (len(self.buckets) + 1)
+            counts[i] += 1
+            self._sums[stage] = self._sums.get(stage, 0.0) + seconds
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+            self._sums.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else ""): value
+                for (name, labels), value in self._counters.items()
+            }
+            stages = {
+                stage: {"count": sum(counts), "sum_s": round(self._sums[stage], 6)}
+                for stage, counts in self._histograms.items()
+            }
+        return {"counters": counters, "stages": stages}
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+
+        with self._lock:
+            by_name: Dict[str, List[Tuple[Tuple[Tuple[str, str], ...], float]]] = {}
+            for (name, labels), value in sorted(self._counters.items()):
+                by_name.setdefault(name, []).append((labels, value))
+
+            for name, series in by_name.items():
+                lines.append(f"# TYPE rag_{name} counter")
+                for labels, value in series:
+                    label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                    lines.append(f"rag_{name}{{{label_text}}} {value:g}" if labels else f"rag_{name} {value:g}")
+
+            if self._histograms:
+                lines.append("# TYPE rag_stage_seconds histogram")
+            for stage, counts in sorted(self._histograms.items()):
+                cumulative = 0.0
+                for le, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f'rag_stage_seconds_bucket{{stage="{stage}",le="{le:g}"}} {cumulative:g}')
+                cumulative += counts[-1]
+                lines.append(f'rag_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative:g}')
+                lines.append(f'rag_stage_seconds_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+                lines.append(f'rag_stage_seconds_count{{stage="{stage}"}} {cumulative:g}')
+
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics()
+
+_enabled = config.TRACE_ENABLED
+_log_path: Optional[Path] = config.TRACE_LOG_PATH
+_log_lock = threading.Lock()
+_current: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("rag_trace", default=None)
+
+def enable(log_path: Optional[Path] = config.TRACE_LOG_PATH) -> None:
+    global _enabled, _log_path
+    _log_path = log_path
+    _enabled = True
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+def is_enabled() -> bool:
+    return _enabled
+
+def current_trace() -> Optional[Trace]:
+    return _current.get() if _enabled else None
+
+def _export(trace_: Trace) -> None:
+    if _log_path is None:
+        return
+    line = json.dumps(trace_.to_dict(), ensure_ascii=False, default=str)
+    with _log_lock:
+        _log_path.parent.mkdir(parents=True, exist_ok=True)
+        with _log_path.open("a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+@contextmanager
+def _trace(name: str, attrs: Dict[str, Any]) -> Iterator[Trace]:
+    root = Trace(name, attrs)
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as e:
+        root.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        root.duration = time.perf_counter() - root.start
+        _current.reset(token)
+        metrics.inc("requests_total", op=name)
+        metrics.observe(name, root.duration)
+        _export(root)
+
+@contextmanager
+def _span(name: str, attrs: Dict[str, Any]) -> Iterator[Span]:
+    s = Span(name, time.perf_counter(), attrs)
+    try:
+        yield s
+    except BaseException as e:
+        s.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        s.duration = time.perf_counter() - s.start
+        metrics.observe(name, s.duration)
+        parent = _current.get()
+        if parent is not None:
+            parent.spans.append(s)
+
+def trace(name: str, **attrs: Any):
+    # Dentro de otra traza (ej. retrieve dentro de answer_question) se registra como span.
+    if not _enabled:
+        return _NOOP
+    if _current.get() is not None:
+        return _span(name, attrs)
+    return _trace(name, attrs)
+
+def span(name: str, **attrs: Any):
+    if not _enabled:
+        return _NOOP
+    return _span(name, attrs)
+
+def count(name: str, value: float = 1.0, **labels: Any) -> None:
+    if not _enabled:
+        return
+    metrics.inc(name, value, **labels)
+    parent = _current.get()
+    if parent is not None:
+        key = name + "".join(f".{v}" for v in labels.values())
+        parent.counters[key] = parent.counters.get(key, 0) + value
+
+def annotate(**attrs: Any) -> None:
+    if not _enabled:
+        return
+    parent = _current.get()
+    if parent is not None:
+        parent.attrs.update(attrs)
+
+def observe(stage: str, seconds: float) -> None:
+    if _enabled:
+        metrics.observe(stage, seconds)
+
+def record_usage(usage: Any) -> None:
+    if not _enabled or usage is None:
+        return
+    count("tokens_total", getattr(usage, "prompt_tokens", 0) or 0, kind="prompt")
+    count("tokens_total", getattr(usage, "completion_tokens", 0) or 0, kind="completion")
+
+def bind(fn: Callable[..., Any]) -> Callable[..., Any]:
+    # Los hilos de un executor no heredan el contexto: se copia para no perder spans.
+    if not _enabled:
+        return fn
+    ctx = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        return ctx.run(fn, *args, **kwargs)
+
+    return run
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = metrics.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve_metrics(port: int = config.TRACE_METRICS_PORT, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="rag-metrics", daemon=True).start()
+    return server
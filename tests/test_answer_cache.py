@@ -0,0 +1,52 @@
+import time
+import pytest
+import src.ingest.build_index as build_index
+from src.rag.answer_cache import AnswerCache, answer_key
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(build_index, "INDEX_VERSION_FILE", tmp_path / "index_version")
+    build_index.bump_index_version()
+    cache = AnswerCache(tmp_path / "answers.sqlite3", ttl=0, max_entries=3)
+    yield cache
+    cache.close()
+
+def test_key_depends_on_question_mode_and_evidence():
+    key = answer_key("¿Utilidad neta 2023?", "strict", 0.1, ["a", "b"])
+
+    assert key == answer_key("¿Utilidad neta 2023?", "strict", 0.1, ["a", "b"])
+    assert key != answer_key("¿Utilidad neta 2023?", "explanatory", 0.1, ["a", "b"])
+    assert key != answer_key("¿Utilidad neta 2023?", "strict", 0.1, ["b", "a"])
+    assert key != answer_key("¿Utilidad neta 2022?", "strict", 0.1, ["a", "b"])
+
+def test_hit_until_index_version_bump(cache):
+    cache.put("k1", "respuesta 1")
+    cache.put("k2", "respuesta 2")
+    assert cache.get("k1") == "respuesta 1"
+
+    build_index.bump_index_version()
+
+    assert cache.get("k1") is None
+    # La invalidación borra todo lo de la versión anterior, no solo la clave consultada.
+    assert cache._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+
+    cache.put("k1", "respuesta nueva")
+    assert cache.get("k1") == "respuesta nueva"
+
+def test_ttl_expires_entries(cache, monkeypatch):
+    cache.ttl = 60
+    cache.put("k", "respuesta")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 120)
+
+    assert cache.get("k") is None
+
+def test_least_recently_used_is_evicted(cache):
+    for i in range(3):
+        cache.put(f"k{i}", f"r{i}")
+    cache._conn.execute("UPDATE answers SET last_access = 0 WHERE key = 'k1'")
+
+    cache.put("k3", "r3")
+
+    assert cache.get("k1") is None
+    assert [cache.get(f"k{i}") for i in (0, 2, 3)] == ["r0", "r2", "r3"]
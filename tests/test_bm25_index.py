@@ -0,0 +1,104 @@
+import random
+import pytest
+from src.ingest.bm25_index import Bm25Index, build_bm25_index, tokenize
+from src.rag.retriever_utils import matches_where
+
+WORDS = "utilidad neta ingresos ventas activo pasivo patrimonio ebitda margen deuda caja".split()
+
+def make_chunks(n=400, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            "chunk_id": f"doc{i % 7}_p{i:03d}_c001",
+            "doc_id": f"doc{i % 7}",
+            "doc_type": rng.choice(["financial_statements", "earnings_reports", None]),
+            "year": rng.choice([2021, 2022, 2023, None]),
+            "period": rng.choice(["2023-03", "no_definido"]),
+            "audited": rng.choice([True, False]),
+            "page_number": i,
+            "chunk_text": " ".join(rng.choices(WORDS, k=30)),
+        }
+        for i in range(n)
+    ]
+
+@pytest.fixture(scope="module")
+def chunks():
+    return make_chunks()
+
+@pytest.fixture(scope="module")
+def index(chunks, tmp_path_factory):
+    path = tmp_path_factory.mktemp("bm25")
+    build_bm25_index(chunks, path, index_version="v1")
+    return Bm25Index(path, index_version="v1")
+
+def test_tokenize_folds_accents_and_keeps_numbers():
+    assert tokenize("Utilidad NETA del año 2023") == ["utilidad", "neta", "ano", "2023"]
+    assert tokenize("Ventas: 1,234.56 en el 4T2023") == ["ventas", "1,234.56", "4t2023"]
+    assert tokenize("de la y el") == []
+
+def test_filter_columns_only(index, chunks):
+    for ordinal in (0, 1, 57):
+        chunk = chunks[ordinal]
+        assert index.chunk_id(ordinal) == chunk["chunk_id"]
+        expected = {k: chunk[k] for k in ("doc_id", "doc_type", "year", "period", "audited") if chunk[k] is not None}
+        assert index.row(ordinal) == expected
+
+def test_scores_rank_matching_chunks(index, chunks):
+    hits = index.search("ebitda", 5)
+    assert len(hits) == 5
+    assert [s for _, s in hits] == sorted((s for _, s in hits), reverse=True)
+    assert all("ebitda" in chunks[i]["chunk_text"] for i, _ in hits)
+    assert index.search("inexistente", 5) == []
+
+@pytest.mark.parametrize("where", [
+    {"year": 2022},
+    {"doc_type": "financial_statements"},
+    {"$and": [{"doc_type": "earnings_reports"}, {"audited": True}]},
+    {"$or": [{"year": 2021}, {"period": "2023-03"}]},
+    {"year": {"$in": [2021, 2023]}},
+    {"doc_type": {"$ne": "financial_statements"}},
+    {"year": {"$gte": 2022}},
+    # Sin máscara tipada (valor de otro tipo): se evalúa fila a fila.
+    {"year": {"$in": [2022, "2023"]}},
+])
+def test_where_matches_brute_force(index, chunks, where):
+    hits = index.search("utilidad neta", 10, where, matches_where)
+
+    ranked = index.search("utilidad neta", len(chunks))
+    metadata = [{k: v for k, v in c.items() if k != "chunk_text" and v is not None} for c in chunks]
+    expected = [i for i, _ in ranked if matches_where(metadata[i], where)][:10]
+
+    assert [i for i, _ in hits] == expected
+
+def test_where_on_unknown_column_raises(index):
+    with pytest.raises(ValueError):
+        index.search("utilidad", 5, {"page_number": 3}, matches_where)
+
+def test_stale_index_is_refused(index):
+    with pytest.raises(ValueError):
+        Bm25Index(index.path, index_version="v2")
+
+def test_empty_index(tmp_path):
+    build_bm25_index([], tmp_path)
+    index = Bm25Index(tmp_path)
+    assert len(index) == 0
+    assert index.search("utilidad", 5) == []
+
+def test_session_falls_back_to_vector_search_on_stale_index(index, monkeypatch):
+    import src.config as config
+    import src.ingest.build_index as build_index
+    from src.rag.retriever import resolve_search
+    from src.rag.session import RetrieverSession
+
+    monkeypatch.setattr(config, "BM25_INDEX_PATH", index.path)
+    monkeypatch.setattr(build_index, "read_index_version", lambda: "v2")
+    session = RetrieverSession()
+
+    assert session.bm25 is None
+    assert resolve_search(session, "hybrid") == "vector"
+    assert resolve_search(session, "bm25") == "vector"
+
+    monkeypatch.setattr(build_index, "read_index_version", lambda: "v1")
+    session.close()
+    assert session.bm25 is not None
+    assert resolve_search(session, "hybrid") == "hybrid"
@@ -0,0 +1,66 @@
+import uuid
+import chromadb
+import pytest
+from chromadb.config import Settings
+import src.ingest.build_index as build_index
+from src.ingest.embedding_store import EmbeddingStore
+from src.ingest.embeddings import LocalHashEmbeddingBackend
+
+def make_collection():
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    return client.create_collection(f"test_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"})
+
+def make_batch(n=5):
+    return [{"chunk_id": f"c{i}", "doc_id": "d", "chunk_text": f"utilidad neta {i}"} for i in range(n)]
+
+def test_index_batch_uses_empty_store_passed_in(tmp_path, monkeypatch):
+    default = EmbeddingStore(tmp_path / "default")
+    monkeypatch.setattr(build_index, "_embedding_store", default)
+    monkeypatch.setattr(build_index, "bump_index_version", lambda: "v")
+    store = EmbeddingStore(tmp_path / "mine")
+
+    assert build_index.index_batch(make_collection(), LocalHashEmbeddingBackend(dim=8), make_batch(), store=store) == 5
+    assert len(store) == 5
+    assert len(default) == 0
+
+def test_index_batch_can_skip_the_store(tmp_path, monkeypatch):
+    default = EmbeddingStore(tmp_path / "default")
+    monkeypatch.setattr(build_index, "_embedding_store", default)
+    monkeypatch.setattr(build_index, "bump_index_version", lambda: "v")
+
+    assert build_index.index_batch(make_collection(), LocalHashEmbeddingBackend(dim=8), make_batch(), use_store=False) == 5
+    assert len(default) == 0
+
+def test_resolve_embedding_store(tmp_path, monkeypatch):
+    default = EmbeddingStore(tmp_path / "default")
+    store = EmbeddingStore(tmp_path / "mine")
+    monkeypatch.setattr(build_index, "_embedding_store", default)
+
+    assert build_index.resolve_embedding_store(store) is store
+    assert build_index.resolve_embedding_store(None) is default
+    assert build_index.resolve_embedding_store(store, use_store=False) is None
+
+def test_failed_run_rebuilds_indexes_it_restamps(tmp_path, monkeypatch):
+    from src.ingest.indexer import IndexingEngine
+
+    calls = []
+    monkeypatch.setattr(build_index, "bump_index_version", lambda: calls.append("bump"))
+    monkeypatch.setattr(build_index, "build_search_indexes", lambda path: calls.append("rebuild"))
+
+    backend = LocalHashEmbeddingBackend(dim=8)
+    seen = []
+
+    class FailingBackend(LocalHashEmbeddingBackend):
+        def embed(self, texts):
+            seen.append(texts)
+            if len(seen) > 1:
+                raise RuntimeError("cuota agotada")
+            return backend.embed(texts)
+
+    engine = IndexingEngine(make_collection(), FailingBackend(dim=8), concurrency=1, batch_size=2, max_tokens=None,
+                            use_store=False, chunks_file=tmp_path / "chunks.jsonl")
+    with pytest.raises(RuntimeError):
+        engine.run(iter(make_batch(4)))
+
+    assert engine.collection.count() == 2
+    assert calls == ["bump", "rebuild"]
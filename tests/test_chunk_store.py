@@ -0,0 +1,81 @@
+import json
+import pytest
+from src.ingest.chunk_store import ChunkStore, ChunkStoreWriter, build_from_jsonl, iter_chunks_from_store
+
+def make_records(n_docs=3, per_doc=4):
+    return [
+        {"chunk_id": f"doc{d}_p{p:03d}_c001", "doc_id": f"doc{d}", "page_number": p,
+         "chunk_text": f"texto {d}-{p} con tildes: año, página"}
+        for d in range(n_docs) for p in range(1, per_doc + 1)
+    ]
+
+def test_round_trip(tmp_path):
+    records = make_records()
+    with ChunkStoreWriter(tmp_path / "store") as writer:
+        writer.add_many(records)
+
+    with ChunkStore(tmp_path / "store") as store:
+        assert len(store) == len(records)
+        for record in records:
+            assert store.get(record["chunk_id"]) == record
+            assert record["chunk_id"] in store
+        assert list(store) == records
+        assert store.doc_ids() == ["doc0", "doc1", "doc2"]
+        assert list(store.iter_doc("doc1")) == [r for r in records if r["doc_id"] == "doc1"]
+
+    assert list(iter_chunks_from_store(tmp_path / "store")) == records
+
+def test_missing_ids(tmp_path):
+    records = make_records()
+    with ChunkStoreWriter(tmp_path / "store") as writer:
+        writer.add_many(records)
+
+    with ChunkStore(tmp_path / "store") as store:
+        assert store.get("no_existe") is None
+        assert "no_existe" not in store
+        assert store.get_many([records[0]["chunk_id"], "no_existe"]) == [records[0], None]
+        assert list(store.iter_doc("no_existe")) == []
+
+def test_duplicate_ids_keep_first(tmp_path):
+    first = {"chunk_id": "a", "doc_id": "d", "chunk_text": "primero"}
+    with ChunkStoreWriter(tmp_path / "store") as writer:
+        writer.add(first)
+        writer.add({"chunk_id": "a", "doc_id": "d", "chunk_text": "segundo"})
+
+    with ChunkStore(tmp_path / "store") as store:
+        assert store.get("a") == first
+
+def test_empty_store(tmp_path):
+    with ChunkStoreWriter(tmp_path / "store"):
+        pass
+
+    with ChunkStore(tmp_path / "store") as store:
+        assert len(store) == 0
+        assert store.get("a") is None
+        assert list(store) == []
+        assert store.doc_ids() == []
+
+    assert list(iter_chunks_from_store(tmp_path / "store")) == []
+
+def test_build_from_jsonl(tmp_path):
+    records = make_records()
+    chunks_file = tmp_path / "chunks.jsonl"
+    chunks_file.write_text("".join(json.dumps(r, ensure_ascii=False) + "\n" for r in records), encoding="utf-8")
+
+    assert build_from_jsonl(chunks_file, tmp_path / "store") == len(records)
+    with ChunkStore(tmp_path / "store") as store:
+        assert list(store) == records
+
+def test_aborted_writer_leaves_no_store(tmp_path):
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(tmp_path / "store") as writer:
+            writer.add_many(make_records())
+            raise RuntimeError("fallo")
+
+    with pytest.raises(FileNotFoundError):
+        ChunkStore(tmp_path / "store")
+
+def test_record_without_text_is_rejected(tmp_path):
+    with ChunkStoreWriter(tmp_path / "store") as writer:
+        with pytest.raises(ValueError):
+            writer.add({"chunk_id": "a"})
@@ -0,0 +1,94 @@
+import json
+import os
+import pytest
+import src.ingest.manifest as manifest
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    # Extractor falso: una página y un chunk por PDF, con el contenido del archivo como texto.
+    extracted = []
+
+    def extract(pdf):
+        extracted.append(pdf.name)
+        text = pdf.read_text(encoding="utf-8")
+        page = {"doc_id": pdf.stem, "page_number": 1, "page_text": text}
+        chunk = {"chunk_id": f"{pdf.stem}_p001_c001", "doc_id": pdf.stem, "chunk_text": text}
+        return [json.dumps(page) + "\n"], [json.dumps(chunk) + "\n"]
+
+    monkeypatch.setattr(manifest, "extract_pdf_records", extract)
+
+    pdfs = tmp_path / "pdfs"
+    (pdfs / "financial_statements").mkdir(parents=True)
+    (pdfs / "important_facts").mkdir(parents=True)
+    (pdfs / "financial_statements" / "b_2023.pdf").write_text("balance 2023", encoding="utf-8")
+    (pdfs / "important_facts" / "a_2022.pdf").write_text("recompra 2022", encoding="utf-8")
+
+    def build():
+        extracted.clear()
+        stats = manifest.build_incremental(workers=1, pdfs_dir=pdfs,
+                                           pages_file=tmp_path / "pages.jsonl",
+                                           chunks_file=tmp_path / "chunks.jsonl",
+                                           manifest_file=tmp_path / "manifest.json",
+                                           cache_dir=tmp_path / "cache",
+                                           chunk_store_path=None)
+        chunks = [json.loads(line) for line in (tmp_path / "chunks.jsonl").open(encoding="utf-8")]
+        return stats, sorted(extracted), chunks
+
+    return pdfs, build, tmp_path
+
+def test_first_run_extracts_everything_in_path_order(env):
+    _, build, _ = env
+    stats, extracted, chunks = build()
+
+    assert stats == {"pdfs": 2, "extracted": 2, "reused": 0, "removed": 0}
+    assert extracted == ["a_2022.pdf", "b_2023.pdf"]
+    assert [c["chunk_id"] for c in chunks] == ["b_2023_p001_c001", "a_2022_p001_c001"]
+
+def test_unchanged_pdfs_are_skipped(env):
+    pdfs, build, _ = env
+    build()
+    # Solo cambia el mtime: el hash de contenido coincide y se reutiliza la caché.
+    pdf = pdfs / "important_facts" / "a_2022.pdf"
+    st = pdf.stat()
+    os.utime(pdf, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    stats, extracted, chunks = build()
+
+    assert stats == {"pdfs": 2, "extracted": 0, "reused": 2, "removed": 0}
+    assert extracted == []
+    assert [c["chunk_text"] for c in chunks] == ["balance 2023", "recompra 2022"]
+
+def test_changed_pdf_is_reingested(env):
+    pdfs, build, tmp_path = env
+    build()
+    (pdfs / "financial_statements" / "b_2023.pdf").write_text("balance 2023 reexpresado", encoding="utf-8")
+
+    stats, extracted, chunks = build()
+
+    assert stats == {"pdfs": 2, "extracted": 1, "reused": 1, "removed": 0}
+    assert extracted == ["b_2023.pdf"]
+    assert [c["chunk_text"] for c in chunks] == ["balance 2023 reexpresado", "recompra 2022"]
+    # La caché del contenido anterior se borra.
+    assert len(list((tmp_path / "cache").glob("*.chunks.jsonl"))) == 2
+
+def test_removed_and_added_pdfs(env):
+    pdfs, build, _ = env
+    build()
+    (pdfs / "important_facts" / "a_2022.pdf").unlink()
+    (pdfs / "important_facts" / "c_2024.pdf").write_text("recompra 2024", encoding="utf-8")
+
+    stats, extracted, chunks = build()
+
+    assert stats == {"pdfs": 2, "extracted": 1, "reused": 1, "removed": 1}
+    assert extracted == ["c_2024.pdf"]
+    assert [c["chunk_text"] for c in chunks] == ["balance 2023", "recompra 2024"]
+
+def test_manifest_version_change_forces_full_rebuild(env, monkeypatch):
+    _, build, _ = env
+    build()
+    monkeypatch.setattr(manifest, "MANIFEST_VERSION", manifest.MANIFEST_VERSION + 1)
+
+    stats, extracted, _ = build()
+
+    assert stats["extracted"] == 2
+    assert extracted == ["a_2022.pdf", "b_2023.pdf"]
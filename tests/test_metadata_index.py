@@ -0,0 +1,81 @@
+import json
+import pytest
+from src.ingest.metadata_index import MetadataIndex, build_metadata_index, load_metadata_index
+from src.rag.retriever import relaxation_levels, retrieve_planned
+from src.rag.retriever_utils import matches_where
+from tests.test_retrieval_strategies import QUERY, make_collection
+
+FS = "financial_statements"
+
+def make_chunks():
+    chunks = []
+    # 2023-03: 1 chunk; 2023 (otros periodos): 4; 2022: 6.
+    for i, (year, period, n) in enumerate([(2023, "2023-03", 1), (2023, "2023-12", 4), (2022, "2022-12", 6)]):
+        for j in range(n):
+            chunks.append({"chunk_id": f"c{i}_{j}", "chunk_text": "x", "doc_type": FS, "year": year,
+                           "period": period, "audited": True})
+    return chunks
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "metadata_index.json"
+    assert build_metadata_index(make_chunks(), path, index_version="v1") == 11
+    return MetadataIndex(path, matches_where)
+
+def test_count(index):
+    assert index.count(None) == 11
+    assert index.count({"year": 2023}) == 5
+    assert index.count({"$and": [{"doc_type": FS}, {"period": "2023-03"}]}) == 1
+    assert index.count({"page_number": 3}) is None
+
+def test_plan_picks_first_level_with_top_k(index):
+    levels = relaxation_levels({"doc_type": FS, "year": 2023, "period": "2023-03"})
+    # [completo (1), sin period (5), sin year (1), sin filtro]
+    assert index.plan(levels, 1) == 0
+    assert index.plan(levels, 3) == 1
+    assert index.plan(levels, 5) == 1
+
+def test_plan_falls_back_to_most_specific_non_empty_level(index):
+    levels = relaxation_levels({"doc_type": FS, "year": 2023, "period": "2023-03"})
+    # Ningún nivel filtrado llega a 8: no se salta al nivel sin filtro, que mezclaría años.
+    assert index.plan(levels, 8) == 0
+
+    levels = relaxation_levels({"doc_type": FS, "year": 2023, "period": "2020-06"})
+    assert index.plan(levels, 8) == 1
+
+def test_plan_without_candidates_goes_to_last_level(index):
+    levels = relaxation_levels({"doc_type": "important_facts", "year": 2019})
+    assert index.plan(levels, 3) == len(levels) - 1
+
+def test_plan_with_uncounted_keys_is_not_planned(index):
+    assert index.plan(relaxation_levels({"page_number": 3}), 3) is None
+
+def test_stale_or_missing_index_is_not_loaded(tmp_path):
+    path = tmp_path / "metadata_index.json"
+    assert load_metadata_index(path, matches_where) is None
+
+    build_metadata_index(make_chunks(), path, index_version="v1")
+    assert load_metadata_index(path, matches_where, index_version="v1") is not None
+    assert load_metadata_index(path, matches_where, index_version="v2") is None
+    assert json.loads(path.read_text(encoding="utf-8"))["index_version"] == "v1"
+
+def test_retrieve_planned_runs_one_query_on_the_planned_level(index):
+    rows = [(c["chunk_id"], [1.0, 0.1 * k, 0.0], {k2: v for k2, v in c.items() if k2 not in ("chunk_id", "chunk_text")})
+            for k, c in enumerate(make_chunks())]
+    collection = make_collection(rows)
+    where = {"doc_type": FS, "year": 2023, "period": "2023-03"}
+
+    evidences = retrieve_planned(collection, QUERY, 3, where, index)
+
+    assert len(evidences) == 3
+    assert all(ev.metadata["year"] == 2023 for ev in evidences)
+    assert collection.wheres == [{"$and": [{"doc_type": FS}, {"year": 2023}]}]
+
+def test_retrieve_planned_without_index_behaves_like_cascade():
+    rows = [("a", [1.0, 0.0, 0.0], {"doc_type": FS, "year": 2022})]
+    collection = make_collection(rows)
+
+    evidences = retrieve_planned(collection, QUERY, 3, {"doc_type": FS, "year": 2023}, None)
+
+    assert [ev.chunk_id for ev in evidences] == ["a"]
+    assert collection.wheres == [{"$and": [{"doc_type": FS}, {"year": 2023}]}, {"doc_type": FS}]
@@ -0,0 +1,114 @@
+import random
+import uuid
+import chromadb
+import numpy as np
+import pytest
+from chromadb.config import Settings
+from src.rag.numpy_collection import NumpyCollection, export_collection
+from src.rag.retriever_utils import matches_where
+
+DIM = 16
+
+def make_metadatas(n, seed=0):
+    rng = random.Random(seed)
+    metadatas = []
+    for i in range(n):
+        meta = {
+            "chunk_id": f"c{i:04d}",
+            "doc_id": f"doc{i % 9}",
+            "doc_type": rng.choice(["financial_statements", "earnings_reports", "important_facts"]),
+            "year": rng.choice([2020, 2021, 2022, 2023]),
+            "period": rng.choice(["2023-03", "2022-12", "no_definido"]),
+            "audited": rng.choice([True, False]),
+            "page_number": rng.randint(1, 40),
+        }
+        # Chroma no guarda None: algunas filas simplemente no tienen la clave.
+        if i % 11 == 0:
+            del meta["year"]
+        metadatas.append(meta)
+    return metadatas
+
+@pytest.fixture(scope="module")
+def exported(tmp_path_factory):
+    n = 300
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    metadatas = make_metadatas(n)
+
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(f"test_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=[m["chunk_id"] for m in metadatas], embeddings=vectors.tolist(),
+                   documents=[f"texto {i}" for i in range(n)], metadatas=metadatas)
+
+    path = tmp_path_factory.mktemp("numpy_index")
+    assert export_collection(collection, path, batch_size=128, index_version="v1") == n
+    store = NumpyCollection(path, index_version="v1")
+    yield store, vectors, metadatas
+    store.close()
+
+WHERES = [
+    {"year": 2022},
+    {"doc_type": "important_facts"},
+    {"audited": True},
+    {"$and": [{"doc_type": "financial_statements"}, {"year": 2023}, {"audited": False}]},
+    {"$or": [{"period": "2023-03"}, {"year": 2020}]},
+    {"year": {"$in": [2021, 2023]}},
+    {"year": {"$nin": [2021]}},
+    {"year": {"$gte": 2022}},
+    {"doc_type": {"$ne": "earnings_reports"}},
+    {"period": "inexistente"},
+    {"page_number": {"$lt": 10}},
+    {"doc_id": "doc3"},
+]
+
+@pytest.mark.parametrize("where", WHERES)
+def test_mask_matches_where(exported, where):
+    store, _, _ = exported
+    metadatas = store.get(include=["metadatas"])["metadatas"]
+    expected = np.array([matches_where(m, where) for m in metadatas])
+    assert np.array_equal(store.mask(where), expected)
+
+def test_mask_without_filter(exported):
+    store, _, _ = exported
+    assert store.mask(None) is None
+    assert store.mask({}) is None
+
+def exact_top_k(vectors, query, k, allowed=None):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    sims = normed @ (query / np.linalg.norm(query))
+    order = [i for i in np.argsort(-sims, kind="stable") if allowed is None or allowed[i]]
+    return order[:k], sims
+
+@pytest.mark.parametrize("where", [None, {"year": 2022}, {"$and": [{"doc_type": "earnings_reports"}, {"audited": True}]}])
+def test_query_is_exact_top_k(exported, where):
+    store, vectors, metadatas = exported
+    rng = np.random.default_rng(1)
+    allowed = None if where is None else np.array([matches_where(m, where) for m in metadatas])
+
+    for _ in range(5):
+        query = rng.normal(size=DIM).astype(np.float32)
+        expected, sims = exact_top_k(vectors, query, 10, allowed)
+        result = store.query([query.tolist()], n_results=10, where=where)
+
+        assert result["ids"][0] == [metadatas[i]["chunk_id"] for i in expected]
+        assert np.allclose(result["distances"][0], [1.0 - sims[i] for i in expected], atol=1e-5)
+        assert result["metadatas"][0] == [metadatas[i] for i in expected]
+
+def test_query_with_empty_filter_result(exported):
+    store, _, _ = exported
+    result = store.query([[0.0] * (DIM - 1) + [1.0]], n_results=5, where={"period": "inexistente"})
+    assert result["ids"] == [[]]
+
+def test_get_by_ids_and_where(exported):
+    store, _, metadatas = exported
+    ids = ["c0001", "c0002", "no_existe"]
+    assert store.get(ids=ids)["ids"] == ["c0001", "c0002"]
+
+    page = store.get(where={"year": 2022}, limit=5, offset=2, include=["metadatas"])
+    expected = [m for m in metadatas if m.get("year") == 2022][2:7]
+    assert page["metadatas"] == expected
+
+def test_stale_export_is_refused(exported):
+    store, _, _ = exported
+    with pytest.raises(ValueError):
+        NumpyCollection(store.path, index_version="v2")
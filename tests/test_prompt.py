@@ -0,0 +1,72 @@
+from src.ingest.tokens import estimate_tokens
+from src.rag.prompt import build_context, pack_evidences
+from src.rag.retriever import Evidence
+
+def ev(chunk_id, text, page=1, doc_id="doc", chunk_index=None):
+    meta = {"chunk_id": chunk_id, "doc_id": doc_id, "page_number": page, "year": 2023, "doc_type": "financial_statements"}
+    if chunk_index is not None:
+        meta["chunk_index"] = chunk_index
+    return Evidence(chunk_id=chunk_id, text=text, metadata=meta, distance=0.0)
+
+SENTENCE = "La utilidad neta del ejercicio fue de S/ 1,234.56 millones según el estado de resultados."
+
+def test_overlapping_chunks_of_a_page_are_merged_once():
+    left = SENTENCE + " Los ingresos crecieron"
+    right = "Los ingresos crecieron 12% respecto del año anterior."
+    # El segundo en orden de lectura llegó primero en relevancia.
+    blocks = pack_evidences([ev("b", right, chunk_index=1), ev("a", left, chunk_index=0)])
+
+    assert len(blocks) == 1
+    assert blocks[0]["text"] == SENTENCE + " Los ingresos crecieron 12% respecto del año anterior."
+    assert blocks[0]["chunk_ids"] == ["a", "b"]
+    assert blocks[0]["rank"] == 0
+
+def test_adjacent_chunks_without_overlap_are_joined_with_newline():
+    blocks = pack_evidences([ev("a", "Primera parte.", chunk_index=3), ev("b", "Segunda parte.", chunk_index=4)])
+
+    assert [b["text"] for b in blocks] == ["Primera parte.\nSegunda parte."]
+
+def test_chunks_of_other_pages_or_docs_stay_apart_in_relevance_order():
+    blocks = pack_evidences([
+        ev("p2", "Texto de la página dos.", page=2),
+        ev("p1", "Texto de la página uno.", page=1),
+        ev("otro", "Texto de la página dos.", page=2, doc_id="otro"),
+    ])
+
+    assert [b["chunk_ids"] for b in blocks] == [["p2"], ["p1"], ["otro"]]
+
+def test_long_chunk_is_truncated_as_its_own_block():
+    blocks = pack_evidences([ev("a", "x" * 50), ev("b", "y" * 10)], max_chars_per_chunk=20)
+
+    assert blocks[0]["text"] == "x" * 20 + "…"
+    assert blocks[1]["text"] == "y" * 10
+
+def test_build_context_keeps_citations_and_one_year_preamble():
+    context = build_context([ev("a", SENTENCE, page=7)], max_tokens=None)
+
+    assert context.count("año_actual_para_respuesta=") == 1
+    assert "[Fuente 1]" in context
+    assert "página=7" in context
+    assert "chunk_id=a" in context
+    assert SENTENCE in context
+
+def test_build_context_fits_token_budget():
+    evidences = [ev(f"c{i}", f"Fuente {i}. " + SENTENCE * 4, page=i) for i in range(10)]
+    unlimited = build_context(evidences, max_tokens=None)
+    context = build_context(evidences, max_tokens=300)
+
+    assert estimate_tokens(context) <= 300 + 10
+    assert estimate_tokens(unlimited) > 300
+    # Entran las más relevantes, en orden.
+    assert "[Fuente 1]" in context and "chunk_id=c0" in context
+    assert "chunk_id=c9" not in context
+
+def test_build_context_truncates_the_top_source_rather_than_dropping_it():
+    context = build_context([ev("a", SENTENCE * 40)], max_tokens=120)
+
+    assert "chunk_id=a" in context
+    assert context.endswith("…")
+    assert estimate_tokens(context) < estimate_tokens(SENTENCE * 40)
+
+def test_build_context_empty():
+    assert build_context([]) == ""
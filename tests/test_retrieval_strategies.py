@@ -0,0 +1,62 @@
+import uuid
+import chromadb
+import pytest
+from chromadb.config import Settings
+from src.rag.retriever import retrieve_cascade, retrieve_wide
+
+class CountingCollection:
+    def __init__(self, collection):
+        self.collection = collection
+        self.wheres = []
+
+    def query(self, **kwargs):
+        self.wheres.append(kwargs.get("where"))
+        return self.collection.query(**kwargs)
+
+def make_collection(rows):
+    # rows: (chunk_id, vector, metadata); el chunk_id va también en la metadata, como al indexar.
+    client = chromadb.EphemeralClient(settings=Settings(anonymized_telemetry=False))
+    collection = client.create_collection(f"test_{uuid.uuid4().hex[:8]}", metadata={"hnsw:space": "cosine"})
+    collection.add(ids=[r[0] for r in rows], embeddings=[r[1] for r in rows],
+                   documents=[f"texto {r[0]}" for r in rows],
+                   metadatas=[{"chunk_id": r[0], **r[2]} for r in rows])
+    return CountingCollection(collection)
+
+QUERY = [1.0, 0.0, 0.0]
+
+@pytest.fixture(scope="module")
+def rows():
+    fs = "financial_statements"
+    return [
+        # Más cercanos a la consulta, pero de otro año o periodo.
+        ("near_2022", [1.0, 0.05, 0.0], {"doc_type": fs, "year": 2022, "period": "2022-12"}),
+        ("near_2023_q4", [1.0, 0.1, 0.0], {"doc_type": fs, "year": 2023, "period": "2023-12"}),
+        # El único que cumple el filtro completo, más lejos.
+        ("exact", [1.0, 0.8, 0.0], {"doc_type": fs, "year": 2023, "period": "2023-03"}),
+        ("other_type", [1.0, 0.0, 0.01], {"doc_type": "earnings_reports", "year": 2023, "period": "2023-03"}),
+    ]
+
+WHERE = {"doc_type": "financial_statements", "year": 2023, "period": "2023-03"}
+
+def test_wide_ranks_by_relaxation_level_with_one_query(rows):
+    collection = make_collection(rows)
+
+    evidences = retrieve_wide(collection, QUERY, 3, WHERE)
+
+    assert [ev.chunk_id for ev in evidences] == ["exact", "near_2023_q4", "near_2022"]
+    # Una sola consulta con la parte común de todos los niveles (sin year ni period).
+    assert collection.wheres == [{"doc_type": "financial_statements"}]
+
+def test_wide_agrees_with_cascade_on_the_first_non_empty_level(rows):
+    evidences = retrieve_wide(make_collection(rows), QUERY, 1, WHERE)
+    cascade = retrieve_cascade(make_collection(rows), QUERY, 1, WHERE)
+
+    assert [ev.chunk_id for ev in evidences] == [ev.chunk_id for ev in cascade] == ["exact"]
+
+def test_wide_falls_back_to_unfiltered_query(rows):
+    collection = make_collection(rows)
+
+    evidences = retrieve_wide(collection, QUERY, 2, {"doc_type": "important_facts", "year": 2023})
+
+    assert [ev.chunk_id for ev in evidences] == ["other_type", "near_2022"]
+    assert collection.wheres == [{"doc_type": "important_facts"}, None]
@@ -0,0 +1,60 @@
+import random
+import pytest
+from src.rag.retriever_utils import (AUDITED_TERMS, CURRENT_YEAR, RELATIVE_YEAR_RULES, SIGNALS_DICT, PhraseAutomaton,
+                                     detect_signals, get_compiled_signals)
+
+FS = "financial_statements"
+ER = "earnings_reports"
+IF = "important_facts"
+
+QUESTIONS = [
+    ("¿Cuál fue la utilidad neta en los estados financieros auditados 2023?", FS, {"doc_type": FS, "year": 2023, "audited": True}),
+    ("Ventas del 4T 2022", FS, {"doc_type": FS, "year": 2022}),
+    ("EBITDA ajustado del primer trimestre 2024", ER, {"doc_type": ER, "year": 2024}),
+    ("Hechos de importancia comunicados a la SMV en 2021", IF, {"doc_type": IF, "year": 2021}),
+    ("¿Qué se acordó en la junta general de accionistas?", IF, {"doc_type": IF}),
+    ("utilidad neta de marzo 2023 en el estado de resultados", FS, {"doc_type": FS, "year": 2023, "period": "2023-03"}),
+    ("ingresos del año pasado", FS, {"doc_type": FS, "year": CURRENT_YEAR - 1}),
+    ("ventas de este año", FS, {"doc_type": FS, "year": CURRENT_YEAR}),
+    ("Resultados trimestrales de hace 2 años", ER, {"doc_type": ER, "year": CURRENT_YEAR - 2}),
+    ("  UTILIDAD   NETA  2020 ", FS, {"doc_type": FS, "year": 2020}),
+    ("Dictamen del auditor sobre los EEFF 2022", FS, {"doc_type": FS, "year": 2022, "audited": True}),
+    ("Programa de bonos corporativos", IF, {"doc_type": IF}),
+    ("deuda y apalancamiento 2023-09", IF, {"doc_type": IF, "year": 2023, "period": "2023-09"}),
+    ("Estado de situación financiera 2023-06", "default", {}),
+    ("hola", "default", {}),
+]
+
+@pytest.mark.parametrize("question, key, where", QUESTIONS)
+def test_detect_signals(question, key, where):
+    match = detect_signals(question)
+    assert match.key == key
+    assert match.where == where
+
+def test_detect_signals_returns_independent_copies():
+    first = detect_signals("Ventas del 4T 2022")
+    first.where["year"] = 1999
+    assert detect_signals("Ventas del 4T 2022").where["year"] == 2022
+
+def test_automaton_matches_substring_search():
+    rng = random.Random(0)
+    phrases = ["he", "she", "his", "hers", "a", "ab", "bab", "abab", "estado de resultados", "4t"]
+    automaton = PhraseAutomaton(phrases)
+    alphabet = "abehirs 4t"
+
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+        assert automaton.find(text) == {p for p in phrases if p in text}
+
+    assert automaton.find("el estado de resultados del 4t") == {"a", "estado de resultados", "4t"}
+
+def test_compiled_automaton_matches_substring_search():
+    automaton = get_compiled_signals().automaton
+    phrases = set(AUDITED_TERMS)
+    for value in SIGNALS_DICT.values():
+        phrases.update(value.get("phrase", []))
+    for rule in RELATIVE_YEAR_RULES:
+        phrases.update(rule.get("patterns", []))
+    for question, _, _ in QUESTIONS:
+        text = " ".join(question.lower().split())
+        assert automaton.find(text) == {p for p in phrases if p in text}
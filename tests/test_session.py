@@ -0,0 +1,42 @@
+import asyncio
+import gc
+import time
+import weakref
+from src.rag.session import RetrieverSession, get_async_limits
+
+def test_async_limits_are_released_with_their_loop():
+    refs = []
+
+    async def main():
+        limits = get_async_limits()
+        assert get_async_limits() is limits
+        refs.append(weakref.ref(limits))
+        loop = asyncio.get_running_loop()
+
+        # Semáforo con espera: queda ligado al loop.
+        async def one():
+            async with limits.query:
+                await loop.run_in_executor(limits.executor, time.sleep, 0.001)
+
+        await asyncio.gather(*[one() for _ in range(limits.query._value + 2)])
+
+    for _ in range(3):
+        asyncio.run(main())
+    gc.collect()
+
+    assert len(refs) == 3
+    assert all(ref() is None for ref in refs)
+
+def test_aclose_closes_async_client():
+    class FakeAsyncClient:
+        closed = False
+
+        async def close(self):
+            self.closed = True
+
+    client = FakeAsyncClient()
+    session = RetrieverSession(async_oai=client, use_answer_cache=False)
+    asyncio.run(session.aclose())
+
+    assert client.closed
+    assert session._async_oai is None